@@ -1,28 +1,914 @@
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from bs4 import BeautifulSoup, Tag
+from bs4.builder import builder_registry
+import soupsieve
+from urllib.parse import urljoin, urlparse, urlunparse
 import re
 import os
 import cssutils
 from colour import Color
 import time
+import math
+import colorsys
 import hashlib
-from tenacity import retry, stop_after_attempt, wait_exponential
-from html import escape
+from tenacity import retry, stop_after_attempt, retry_if_exception_type
+from html import escape, unescape
 import datetime
 from requests.models import Response
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+import multiprocessing
+from contextlib import contextmanager
+from array import array
+import zlib
+import heapq
+import tempfile
+import struct
+import xml.etree.ElementTree as ET
+import json
+import csv
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from requests.structures import CaseInsensitiveDict
+from collections import OrderedDict, deque
+from fnmatch import fnmatch
+from urllib.parse import parse_qsl, urlencode
+from urllib.robotparser import RobotFileParser
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+
+# HTTP/2 opcional: solo si httpx y h2 están instalados (pip install httpx[http2])
+try:
+    import httpx
+    import h2
+except ImportError:
+    httpx = h2 = None
+
+# NumPy opcional: contraste de los pares de colores nuevos de cada página calculado por lotes (pip install numpy)
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Parser HTML: 'html.parser', 'lxml' (C, mucho más rápido) o 'auto' (lxml si está instalado); si el elegido no
+# está instalado se usa html.parser. lxml es opcional porque repara distinto el HTML mal formado (<div> o <ul>
+# dentro de <p>, <li> sin cerrar) y cambia algunos hallazgos de texto y contraste. Comparativa: python3 benchmark_parsers.py
+HTML_PARSER = 'html.parser'
+
+# Límites de concurrencia del motor de rastreo
+MAX_CONCURRENCY = 16          # peticiones simultáneas en total (y páginas analizándose a la vez)
+MAX_CONCURRENCY_PER_HOST = 6  # peticiones simultáneas contra un mismo host
+
+# Modo pipeline: las descargas siguen en hilos y el parseo y los checks (CPU) se reparten entre procesos
+PIPELINE_MODE = False                   # True para usar todos los núcleos en sitios grandes
+PIPELINE_PROCESSES = os.cpu_count() or 1
+PIPELINE_QUEUE_SIZE = 64                # páginas descargadas a la vez como máximo (esperando o en análisis)
+
+# Ritmo por host (token bucket): Crawl-delay de robots.txt y las respuestas 429/503 lo reducen solo para ese host
+RATE_LIMIT_PER_HOST = 10.0  # peticiones por segundo como máximo contra un mismo host
+RATE_LIMIT_BURST = 5        # peticiones seguidas permitidas antes de aplicar el ritmo
+RATE_LIMIT_MIN = 0.2        # ritmo mínimo al que se puede bajar un host que responde 429
+RETRY_AFTER_MAX = 600       # segundos de Retry-After que se respetan como mucho
+RESPECT_ROBOTS_TXT = True   # no rastrear URLs con Disallow y aplicar Crawl-delay
+
+_global_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+# Cliente HTTP
+USER_AGENT = 'SiteMasterAudit/1.0 (+https://github.com/oseguir/SiteMaster-Audit)'
+POOL_SIZE_PER_HOST = MAX_CONCURRENCY_PER_HOST  # conexiones keep-alive que se guardan por host
+POOL_HOSTS = 32                                # hosts con pool propio a la vez
+USE_HTTP2 = True                               # solo tiene efecto si httpx[http2] está instalado
+
+# Caché HTTP en disco (revalidación con ETag / Last-Modified entre ejecuciones)
+HTTP_CACHE_DIR = None                    # p.ej. '.sitemaster_cache' para activarla
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024 # al superarlo se eliminan las entradas usadas hace más tiempo
+
+# Re-auditoría incremental
+INCREMENTAL_STATE_PATH = None  # p.ej. 'sitemaster_state.json': las páginas sin cambios reutilizan los hallazgos anteriores
+
+# Detección de contenido casi duplicado (MinHash + LSH)
+NEAR_DUPLICATE_DETECTION = True
+NEAR_DUPLICATE_THRESHOLD = 0.8  # similitud de Jaccard estimada mínima para avisar
+MINHASH_SIZE = 128             # valores por firma MinHash
+SHINGLE_SIZE = 5                # palabras por shingle
+
+# Caché de estado de enlaces (HEAD) compartida por todo el rastreo
+LINK_STATUS_CACHE_PATH = None     # p.ej. 'link_status_cache.json' para reutilizarla entre ejecuciones
+LINK_STATUS_CACHE_TTL = 24 * 3600 # segundos que un estado guardado sigue siendo válido
+
+# Frontera de rastreo (opción 2): recorrido en anchura desde la URL introducida
+CRAWL_MAX_DEPTH = 3                # saltos desde la URL inicial (1 = solo las páginas enlazadas desde ella)
+CRAWL_MAX_PAGES = 1000             # páginas auditadas como máximo
+CRAWL_INCLUDE_PATTERNS = []        # expresiones regulares; si hay alguna, la URL debe cumplir al menos una
+CRAWL_EXCLUDE_PATTERNS = []        # expresiones regulares; las URLs que cumplan alguna no se rastrean
+CRAWL_STRIP_PARAMS = ['utm_*', 'gclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid', 'yclid', '_ga']  # parámetros de seguimiento
+CRAWL_TRAILING_SLASH = 'strip'     # 'strip' (/a/ -> /a), 'add' (/a -> /a/) o 'keep'
+CRAWL_SKIP_EXTENSIONS = ('webp', 'jpg', 'jpeg', 'png', 'gif', 'svg', 'ico', 'pdf', 'zip', 'gz', 'rar', '7z', 'exe', 'dmg',
+                         'mp3', 'mp4', 'avi', 'mov', 'webm', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'xml', 'rss', 'json')  # no se piden
+
+# Descarga de las páginas: en streaming, mirando el Content-Type antes de leer el cuerpo
+PAGE_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')  # el resto (PDF, vídeo, feeds...) se omite sin descargarlo
+PAGE_MAX_BYTES = 10 * 1024 * 1024                           # las páginas más grandes se cortan y se omiten
+
+# Sitemaps como semillas del rastreo (opción 2)
+CRAWL_USE_SITEMAPS = True  # añade a la frontera las URLs de los sitemaps de robots.txt (o de /sitemap.xml)
+SITEMAP_MAX_FILES = 1000   # sitemaps que se leen como máximo, contando los índices
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024  # tamaño máximo de un sitemap descomprimido (el límite del protocolo)
+
+# Exportación de hallazgos legible por máquina, escrita a medida que terminan las páginas
+FINDINGS_EXPORT_PATH = None      # p.ej. 'findings.jsonl' o 'findings.csv' (según la extensión)
+FINDINGS_EXPORT_PER_PAGE = False # JSON Lines: una línea por página en lugar de una por hallazgo
+
+# Cascada CSS del check de tamaño de fuente y contraste
+CSS_FETCH_EXTERNAL = True  # descarga (una vez por rastreo) las hojas de <link rel="stylesheet"> y @import
+CSS_VIEWPORT_WIDTH = 1280  # ancho de pantalla con el que se evalúan las media queries de min-width/max-width
+
+# Auditoría de los CSS/JS del mismo origen (minificación y tamaño): cada recurso se descarga una sola vez por rastreo
+ASSET_AUDIT = True
+MINIFIED_MIN_LINE_LENGTH = 200  # bytes por línea de media a partir de los que un recurso se considera minificado
+
+# Auditoría de imágenes: formato, dimensiones y bytes leídos de la cabecera con una petición Range (una por imagen y rastreo)
+IMAGE_AUDIT = True
+IMAGE_PROBE_BYTES = 64 * 1024       # bytes que se piden como máximo por imagen; se corta en cuanto se lee la cabecera
+IMAGE_MAX_BYTES = 200 * 1024        # imágenes más pesadas se señalan
+IMAGE_PAGE_MAX_BYTES = 1024 * 1024  # peso total de las imágenes de una página a partir del que se avisa
+IMAGE_OVERSIZE_FACTOR = 2           # píxeles reales por píxel mostrado que se toleran (pantallas de alta densidad)
+
+# Caché de contraste de color compartida por todo el rastreo
+CONTRAST_CACHE_SIZE = 4096  # pares (color, fondo) guardados como máximo; se descartan los usados hace más tiempo
+CONTRAST_NUMPY = True       # calcula los pares nuevos por lotes con NumPy si está instalado
+
+# Métricas de rendimiento: tiempo y CPU de cada comprobación y de cada tipo de petición, contadores de red
+METRICS_EXPORT_PATH = None   # p.ej. 'metrics.prom' (formato de texto de Prometheus) o 'metrics.json' (según la extensión)
+METRICS_PAGE_TRACES = False  # guarda también el desglose de tiempos de cada página (en el JSON y en el informe)
+
+# Pool compartido para las peticiones que una página lanza en paralelo (HEAD de enlaces, etc.)
+_io_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix='sitemaster-io')
+
+# Limitador de ritmo por host con un token bucket en forma de calendario (GCRA): cada host guarda el momento
+# teórico de su siguiente petición y reserve() devuelve cuánto hay que esperar para respetarlo, permitiendo
+# ráfagas de hasta burst peticiones (ninguna si tiene Crawl-delay). Si el host responde 429 (o 503 con Retry-After), su ritmo se reduce a la
+# mitad y no se le envía nada hasta que pase Retry-After (o un backoff exponencial); cada respuesta normal lo
+# vuelve a subir poco a poco hasta el máximo del host (el global o el que marque su Crawl-delay).
+class HostRateLimiter:
+    def __init__(self, rate=RATE_LIMIT_PER_HOST, burst=RATE_LIMIT_BURST, min_rate=RATE_LIMIT_MIN):
+        self.default_rate = rate
+        self.burst = max(burst, 1)
+        self.min_rate = min(min_rate, rate)
+        self.hosts = {}  # host -> {"rate", "max_rate", "burst", "next_at", "throttled"}
+        self.stats = {"throttled": 0, "waited": 0.0}
+        self.lock = threading.Lock()
+
+    def _host(self, host):
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = {"rate": self.default_rate, "max_rate": self.default_rate, "burst": self.burst, "next_at": 0.0, "throttled": 0}
+        return state
+
+    # Segundos que hay que esperar antes de enviar la siguiente petición a host (y la deja reservada)
+    def reserve(self, host):
+        with self.lock:
+            state = self._host(host)
+            now = time.monotonic()
+            interval = 1 / state["rate"]
+            send_at = max(now, state["next_at"] - (state["burst"] - 1) * interval)
+            state["next_at"] = max(state["next_at"], send_at) + interval
+            self.stats["waited"] += send_at - now
+            return send_at - now
+
+    # Lo que devolvería reserve() ahora, sin reservar nada
+    def wait_time(self, host):
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None:
+                return 0.0
+            return max(0.0, state["next_at"] - (state["burst"] - 1) / state["rate"] - time.monotonic())
+
+    def set_crawl_delay(self, host, delay):
+        with self.lock:
+            state = self._host(host)
+            state["max_rate"] = min(self.default_rate, 1 / delay)
+            state["rate"] = min(state["rate"], state["max_rate"])
+            state["burst"] = 1  # Crawl-delay es la separación mínima entre dos peticiones seguidas
+
+    def throttled(self, host, retry_after=None):
+        with self.lock:
+            state = self._host(host)
+            state["throttled"] += 1
+            state["rate"] = max(self.min_rate, state["rate"] / 2)
+            pause = retry_after if retry_after is not None else min(60, 2 ** state["throttled"])
+            # Tras la pausa se reanuda al nuevo ritmo, sin ráfaga
+            state["next_at"] = max(state["next_at"], time.monotonic() + pause + (state["burst"] - 1) / state["rate"])
+            self.stats["throttled"] += 1
+
+    def succeeded(self, host):
+        with self.lock:
+            state = self._host(host)
+            state["throttled"] = 0
+            state["rate"] = min(state["max_rate"], state["rate"] + state["max_rate"] / 20)
+
+    # Ajusta el ritmo del host según la respuesta recibida
+    def observe(self, url, response):
+        host = urlparse(url).netloc.lower()
+        if is_rate_limited(response):
+            self.throttled(host, parse_retry_after(response.headers.get('Retry-After')))
+        else:
+            self.succeeded(host)
+
+    # Resumen para la información general del informe
+    def describe_stats(self):
+        with self.lock:
+            slowed = sorted(f"{host} ({state['rate']:.1f}/s)" for host, state in self.hosts.items() if state["rate"] < self.default_rate)
+            throttled, waited = self.stats["throttled"], self.stats["waited"]
+        summary = f"{throttled} respuestas 429/503, {waited:.1f} s de espera acumulada"
+        return summary + (f", hosts con ritmo reducido: {', '.join(slowed)}" if slowed else "")
+
+# Retry-After en segundos o como fecha HTTP; None si falta o no se entiende
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), RETRY_AFTER_MAX)
+
+rate_limiter = HostRateLimiter()
+
+# Reserva un hueco global y otro del host antes de abrir la conexión, esperando el turno del host
+@contextmanager
+def request_slot(url):
+    host = urlparse(url).netloc.lower()
+    with _host_slots_lock:
+        host_slot = _host_slots.get(host)
+        if host_slot is None:
+            host_slot = _host_slots[host] = threading.BoundedSemaphore(MAX_CONCURRENCY_PER_HOST)
+    # Primero el host: así un host saturado (o en pausa por su ritmo) no retiene huecos globales que otros
+    # hosts podrían usar. Los hilos de _io_executor solo llegan aquí cuando HostScheduler ve libre el host
+    with host_slot:
+        delay = rate_limiter.reserve(host)
+        on_reserve = getattr(_timing, 'on_reserve', None)
+        if on_reserve is not None:
+            on_reserve()
+        if delay > 0:
+            time.sleep(delay)
+        with _global_slots:
+            yield
+
+# Reparto de las peticiones de fetch_all entre los hilos de _io_executor con una cola por host. Un host tiene
+# como mucho per_host tareas en marcha y las suyas no salen de la cola mientras su ritmo (Crawl-delay, pausa por
+# Retry-After) no lo permita, así que un host lento o en pausa no deja sin hilos a las peticiones de los demás.
+# Las tareas de un host se lanzan de una en una hasta que la anterior reserva su turno en request_slot (o
+# termina sin pedir nada, p.ej. porque el resultado estaba en caché): así wait_time ya cuenta con ella.
+# Lo único que sigue esperando dentro de un hilo son los reintentos tras un 429, como mucho per_host por host.
+class HostScheduler:
+    def __init__(self, executor, per_host=MAX_CONCURRENCY_PER_HOST):
+        self.executor = executor
+        self.per_host = per_host
+        self.hosts = {}   # host -> {"queue": deque de (fetch, item, Future), "active", "starting", "wake_at"}
+        self.timers = []  # heap de (momento, host) en los que hay que volver a mirar la cola de un host
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.timer_thread = None
+
+    def submit(self, fetch, item, url):
+        future = Future()
+        host = urlparse(url).netloc.lower()
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None:
+                state = self.hosts[host] = {"queue": deque(), "active": 0, "starting": False, "wake_at": None}
+            state["queue"].append((fetch, item, future))
+            self._dispatch(host, state)
+        return future
+
+    # Lanza la siguiente tarea del host si tiene hueco y ya le toca; si no, programa otra mirada (con el lock tomado)
+    def _dispatch(self, host, state):
+        if state["queue"] and state["active"] < self.per_host and not state["starting"]:
+            wait = rate_limiter.wait_time(host)
+            if wait > 0:
+                self._wake_later(host, state, time.monotonic() + wait)
+                return
+            fetch, item, future = state["queue"].popleft()
+            state["active"] += 1
+            state["starting"] = True
+            self.executor.submit(self._run, host, state, fetch, item, future)
+        elif not state["queue"] and not state["active"]:
+            del self.hosts[host]
+
+    def _started(self, host, state, pending):
+        with self.lock:
+            if pending[0]:
+                pending[0] = False
+                state["starting"] = False
+                self._dispatch(host, state)
+
+    def _run(self, host, state, fetch, item, future):
+        pending = [True]  # aún no ha reservado turno
+        _timing.on_reserve = lambda: self._started(host, state, pending)
+        try:
+            future.set_result(fetch(item))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            _timing.on_reserve = None
+            with self.lock:
+                state["active"] -= 1
+                if pending[0]:
+                    pending[0] = False
+                    state["starting"] = False
+                self._dispatch(host, state)
+
+    def _wake_later(self, host, state, wake_at):
+        if state["wake_at"] is not None and state["wake_at"] <= wake_at:
+            return
+        state["wake_at"] = wake_at
+        heapq.heappush(self.timers, (wake_at, host))
+        if self.timer_thread is None:
+            self.timer_thread = threading.Thread(target=self._timer_loop, name='sitemaster-scheduler', daemon=True)
+            self.timer_thread.start()
+        self.wakeup.notify()
+
+    def _timer_loop(self):
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                while self.timers and self.timers[0][0] <= now:
+                    wake_at, host = heapq.heappop(self.timers)
+                    state = self.hosts.get(host)
+                    if state is not None and state["wake_at"] == wake_at:
+                        state["wake_at"] = None
+                        self._dispatch(host, state)
+                self.wakeup.wait(self.timers[0][0] - now if self.timers else None)
+
+host_scheduler = HostScheduler(_io_executor)
+
+# Ejecuta fetch(item) para todos los elementos en paralelo, por host, y devuelve los resultados en el mismo orden.
+# url_of da la URL que se va a pedir para cada elemento (por defecto el propio elemento)
+def fetch_all(fetch, items, url_of=None):
+    futures = [host_scheduler.submit(fetch, item, url_of(item) if url_of else item) for item in items]
+    return [future.result() for future in futures]
+
+# Métricas ##########################################
+# Suma a timings[name] = [segundos, segundos de CPU] lo que tarda el bloque. La CPU es la del hilo actual: lo
+# que el bloque reparte a otros hilos (p.ej. los HEAD de fetch_all) solo cuenta en el tiempo de reloj
+@contextmanager
+def timed(timings, name):
+    start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        entry = timings.setdefault(name, [0.0, 0.0])
+        entry[0] += time.perf_counter() - start
+        entry[1] += time.thread_time() - cpu_start
+
+# Métricas de todo el rastreo. Las comprobaciones de cada página se miden donde se ejecutan (también en los
+# procesos del modo pipeline), viajan en report["check_timings"] y se suman aquí con add_page; las peticiones
+# las registra HTTPClient por tipo (GET de páginas, HEAD de enlaces, robots, sitemap, hojas de estilo...).
+class AuditMetrics:
+    def __init__(self, page_traces=METRICS_PAGE_TRACES):
+        self.pages = 0
+        self.checks = {}   # comprobación -> [llamadas, segundos, segundos de CPU]
+        self.network = {}  # tipo de petición -> [peticiones, segundos, segundos de CPU, bytes]
+        self.counters = {"requests": 0, "bytes": 0, "retries": 0, "rate_limited": 0, "errors": 0, "skipped": 0}
+        self.page_traces = [] if page_traces else None  # [URL, {comprobación: [segundos, segundos de CPU]}]
+        self.lock = threading.Lock()
+
+    def count(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] += amount
+
+    # response es None si la petición falló sin respuesta; skipped, página omitida por read_page_body (no es un error)
+    def record_request(self, kind, seconds, cpu_seconds, size, response, skipped=False):
+        with self.lock:
+            entry = self.network.setdefault(kind, [0, 0.0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += cpu_seconds
+            entry[3] += size
+            self.counters["requests"] += 1
+            self.counters["bytes"] += size
+            if skipped:
+                self.counters["skipped"] += 1
+            elif response is None:
+                self.counters["errors"] += 1
+            elif is_rate_limited(response):
+                self.counters["rate_limited"] += 1
+
+    def add_check(self, name, seconds, cpu_seconds):
+        with self.lock:
+            entry = self.checks.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += cpu_seconds
+
+    def add_page(self, url, check_timings):
+        for name, (seconds, cpu_seconds) in check_timings.items():
+            self.add_check(name, seconds, cpu_seconds)
+        with self.lock:
+            self.pages += 1
+            if self.page_traces is not None:
+                self.page_traces.append([url, check_timings])
+
+    # Comprobaciones del proceso principal que no son de una página (contenido duplicado, informe...)
+    @contextmanager
+    def timed(self, name):
+        timings = {}
+        with timed(timings, name):
+            yield
+        self.add_check(name, *timings[name])
+
+    def as_dict(self):
+        with self.lock:
+            metrics = {
+                "pages": self.pages,
+                "checks": {name: {"calls": calls, "seconds": seconds, "cpu_seconds": cpu_seconds} for name, (calls, seconds, cpu_seconds) in self.checks.items()},
+                "network": {kind: {"requests": requests_total, "seconds": seconds, "cpu_seconds": cpu_seconds, "bytes": size}
+                            for kind, (requests_total, seconds, cpu_seconds, size) in self.network.items()},
+                "counters": dict(self.counters)
+            }
+            if self.page_traces is not None:
+                metrics["page_traces"] = [{"url": url, "checks": {name: {"seconds": seconds, "cpu_seconds": cpu_seconds} for name, (seconds, cpu_seconds) in check_timings.items()}}
+                                          for url, check_timings in self.page_traces]
+        return metrics
+
+    # Formato de texto de Prometheus (para node_exporter --collector.textfile o un Pushgateway)
+    def to_prometheus(self):
+        metrics = self.as_dict()
+        label = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"')
+        families = [
+            ("sitemaster_pages_total", "Páginas auditadas", [("", metrics["pages"])]),
+            ("sitemaster_check_calls_total", "Ejecuciones de cada comprobación", [(f'{{check="{label(name)}"}}', check["calls"]) for name, check in metrics["checks"].items()]),
+            ("sitemaster_check_seconds_total", "Tiempo de reloj de cada comprobación", [(f'{{check="{label(name)}"}}', check["seconds"]) for name, check in metrics["checks"].items()]),
+            ("sitemaster_check_cpu_seconds_total", "Tiempo de CPU de cada comprobación", [(f'{{check="{label(name)}"}}', check["cpu_seconds"]) for name, check in metrics["checks"].items()]),
+            ("sitemaster_http_requests_total", "Peticiones HTTP por tipo", [(f'{{kind="{label(kind)}"}}', entry["requests"]) for kind, entry in metrics["network"].items()]),
+            ("sitemaster_http_request_seconds_total", "Tiempo de reloj de las peticiones HTTP por tipo", [(f'{{kind="{label(kind)}"}}', entry["seconds"]) for kind, entry in metrics["network"].items()]),
+            ("sitemaster_http_request_cpu_seconds_total", "Tiempo de CPU de las peticiones HTTP por tipo", [(f'{{kind="{label(kind)}"}}', entry["cpu_seconds"]) for kind, entry in metrics["network"].items()]),
+            ("sitemaster_http_response_bytes_total", "Bytes recibidos por tipo de petición", [(f'{{kind="{label(kind)}"}}', entry["bytes"]) for kind, entry in metrics["network"].items()]),
+            ("sitemaster_http_retries_total", "Reintentos tras respuestas 429/503", [("", metrics["counters"]["retries"])]),
+            ("sitemaster_http_rate_limited_total", "Respuestas 429/503 recibidas", [("", metrics["counters"]["rate_limited"])]),
+            ("sitemaster_http_errors_total", "Peticiones fallidas sin respuesta", [("", metrics["counters"]["errors"])]),
+            ("sitemaster_http_skipped_total", "Páginas omitidas por no ser HTML o ser demasiado grandes", [("", metrics["counters"]["skipped"])])
+        ]
+        lines = []
+        for name, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{labels} {value:g}" if isinstance(value, float) else f"{name}{labels} {value}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            if path.endswith('.json'):
+                json.dump(self.as_dict(), file, indent=2)
+            else:
+                file.write(self.to_prometheus())
+
+    # Líneas de la sección "Rendimiento" del informe: comprobaciones y peticiones de más a menos tiempo
+    def report_lines(self, slowest_pages=10):
+        metrics = self.as_dict()
+        lines = [f"{name} | {check['calls']} ejecuciones | {check['seconds']:.2f} s | CPU {check['cpu_seconds']:.2f} s | {1000 * check['seconds'] / check['calls']:.1f} ms de media"
+                 for name, check in sorted(metrics["checks"].items(), key=lambda item: -item[1]["seconds"])]
+        lines.extend(f"Red {kind} | {entry['requests']} peticiones | {entry['seconds']:.2f} s | CPU {entry['cpu_seconds']:.2f} s | {entry['bytes'] / 1048576:.1f} MB"
+                     for kind, entry in sorted(metrics["network"].items(), key=lambda item: -item[1]["seconds"]))
+        counters = metrics["counters"]
+        lines.append(f"Peticiones: {counters['requests']}, {counters['bytes'] / 1048576:.1f} MB, {counters['retries']} reintentos, {counters['rate_limited']} respuestas 429/503, {counters['errors']} errores, {counters['skipped']} páginas omitidas")
+        for trace in sorted(metrics.get("page_traces", []), key=lambda trace: -sum(check["seconds"] for check in trace["checks"].values()))[:slowest_pages]:
+            slowest = sorted(trace["checks"].items(), key=lambda item: -item[1]["seconds"])[:3]
+            total = sum(check["seconds"] for check in trace["checks"].values())
+            lines.append(f"Página lenta: {trace['url']} | {total:.2f} s | " + ", ".join(f"{name} {check['seconds']:.2f} s" for name, check in slowest))
+        return lines
+
+audit_metrics = AuditMetrics()
+
+# Parser HTML ##########################################
+def parser_available(name):
+    return builder_registry.lookup(name) is not None
+
+# Solo backends que construyen el mismo árbol que html.parser para HTML bien formado (html5lib, por ejemplo,
+# añade <tbody> implícitos y cambiaría los hallazgos de tablas)
+SUPPORTED_HTML_PARSERS = ('lxml', 'html.parser')
+
+def select_html_parser(preferred=HTML_PARSER):
+    candidates = ['lxml'] if preferred == 'auto' else [preferred]
+    for name in candidates:
+        if name in SUPPORTED_HTML_PARSERS and parser_available(name):
+            return name
+    return 'html.parser'
+
+html_parser = select_html_parser()
+
+def parse_html(markup, parser=None):
+    return BeautifulSoup(markup, parser or html_parser)
+
+# Cliente HTTP compartido ##########################################
+# Medición de fases de carga: las conexiones anotan en el hilo que las usa cuánto tardó su connect()
+_timing = threading.local()
+
+class _ConnectTimerMixin:
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _timing.connect += time.perf_counter() - start
+        _timing.new_connections += 1
+
+class _TimedHTTPConnection(_ConnectTimerMixin, HTTPConnection):
+    pass
+
+class _TimedHTTPSConnection(_ConnectTimerMixin, HTTPSConnection):
+    pass
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool, 'https': _TimedHTTPSConnectionPool}
+
+# Convierte una respuesta de httpx (con el cuerpo ya leído) en una de requests para que el resto del script no
+# note la diferencia
+def _to_requests_response(httpx_response, content):
+    response = Response()
+    response.status_code = httpx_response.status_code
+    response.headers = CaseInsensitiveDict(httpx_response.headers.multi_items())
+    response.url = str(httpx_response.url)
+    response.encoding = httpx_response.encoding
+    response.reason = httpx_response.reason_phrase
+    response._content = content
+    return response
+
+# Respuesta vacía de tiempos para lo que se sirve sin tocar la red
+def _no_network_timings():
+    return {"connect": 0.0, "ttfb": 0.0, "download": 0.0}
+
+# Caché de respuestas en disco para GET y HEAD. Cada entrada son dos ficheros: <clave>.json con estado,
+# cabeceras y validadores, y <clave>.body con el cuerpo. Las entradas frescas (Cache-Control: max-age) se sirven
+# sin red; las demás se revalidan con If-None-Match / If-Modified-Since y un 304 reutiliza el cuerpo guardado.
+# El tamaño total está limitado: se descartan primero las entradas usadas hace más tiempo (LRU, por mtime).
+class HTTPDiskCache:
+    def __init__(self, directory, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # clave -> bytes en disco, de la menos a la más recientemente usada
+        self.total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0}
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        for name in os.listdir(directory):
+            if name.endswith('.json'):
+                key = name[:-5]
+                meta_path, body_path = self._paths(key)
+                try:
+                    found.append((os.path.getmtime(meta_path), key, os.path.getsize(meta_path) + os.path.getsize(body_path)))
+                except OSError:
+                    continue
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    def _key(self, method, url):
+        return hashlib.sha256(f"{method} {url}".encode('utf-8')).hexdigest()
+
+    def _paths(self, key):
+        return os.path.join(self.directory, f"{key}.json"), os.path.join(self.directory, f"{key}.body")
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    # Devuelve (metadatos, cuerpo) o None, y marca la entrada como usada
+    def lookup(self, method, url):
+        key = self._key(method, url)
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+            with open(body_path, 'rb') as file:
+                body = file.read()
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        return meta, body
+
+    def is_fresh(self, meta):
+        cache_control = CaseInsensitiveDict(meta["headers"]).get('Cache-Control', '').lower()
+        max_age = re.search(r'max-age=(\d+)', cache_control)
+        if 'no-cache' in cache_control or not max_age:
+            return False
+        return time.time() - meta["stored_at"] < int(max_age.group(1))
+
+    def conditional_headers(self, meta):
+        stored_headers = CaseInsensitiveDict(meta["headers"])
+        headers = {}
+        if stored_headers.get('ETag'):
+            headers['If-None-Match'] = stored_headers['ETag']
+        if stored_headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = stored_headers['Last-Modified']
+        return headers
+
+    def build_response(self, meta, body):
+        response = Response()
+        response.status_code = meta["status_code"]
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response.url = meta["url"]
+        response.encoding = meta["encoding"]
+        response._content = body
+        return response
 
-print("\n > Bienvenido a SiteMaster Audit <\n   > Escaneo todo en uno con generación de informe\n\n")
+    def store(self, method, url, response, headers=None):
+        headers = CaseInsensitiveDict(headers if headers is not None else response.headers)
+        cache_control = headers.get('Cache-Control', '').lower()
+        if response.status_code != 200 or 'no-store' in cache_control:
+            return
+        if not (headers.get('ETag') or headers.get('Last-Modified') or 'max-age' in cache_control):
+            return
+        body = response.content if method == 'GET' else b''
+        meta = json.dumps({
+            "status_code": response.status_code,
+            "headers": dict(headers),
+            "url": response.url,
+            "encoding": response.encoding,
+            "stored_at": time.time()
+        })
+        size = len(meta) + len(body)
+        if size > self.max_bytes:
+            return
+        key = self._key(method, url)
+        meta_path, body_path = self._paths(key)
+        try:
+            for path, data, mode in ((body_path, body, 'wb'), (meta_path, meta.encode('utf-8'), 'wb')):
+                with open(f"{path}.tmp", mode) as file:
+                    file.write(data)
+                os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            print(f"No se pudo guardar {url} en la caché HTTP: {e}")
+            return
+        with self.lock:
+            self.total_bytes += size - self.entries.pop(key, 0)
+            self.entries[key] = size
+        self._evict()
+
+    # Elimina las entradas usadas hace más tiempo hasta volver por debajo del límite
+    def _evict(self):
+        evicted = []
+        with self.lock:
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                old_key, old_size = self.entries.popitem(last=False)
+                self.total_bytes -= old_size
+                evicted.append(old_key)
+        for old_key in evicted:
+            for path in self._paths(old_key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    # Resumen para la información general del informe
+    def describe_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            total_bytes = self.total_bytes
+        return f"{stats['hits']} aciertos, {stats['misses']} fallos, {stats['revalidated']} revalidaciones (304), {total_bytes / 1048576:.1f} MB en disco"
+
+# Todas las peticiones del script pasan por aquí: conexiones keep-alive reutilizadas desde un pool por host,
+# User-Agent común, HTTP/2 si httpx[http2] está instalado y contadores de reutilización de conexiones.
+# Cada respuesta lleva en response.timings las fases de red: conexión, espera hasta el primer byte y descarga (segundos).
+class HTTPClient:
+    def __init__(self, pool_size_per_host=POOL_SIZE_PER_HOST, user_agent=USER_AGENT, http2=USE_HTTP2, cache=None):
+        self.cache = cache
+        self.stats = {"requests": 0, "connections": 0}
+        self.stats_lock = threading.Lock()
+        self.http2 = bool(http2 and httpx is not None and h2 is not None)
+        if self.http2:
+            limits = httpx.Limits(max_connections=None, max_keepalive_connections=POOL_HOSTS * pool_size_per_host)
+            self.client = httpx.Client(http2=True, limits=limits, headers={'User-Agent': user_agent})
+        else:
+            self.session = requests.Session()
+            self.session.headers['User-Agent'] = user_agent
+            for prefix in ('http://', 'https://'):
+                self.session.mount(prefix, TimedHTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=pool_size_per_host))
+
+    def _httpx_trace(self, event_name, info):
+        if event_name == 'connection.connect_tcp.started':
+            _timing.connect_started = time.perf_counter()
+        elif event_name in ('connection.connect_tcp.complete', 'connection.start_tls.complete'):
+            if event_name == 'connection.connect_tcp.complete':
+                _timing.new_connections += 1
+            _timing.connect = time.perf_counter() - _timing.connect_started
+
+    # page: el cuerpo se lee con read_page_body (solo HTML y hasta PAGE_MAX_BYTES); si se omite, SkippedPageError
+    # lleva la respuesta (sin cuerpo) para que cuenten su estado y sus cabeceras
+    def _send(self, method, url, allow_redirects, headers, page=False):
+        if not self.http2:
+            response = self.session.request(method, url, headers=headers, allow_redirects=allow_redirects, stream=True)
+            first_byte = time.perf_counter()
+            if page:
+                with response:
+                    try:
+                        response._content = read_page_body(response.status_code, response.headers, response.iter_content(64 * 1024))
+                    except SkippedPageError as e:
+                        response._content = b''
+                        e.response = response
+                        raise
+                response._content_consumed = True
+            else:
+                response.content  # descarga el cuerpo completo
+            return response, first_byte
+        try:
+            with self.client.stream(method, url, headers=headers, follow_redirects=allow_redirects, extensions={'trace': self._httpx_trace}) as httpx_response:
+                first_byte = time.perf_counter()
+                if page:
+                    try:
+                        content = read_page_body(httpx_response.status_code, httpx_response.headers, httpx_response.iter_bytes(64 * 1024))
+                    except SkippedPageError as e:
+                        e.response = _to_requests_response(httpx_response, b'')
+                        raise
+                else:
+                    content = httpx_response.read()
+        except httpx.HTTPError as e:
+            raise requests.exceptions.RequestException(str(e)) from e
+        return _to_requests_response(httpx_response, content), first_byte
+
+    # kind: tipo de petición para las métricas (por defecto el método: GET de páginas, HEAD de enlaces)
+    def request(self, method, url, allow_redirects=True, page=False, kind=None):
+        cached = self.cache.lookup(method, url) if self.cache else None
+        if cached and self.cache.is_fresh(cached[0]):
+            self.cache.count("hits")
+            response = self.cache.build_response(*cached)
+            response.timings = _no_network_timings()
+            return response
+
+        conditional_headers = self.cache.conditional_headers(cached[0]) if cached else None
+        with request_slot(url):
+            _timing.connect = 0.0  # 0 si se reutiliza una conexión abierta
+            _timing.new_connections = 0
+            start, cpu_start = time.perf_counter(), time.thread_time()
+            response = skipped = None
+            try:
+                response, first_byte = self._send(method, url, allow_redirects, conditional_headers, page)
+            except SkippedPageError as e:
+                skipped = e
+                raise
+            finally:
+                with self.stats_lock:
+                    self.stats["requests"] += 1
+                    self.stats["connections"] += _timing.new_connections
+                end = time.perf_counter()
+                if skipped is not None:
+                    # El host ha respondido con normalidad: cuenta para su ritmo aunque la página no se audite
+                    audit_metrics.record_request(kind or method, end - start, time.thread_time() - cpu_start, 0, skipped.response, skipped=True)
+                    if skipped.response is not None:
+                        rate_limiter.observe(url, skipped.response)
+                else:
+                    audit_metrics.record_request(kind or method, end - start, time.thread_time() - cpu_start,
+                                                 len(response.content) if response is not None else 0, response)
+        response.timings = {
+            "connect": _timing.connect,
+            "ttfb": first_byte - start - _timing.connect,
+            "download": end - first_byte
+        }
+        rate_limiter.observe(url, response)
+
+        if self.cache:
+            if cached and response.status_code == 304:
+                # Sin cambios: se reutiliza el cuerpo guardado con las cabeceras (validadores) actualizadas
+                self.cache.count("revalidated")
+                meta, body = cached
+                headers = CaseInsensitiveDict(meta["headers"])
+                headers.update(response.headers)
+                meta["headers"] = dict(headers)
+                timings = response.timings
+                response = self.cache.build_response(meta, body)
+                response.timings = timings
+                self.cache.store(method, url, response, headers)
+            else:
+                self.cache.count("misses")
+                self.cache.store(method, url, response)
+        return response
+
+    # GET en streaming, sin pasar por la caché: devuelve (respuesta, iterador de trozos del cuerpo ya decodificado
+    # según Content-Encoding) para leer ficheros grandes sin tenerlos enteros en memoria. headers añade cabeceras
+    # a la petición (p.ej. Range para leer solo el principio)
+    @contextmanager
+    def stream(self, url, chunk_size=64 * 1024, headers=None, kind='GET'):
+        received = [0]
+        streamed = [None]  # respuesta, para las métricas
+
+        def counted(chunks):
+            for chunk in chunks:
+                received[0] += len(chunk)
+                yield chunk
+
+        with request_slot(url):
+            _timing.connect = 0.0
+            _timing.new_connections = 0
+            start, cpu_start = time.perf_counter(), time.thread_time()
+            try:
+                if self.http2:
+                    try:
+                        with self.client.stream('GET', url, headers=headers, follow_redirects=True, extensions={'trace': self._httpx_trace}) as response:
+                            rate_limiter.observe(url, response)
+                            streamed[0] = response
+                            yield response, counted(response.iter_bytes(chunk_size))
+                    except httpx.HTTPError as e:
+                        raise requests.exceptions.RequestException(str(e)) from e
+                else:
+                    with self.session.get(url, stream=True, headers=headers) as response:
+                        rate_limiter.observe(url, response)
+                        streamed[0] = response
+                        yield response, counted(response.iter_content(chunk_size))
+            finally:
+                with self.stats_lock:
+                    self.stats["requests"] += 1
+                    self.stats["connections"] += _timing.new_connections
+                # Incluye lo que tarda quien lee los trozos dentro del bloque (p.ej. descomprimir un sitemap)
+                audit_metrics.record_request(kind, time.perf_counter() - start, time.thread_time() - cpu_start, received[0], streamed[0])
+
+    def get(self, url, kind=None):
+        return self.request('GET', url, kind=kind)
+
+    # GET de una página a auditar: lanza SkippedPageError si no es HTML o es demasiado grande
+    def get_page(self, url):
+        return self.request('GET', url, page=True)
+
+    def head(self, url, kind=None):
+        return self.request('HEAD', url, allow_redirects=False, kind=kind)
+
+    # Resumen para la información general del informe
+    def describe_stats(self):
+        with self.stats_lock:
+            requests_total, connections = self.stats["requests"], self.stats["connections"]
+        reused = requests_total - connections
+        reuse_ratio = reused / requests_total if requests_total else 0
+        return f"{requests_total} peticiones, {connections} conexiones nuevas, {reused} reutilizadas ({reuse_ratio:.0%}), HTTP/2 habilitado: {'sí' if self.http2 else 'no'}"
+
+http_client = HTTPClient()
 
 # manejo errores red
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+# 429 (o 503 con Retry-After): el servidor pide que se vaya más despacio
+class RateLimitedError(requests.exceptions.RequestException):
+    def __init__(self, response):
+        super().__init__(f"Rate limit exceeded: {response.status_code}")
+        self.response = response
+
+# Respuesta que no se audita (no es HTML o pasa de PAGE_MAX_BYTES): el cuerpo no se ha leído, o solo en parte
+class SkippedPageError(requests.exceptions.RequestException):
+    pass
+
+# Cuerpo de una página leído en streaming. El Content-Type y el Content-Length de las respuestas 200 se miran
+# antes de leer nada; sin Content-Length (o comprimido) se corta en cuanto se pasa de PAGE_MAX_BYTES
+def read_page_body(status_code, headers, chunks):
+    if status_code == 200:
+        content_type = headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type and content_type not in PAGE_CONTENT_TYPES:
+            raise SkippedPageError(f"No es HTML (Content-Type: {content_type})")
+        content_length = headers.get('Content-Length', '')
+        if content_length.isdigit() and int(content_length) > PAGE_MAX_BYTES:
+            raise SkippedPageError(f"Demasiado grande ({int(content_length) / 1048576:.1f} MB, límite: {PAGE_MAX_BYTES / 1048576:.1f} MB)")
+    body = bytearray()
+    for chunk in chunks:
+        body += chunk
+        if len(body) > PAGE_MAX_BYTES:
+            raise SkippedPageError(f"Demasiado grande (más de {PAGE_MAX_BYTES / 1048576:.1f} MB, descarga cortada)")
+    return bytes(body)
+
+def is_rate_limited(response):
+    return response.status_code == 429 or (response.status_code == 503 and 'Retry-After' in response.headers)
+
+# Solo se reintentan las respuestas de límite de ritmo. No hace falta esperar aquí: el limitador ya ha pausado el
+# host el tiempo pedido (Retry-After) y el reintento, como cualquier otra petición a ese host, espera su turno.
+# Si se agotan los intentos se devuelve la última respuesta 429/503.
+rate_limit_retry = retry(
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception_type(RateLimitedError),
+    retry_error_callback=lambda retry_state: retry_state.outcome.exception().response,
+    before_sleep=lambda retry_state: audit_metrics.count("retries")
+)
+
+# GET de una página a auditar; SkippedPageError no se convierte en respuesta falsa para poder señalarla
+@rate_limit_retry
 def get_with_retries(url):
     try:
-        response = requests.get(url)
-        if response.status_code == 429:
-            print(f"Rate limit exceeded when accessing {url}")
-            raise requests.exceptions.RequestException("Rate limit exceeded")
-        return response
+        response = http_client.get_page(url)
+    except SkippedPageError:
+        raise
     except requests.exceptions.RequestException as e:
         print(f"Error al realizar la solicitud GET a {url}: {e}")
         
@@ -30,15 +916,15 @@ def get_with_retries(url):
         fake_response = Response()
         fake_response.status_code = 0  # Puedes usar un código de estado especial para denotar fallos
         return fake_response
+    if is_rate_limited(response):
+        print(f"Rate limit exceeded when accessing {url}")
+        raise RateLimitedError(response)
+    return response
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+@rate_limit_retry
 def head_with_retries(url):
     try:
-        response = requests.head(url)
-        if response.status_code == 429:
-            print(f"Rate limit exceeded when accessing {url}")
-            raise requests.exceptions.RequestException("Rate limit exceeded")
-        return response
+        response = http_client.head(url)
     except requests.exceptions.ConnectionError as e:
         print(f"Connection error when accessing {url}: {e}")
         # Crea una respuesta falsa para evitar el error
@@ -51,6 +937,95 @@ def head_with_retries(url):
         fake_response = Response()
         fake_response.status_code = 0
         return fake_response
+    if is_rate_limited(response):
+        print(f"Rate limit exceeded when accessing {url}")
+        raise RateLimitedError(response)
+    return response
+
+# URL absoluta normalizada para usar como clave: esquema y host en minúsculas, sin fragmento y con ruta mínima '/'
+def normalize_url(url):
+    parsed = urlparse(url)
+    return urlunparse((parsed.scheme.lower(), parsed.netloc.lower(), parsed.path or '/', parsed.params, parsed.query, ''))
+
+# URL canónica para la frontera de rastreo: además de normalize_url quita el puerto por defecto, los parámetros
+# de seguimiento (strip_params, admite comodines como 'utm_*') y aplica la política de barra final
+def canonicalize_url(url, strip_params=CRAWL_STRIP_PARAMS, trailing_slash=CRAWL_TRAILING_SLASH):
+    parsed = urlparse(normalize_url(url))
+    netloc = parsed.netloc
+    if (parsed.scheme, parsed.port) in (('http', 80), ('https', 443)):
+        netloc = netloc.rsplit(':', 1)[0]
+    query = parsed.query
+    if strip_params and query:
+        params = parse_qsl(query, keep_blank_values=True)
+        query = urlencode([(key, value) for key, value in params if not any(fnmatch(key.lower(), pattern) for pattern in strip_params)])
+    path = parsed.path
+    if path != '/':
+        if trailing_slash == 'strip':
+            path = path.rstrip('/') or '/'
+        elif trailing_slash == 'add' and not path.endswith('/') and '.' not in path.rsplit('/', 1)[-1]:
+            path += '/'
+    return urlunparse((parsed.scheme, netloc, path, parsed.params, query, ''))
+
+# Caché del código de estado de cada enlace para todo el rastreo. Las consultas simultáneas de la misma URL
+# comparten una única petición HEAD en curso. Opcionalmente se guarda en disco (JSON) con caducidad.
+class LinkStatusCache:
+    def __init__(self, path=None, ttl=LINK_STATUS_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.statuses = {}   # URL normalizada -> (código de estado, momento de la comprobación)
+        self.in_flight = {}  # URL normalizada -> Future de la petición en curso
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                stored = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"No se pudo leer la caché de enlaces {self.path}: {e}")
+            return
+        now = time.time()
+        with self.lock:
+            for url, (status, checked_at) in stored.items():
+                if now - checked_at < self.ttl:
+                    self.statuses[url] = (status, checked_at)
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            # Los fallos de red (0) y los 429 no se guardan: la próxima ejecución debe volver a comprobarlos
+            stored = {url: entry for url, entry in self.statuses.items() if entry[0] not in (0, 429)}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(stored, file)
+        os.replace(tmp_path, self.path)
+
+    def get_status(self, url):
+        key = normalize_url(url)
+        with self.lock:
+            entry = self.statuses.get(key)
+            if entry and time.time() - entry[1] < self.ttl:
+                return entry[0]
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+        if owner:
+            try:
+                status = head_with_retries(key).status_code
+                with self.lock:
+                    self.statuses[key] = (status, time.time())
+                future.set_result(status)
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self.lock:
+                    del self.in_flight[key]
+        return future.result()
+
+link_status_cache = LinkStatusCache()
 
 # ccsutils errores criticos
 cssutils.log.setLevel('CRITICAL')
@@ -92,49 +1067,289 @@ def check_internal_links_with_query_params(soup, domain):
     return problems
 
 #check css i js optimizado
-def is_minified(content):
-    # Simplificación: Consideramos minificado si el contenido no tiene muchas líneas y no tiene muchos espacios en blanco.
-    lines = content.splitlines()
-    if len(lines) < 5 and sum(len(line.strip()) for line in lines) / len(content) > 0.9:
-        return True
-    return False
-
-def check_minification(soup, base_url):
+# Heurística de minificación en streaming: cuenta bytes, saltos de línea y sangrías trozo a trozo, sin guardar el
+# contenido. Un recurso está minificado si sus líneas son largas (MINIFIED_MIN_LINE_LENGTH bytes de media o más) o
+# si tiene muy pocas líneas y casi nada de espacio de formato.
+LEADING_WHITESPACE = re.compile(rb'\n[ \t]+')
+
+class MinificationProbe:
+    def __init__(self):
+        self.size = 0
+        self.newlines = 0
+        self.indentation = 0       # espacios y tabuladores al principio de las líneas
+        self.at_line_start = True  # el trozo anterior terminó en un salto de línea (o en la sangría que lo sigue)
+
+    def feed(self, chunk):
+        self.size += len(chunk)
+        if self.at_line_start:
+            self.indentation += len(chunk) - len(chunk.lstrip(b' \t'))
+        self.newlines += chunk.count(b'\n')
+        self.indentation += sum(len(match) - 1 for match in LEADING_WHITESPACE.findall(chunk))
+        last_line = chunk[chunk.rfind(b'\n') + 1:]
+        self.at_line_start = (b'\n' in chunk or self.at_line_start) and not last_line.strip(b' \t')
+
+    def minified(self):
+        if not self.size:
+            return True
+        lines = self.newlines + 1
+        formatting = (self.newlines + self.indentation) / self.size
+        return self.size / lines >= MINIFIED_MIN_LINE_LENGTH or (lines < 5 and formatting < 0.1)
+
+def new_asset_result(url, kind):
+    return {"url": url, "kind": kind, "status": None, "bytes": 0, "minified": None, "encoding": None, "error": None}
+
+# Descarga un CSS/JS en streaming y lo clasifica con MinificationProbe. Las hojas de estilo ya las descarga
+# stylesheet_cache para la cascada, así que se reutiliza esa descarga; las imágenes van a audit_image.
+def audit_asset(url, kind):
+    if kind == 'img':
+        return audit_image(url)
+    if kind == 'css' and CSS_FETCH_EXTERNAL:
+        return stylesheet_cache.audit(url)
+    asset = new_asset_result(url, kind)
+    try:
+        with http_client.stream(url, kind='asset') as (response, chunks):
+            asset["status"] = response.status_code
+            asset["encoding"] = response.headers.get('Content-Encoding')
+            if response.status_code == 200:
+                probe = MinificationProbe()
+                for chunk in chunks:
+                    probe.feed(chunk)
+                asset["bytes"] = probe.size
+                asset["minified"] = probe.minified()
+    except requests.exceptions.RequestException as e:
+        asset["error"] = str(e)
+    return asset
+
+# Resultado de audit_asset por URL durante todo el rastreo: cada CSS/JS/imagen se audita una sola vez aunque lo
+# usen miles de páginas, y las que lo piden a la vez esperan a la primera descarga. También cuenta cuántas
+# páginas usan cada recurso, para las secciones del sitio.
+class AssetAuditCache:
+    def __init__(self):
+        self.assets = {}  # URL -> Future con el resultado de audit_asset
+        self.pages = {}   # URL -> páginas que lo usan
+        self.lock = threading.Lock()
+
+    def get(self, url, kind):
+        with self.lock:
+            future = self.assets.get(url)
+            owner = future is None
+            if owner:
+                future = self.assets[url] = Future()
+            self.pages[url] = self.pages.get(url, 0) + 1
+        if owner:
+            try:
+                future.set_result(audit_asset(url, kind))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    # Recursos ya auditados de los tipos indicados, de más a menos bytes
+    def results(self, kinds=('css', 'js')):
+        with self.lock:
+            futures = list(self.assets.values())
+        assets = [future.result() for future in futures if future.done() and not future.exception()]
+        return sorted((asset for asset in assets if asset["kind"] in kinds), key=lambda asset: (-(asset["bytes"] or 0), asset["url"]))
+
+    def pages_using(self, url):
+        with self.lock:
+            return self.pages.get(url, 0)
+
+    # Resúmenes para la información general del informe
+    def describe_stats(self):
+        assets = self.results()
+        if not assets:
+            return None
+        total_bytes = sum(asset["bytes"] for asset in assets)
+        unminified = [asset for asset in assets if asset["minified"] is False]
+        unminified_bytes = sum(asset["bytes"] for asset in unminified)
+        return f"{len(assets)} archivos, {total_bytes / 1024:.1f} KB; {len(unminified)} sin minificar ({unminified_bytes / 1024:.1f} KB)"
+
+    def describe_image_stats(self):
+        images = self.results(('img',))
+        if not images:
+            return None
+        known = [image["bytes"] for image in images if image["bytes"] is not None]
+        heavy = sum(1 for size in known if size > IMAGE_MAX_BYTES)
+        return f"{len(images)} distintas, {sum(known) / 1048576:.1f} MB ({len(images) - len(known)} de tamaño desconocido), {heavy} de más de {IMAGE_MAX_BYTES // 1024} KB"
+
+asset_audit_cache = AssetAuditCache()
+
+# Línea de un recurso en la sección del sitio
+def describe_asset(asset, pages):
+    kind = asset["kind"].upper()
+    if asset["error"]:
+        return f"{asset['url']} | {kind} | Error: {asset['error']} | {pages} páginas"
+    if asset["status"] != 200:
+        return f"{asset['url']} | {kind} | HTTP {asset['status']} | {pages} páginas"
+    if asset["kind"] == 'img':
+        dimensions = f" {asset['width']}x{asset['height']} px" if asset["width"] else ""
+        size = f"{asset['bytes'] / 1024:.1f} KB" if asset["bytes"] is not None else "tamaño desconocido"
+        return f"{asset['url']} | {(asset['format'] or 'formato desconocido').upper()}{dimensions} | {size} | {pages} páginas"
+    compression = f" ({asset['encoding']})" if asset["encoding"] else ""
+    return f"{asset['url']} | {kind} | {asset['bytes'] / 1024:.1f} KB{compression} | {'minificado' if asset['minified'] else 'sin minificar'} | {pages} páginas"
+
+# Recursos CSS/JS ([tipo, href]) del mismo host que la página, como URLs absolutas sin repetir: [[tipo, URL]]
+def same_origin_assets(base_url, asset_refs):
+    host = urlparse(base_url).netloc
+    assets = {}
+    for kind, href in asset_refs:
+        if href.startswith('data:'):
+            continue
+        asset_url = urljoin(base_url, href).split('#')[0]
+        if urlparse(asset_url).netloc == host:
+            assets.setdefault(asset_url, kind)
+    return [[kind, asset_url] for asset_url, kind in assets.items()]
+
+# Hallazgos de minificación de una página a partir de los resultados compartidos de asset_audit_cache; los
+# recursos que la página aún no tiene auditados se piden en paralelo
+def find_unminified_assets(assets):
     problems = {
         "CSS no minificado": [],
         "JS no minificado": []
     }
-    
-    parsed_base_url = urlparse(base_url).netloc
-
-    # Verificar archivos CSS
-    for link in soup.find_all('link', rel='stylesheet'):
-        href = link.get('href')
-        if href and not href.startswith('data:'):
-            full_url = urljoin(base_url, href)
-            if urlparse(full_url).netloc == parsed_base_url:
-                try:
-                    response = get_with_retries(full_url)
-                    if response.status_code == 200 and not is_minified(response.text):
-                        problems["CSS no minificado"].append(href)
-                except requests.exceptions.RequestException as e:
-                    problems["CSS no minificado"].append(f"{href} (Error: {e})")
-    
-    # Verificar archivos JS
-    for script in soup.find_all('script', src=True):
-        src = script.get('src')
-        if src and not src.startswith('data:'):
-            full_url = urljoin(base_url, src)
-            if urlparse(full_url).netloc == parsed_base_url:
-                try:
-                    response = get_with_retries(full_url)
-                    if response.status_code == 200 and not is_minified(response.text):
-                        problems["JS no minificado"].append(src)
-                except requests.exceptions.RequestException as e:
-                    problems["JS no minificado"].append(f"{src} (Error: {e})")
-
+    if not ASSET_AUDIT:
+        return problems
+    for asset in fetch_all(lambda asset: asset_audit_cache.get(asset[1], asset[0]), assets, url_of=lambda asset: asset[1]):
+        category = "CSS no minificado" if asset["kind"] == 'css' else "JS no minificado"
+        if asset["error"]:
+            problems[category].append(f"{asset['url']} (Error: {asset['error']})")
+        elif asset["minified"] is False:
+            problems[category].append(f"{asset['url']} ({asset['bytes'] / 1024:.1f} KB)")
     return problems
 
+# Imágenes ##########################################
+# Formato y dimensiones en píxeles a partir de los primeros bytes del fichero: (formato, ancho, alto), con ancho y
+# alto None si el formato no los lleva en la cabecera (SVG), o None si hacen falta más bytes o no se reconoce
+def read_image_header(data):
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return ('png', *struct.unpack('>II', data[16:24])) if len(data) >= 24 else None
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return ('gif', *struct.unpack('<HH', data[6:10])) if len(data) >= 10 else None
+    if data.startswith(b'\xff\xd8'):
+        return read_jpeg_header(data)
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        chunk_type = data[12:16]
+        if chunk_type == b'VP8 ' and len(data) >= 30:
+            width, height = struct.unpack('<HH', data[26:30])
+            return 'webp', width & 0x3fff, height & 0x3fff
+        if chunk_type == b'VP8L' and len(data) >= 25:
+            bits = int.from_bytes(data[21:25], 'little')
+            return 'webp', (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+        if chunk_type == b'VP8X' and len(data) >= 30:
+            return 'webp', int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+        return None
+    if data[4:8] == b'ftyp':
+        # AVIF/HEIC: las dimensiones están en la caja 'ispe' (versión y flags, ancho y alto de 32 bits)
+        image_format = 'avif' if b'avif' in data[8:40] or b'avis' in data[8:40] else 'heic'
+        position = data.find(b'ispe')
+        if position != -1 and len(data) >= position + 16:
+            return (image_format, *struct.unpack('>II', data[position + 8:position + 16]))
+        return None
+    if b'<svg' in data[:4096]:
+        return 'svg', None, None
+    return None
+
+# JPEG: se saltan los segmentos (EXIF, ICC...) hasta el primer SOF, que lleva alto y ancho
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def read_jpeg_header(data):
+    position = 2
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            return 'jpeg', None, None  # estructura inesperada: formato conocido, dimensiones no
+        marker = data[position + 1]
+        if marker == 0xFF:
+            position += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            position += 2
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            if position + 9 > len(data):
+                return None
+            height, width = struct.unpack('>HH', data[position + 5:position + 9])
+            return 'jpeg', width, height
+        position += 2 + int.from_bytes(data[position + 2:position + 4], 'big')
+    return None
+
+IMAGE_SIGNATURES = ((b'\x89PNG', 'png'), (b'GIF8', 'gif'), (b'\xff\xd8', 'jpeg'), (b'RIFF', 'webp'), (b'BM', 'bmp'), (b'\x00\x00\x01\x00', 'ico'))
+
+# Tamaño total de la imagen según las cabeceras: Content-Range de una respuesta 206 o Content-Length si el
+# servidor ignora Range y manda la imagen entera (None si no lo dice)
+def image_total_size(response):
+    if response.status_code == 206:
+        match = re.search(r'/(\d+)\s*$', response.headers.get('Content-Range', ''))
+        return int(match.group(1)) if match else None
+    content_length = response.headers.get('Content-Length')
+    if content_length and content_length.isdigit() and not response.headers.get('Content-Encoding'):
+        return int(content_length)
+    return None
+
+# Lee solo el principio de la imagen (Range) y deja de leer en cuanto tiene formato y dimensiones
+def audit_image(url):
+    image = dict(new_asset_result(url, 'img'), bytes=None, format=None, width=None, height=None)
+    try:
+        with http_client.stream(url, chunk_size=4096, headers={'Range': f'bytes=0-{IMAGE_PROBE_BYTES - 1}'}, kind='image') as (response, chunks):
+            image["status"] = response.status_code
+            if response.status_code in (200, 206):
+                image["bytes"] = image_total_size(response)
+                header = b''
+                info = None
+                for chunk in chunks:
+                    header += chunk
+                    info = read_image_header(header)
+                    if info or len(header) >= IMAGE_PROBE_BYTES:
+                        break
+                if info is None:
+                    info = (next((image_format for signature, image_format in IMAGE_SIGNATURES if header.startswith(signature)), None), None, None)
+                image["format"], image["width"], image["height"] = info
+                image["status"] = 200
+    except requests.exceptions.RequestException as e:
+        image["error"] = str(e)
+    return image
+
+# Ancho o alto de un atributo de <img> en píxeles ("300" o "300px"); None si falta o es relativo ("50%")
+def image_attribute_pixels(value):
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*(?:px)?\s*', value or '')
+    return float(match.group(1)) if match else None
+
+# Imágenes de la página ([src, width, height] de cada <img>) como URLs absolutas sin repetir: [[URL, width, height]]
+def page_image_refs(base_url, images):
+    image_refs = {}
+    for src, width, height in images:
+        image_url = urljoin(base_url, src).split('#')[0]
+        if urlparse(image_url).scheme in ('http', 'https'):
+            image_refs.setdefault(image_url, [image_url, width, height])
+    return list(image_refs.values())
+
+# Hallazgos de imágenes de una página a partir de los resultados compartidos de asset_audit_cache y peso total de
+# sus imágenes: (problemas, {"images", "bytes", "unknown"})
+def find_image_problems(image_refs):
+    problems = {
+        "Imágenes pesadas": [],
+        "Imágenes sobredimensionadas": [],
+        "Peso de imágenes de la página": []
+    }
+    if not IMAGE_AUDIT or not image_refs:
+        return problems, {"images": len(image_refs), "bytes": 0, "unknown": len(image_refs)}
+    images = fetch_all(lambda image_ref: asset_audit_cache.get(image_ref[0], 'img'), image_refs, url_of=lambda image_ref: image_ref[0])
+    total_bytes = unknown = 0
+    for image, (image_url, width, height) in zip(images, image_refs):
+        if image["bytes"] is None:
+            unknown += 1
+        else:
+            total_bytes += image["bytes"]
+            if image["bytes"] > IMAGE_MAX_BYTES:
+                problems["Imágenes pesadas"].append(f"{image_url} ({image['bytes'] / 1024:.1f} KB, {image['format'] or 'formato desconocido'})")
+        shown_width, shown_height = image_attribute_pixels(width), image_attribute_pixels(height)
+        if image["width"] and (shown_width or shown_height):
+            if (shown_width and image["width"] > IMAGE_OVERSIZE_FACTOR * shown_width) or (shown_height and image["height"] > IMAGE_OVERSIZE_FACTOR * shown_height):
+                shown = f"{width or '?'}x{height or '?'}"
+                problems["Imágenes sobredimensionadas"].append(f"{image_url} | {image['width']}x{image['height']} px mostrada a {shown}")
+    if total_bytes > IMAGE_PAGE_MAX_BYTES:
+        problems["Peso de imágenes de la página"].append(f"{len(image_refs)} imágenes, {total_bytes / 1024:.1f} KB en total (límite: {IMAGE_PAGE_MAX_BYTES // 1024} KB)")
+    return problems, {"images": len(image_refs), "bytes": total_bytes, "unknown": unknown}
+
 #check idioma
 def check_language_attribute(soup):
     html_tag = soup.find('html')
@@ -150,78 +1365,132 @@ def get_page_content_hash(soup):
     content_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
     return content_hash
 
-def check_duplicate_content(internal_links):
-    content_hashes = {}
-    urls_checked = []
-
-    for url in internal_links:
-        try:
-            response = get_with_retries(url)
-            if response:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                text_content = soup.get_text(separator=' ', strip=True)
-                cleaned_content = clean_content(text_content)
-                content_hash = hashlib.md5(cleaned_content.encode('utf-8')).hexdigest()
-                content_hashes[url] = content_hash
-                urls_checked.append(url)
-        except Exception as e:
-            print(f"Error al analizar el contenido de {url}: {e}")
-
-    duplicate_content_issues = []
-    for i in range(len(urls_checked)):
-        for j in range(i + 1, len(urls_checked)):
-            if content_hashes[urls_checked[i]] == content_hashes[urls_checked[j]]:
-                duplicate_content_issues.append((urls_checked[i], urls_checked[j]))
-
-    return duplicate_content_issues
-
-# Comprueba tiempo en cargarse
-def get_page_load_time(url):
-    start_time = time.time()
-    response = get_with_retries(url)
-    load_time = time.time() - start_time
-    return load_time
-
-# Verificar el uso de ARIA roles en elementos interactivos
-def check_aria_roles(soup):
-    problems = []
-    # Elementos interactivos por defecto que no requieren rol ARIA
-    interactive_elements = ['button', 'a', 'input', 'textarea', 'select', 'option']
-
-    # Buscar todos los elementos
-    elements = soup.find_all(True)
-
-    for element in elements:
-        # Si el elemento tiene algún atributo ARIA, no lo consideramos un problema
-        if any(attr.startswith('aria-') for attr in element.attrs):
-            continue
-        
-        # Si el elemento es interactivo por defecto y no tiene un rol ARIA, no lo consideramos un problema
-        if element.name in interactive_elements:
-            continue
-        
-        # Verificar si el elemento tiene un evento interactivo que lo haría relevante para ARIA roles
-        if (element.get('onclick') or element.get('onkeydown') or element.get('onkeypress')):
-            element_info = f"{element.name} | Class: {element.get('class')}" if element.get('class') else f"{element.name} | ID: {element.get('id')}"
-            problems.append(f"Elemento interactivo sin rol ARIA: {element_info}")
-
-    return problems
-
+# Contenido casi duplicado ##########################################
+_HASH_MASK = (1 << 64) - 1
 
-# Verificar accesibilidad de tablas
-def check_table_accessibility(soup):
-    problems = []
-    tables = soup.find_all('table')
-    for table in tables:
-        if not table.find('thead'):
-            problems.append(f"Tabla sin thead: {str(table)[:100]}")
-        if not table.find('tbody'):
-            problems.append(f"Tabla sin tbody: {str(table)[:100]}")
-        th_elements = table.find_all('th')
-        for th in th_elements:
-            if not th.get('scope'):
-                problems.append(f"th sin scope: {str(th)[:100]}")
-    return problems
+# Hashes de 64 bits de los shingles de palabras del texto (blake2b: estable entre ejecuciones y procesos)
+def get_shingle_hashes(text, shingle_size=SHINGLE_SIZE):
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < shingle_size:
+        shingles = [' '.join(words)] if words else []
+    else:
+        shingles = [' '.join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+    return {int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little') for shingle in shingles}
+
+# Elige bandas x filas (bandas * filas = tamaño de firma) cuyo umbral LSH (1/b)^(1/r) quede más cerca del umbral pedido
+def get_lsh_bands(threshold, signature_size):
+    candidates = [(signature_size // rows, rows) for rows in range(1, signature_size + 1) if signature_size % rows == 0]
+    return min(candidates, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+# MinHash de una sola permutación: cada shingle cae en un hueco según su hash y el hueco guarda el mínimo.
+# Los huecos vacíos copian el siguiente hueco ocupado (densificación por rotación), así que el coste es
+# lineal en el número de shingles en lugar de shingles x permutaciones.
+def minhash_signature(text, size=MINHASH_SIZE):
+    shingles = get_shingle_hashes(text)
+    if not shingles:
+        return None
+    bins = [None] * size
+    for h in shingles:
+        slot, value = h % size, h // size
+        if bins[slot] is None or value < bins[slot]:
+            bins[slot] = value
+    step = _HASH_MASK // size
+    signature = array('Q', bytes(8 * size))
+    for slot in range(size):
+        distance = 0
+        while bins[(slot + distance) % size] is None:
+            distance += 1
+        signature[slot] = (bins[(slot + distance) % size] + distance * step) & _HASH_MASK
+    return signature
+
+# Índice LSH de firmas MinHash: solo las páginas que coinciden en alguna banda se comparan entre sí,
+# así que el coste crece con el número de candidatos y no con el cuadrado del número de páginas.
+class NearDuplicateIndex:
+    def __init__(self, threshold=NEAR_DUPLICATE_THRESHOLD, signature_size=MINHASH_SIZE):
+        self.threshold = threshold
+        self.signature_size = signature_size
+        self.bands, self.rows = get_lsh_bands(threshold, signature_size)
+        self.signatures = {}
+        self.buckets = [{} for _ in range(self.bands)]
+        self.lock = threading.Lock()
+
+    def signature(self, text):
+        return minhash_signature(text, self.signature_size)
+
+    def add(self, url, text):
+        signature = self.signature(text)
+        if signature is not None:
+            self.add_signature(url, signature)
+
+    def add_signature(self, url, signature):
+        with self.lock:
+            self.signatures[url] = signature
+            for band, buckets in enumerate(self.buckets):
+                key = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+                buckets.setdefault(key, []).append(url)
+
+    # Parejas candidatas (comparten al menos una banda) con su similitud estimada >= umbral
+    def similar_pairs(self):
+        candidates = set()
+        for buckets in self.buckets:
+            for urls in buckets.values():
+                for i in range(len(urls)):
+                    for j in range(i + 1, len(urls)):
+                        candidates.add((urls[i], urls[j]) if urls[i] < urls[j] else (urls[j], urls[i]))
+        for url_a, url_b in candidates:
+            sig_a, sig_b = self.signatures[url_a], self.signatures[url_b]
+            similarity = sum(1 for x, y in zip(sig_a, sig_b) if x == y) / self.signature_size
+            if similarity >= self.threshold:
+                yield url_a, url_b, similarity
+
+# Índice de contenido de todo el rastreo: hash del texto limpio -> URLs con ese texto.
+# Cada página se añade una sola vez, a partir de la respuesta que ya se descargó para analizarla.
+class ContentHashIndex:
+    def __init__(self, near_duplicates=NEAR_DUPLICATE_DETECTION):
+        self.urls_by_hash = {}
+        self.near_index = NearDuplicateIndex() if near_duplicates else None
+        self.lock = threading.Lock()
+
+    def add(self, url, soup):
+        content_hash, signature = page_content_features(soup, self.near_index.signature_size if self.near_index is not None else None)
+        self.add_hashes(url, content_hash, signature)
+        return content_hash
+
+    # Para páginas reutilizadas de la ejecución anterior: se registran sus hashes sin volver a parsearlas
+    def add_hashes(self, url, content_hash, signature=None):
+        with self.lock:
+            self.urls_by_hash.setdefault(content_hash, []).append(url)
+        if self.near_index is not None and signature:
+            self.near_index.add_signature(url, signature if isinstance(signature, array) else array('Q', signature))
+
+    def signature_of(self, url):
+        if self.near_index is None:
+            return None
+        signature = self.near_index.signatures.get(url)
+        return list(signature) if signature is not None else None
+
+# Hash del texto limpio y firma MinHash (si signature_size) de una página; no toca el índice, así que puede
+# calcularse en otro proceso y registrarse después con add_hashes
+def page_content_features(soup, signature_size=None):
+    cleaned_content = clean_content(soup.get_text(separator=' ', strip=True))
+    content_hash = hashlib.md5(cleaned_content.encode('utf-8')).hexdigest()
+    signature = minhash_signature(cleaned_content, signature_size) if signature_size else None
+    return content_hash, signature
+
+# Recorre los grupos de hash una vez y devuelve cada grupo con más de una URL (URLs ordenadas)
+def check_duplicate_content(content_index):
+    return sorted(sorted(urls) for urls in content_index.urls_by_hash.values() if len(urls) > 1)
+
+# Parejas casi duplicadas del índice LSH: [(URL, otra URL, similitud)], cada pareja una vez y sin las idénticas
+def check_near_duplicate_content(content_index):
+    if content_index.near_index is None:
+        return []
+    hash_by_url = {url: content_hash for content_hash, urls in content_index.urls_by_hash.items() for url in urls}
+    return sorted(
+        ((url_a, url_b, similarity) for url_a, url_b, similarity in content_index.near_index.similar_pairs()
+         if hash_by_url.get(url_a) != hash_by_url.get(url_b)),
+        key=lambda pair: (-pair[2], pair[0], pair[1])
+    )
 
 color_names = {
     'black': '#000000',
@@ -241,15 +1510,27 @@ color_names = {
     'teal': '#008080',
     'navy': '#000080'
 }
-# Function to calculate the contrast ratio
+# Luminancia relativa WCAG de un color (r, g, b) con componentes entre 0 y 1
+def relative_luminance(rgb):
+    r, g, b = (c / 12.92 if c <= 0.03928 else ((c + 0.055) / 1.055) ** 2.4 for c in rgb)
+    return 0.2126 * r + 0.7152 * g + 0.0722 * b
+
+# Function to calculate the contrast ratio (WCAG) between two (r, g, b) colors
 def contrast_ratio(color1, color2):
-    l1 = color1.get_luminance() + 0.05
-    l2 = color2.get_luminance() + 0.05
+    l1 = relative_luminance(color1) + 0.05
+    l2 = relative_luminance(color2) + 0.05
     if l1 > l2:
         return l1 / l2
     else:
         return l2 / l1
-    
+
+# Lo mismo para muchos pares a la vez: [((r, g, b), (r, g, b))] -> [contraste]
+def batch_contrast_ratios(rgb_pairs):
+    values = numpy.array(rgb_pairs, dtype=float)
+    linear = numpy.where(values <= 0.03928, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+    luminance = linear @ numpy.array([0.2126, 0.7152, 0.0722]) + 0.05
+    return (luminance.max(axis=1) / luminance.min(axis=1)).tolist()
+
 # Function to convert hex color to Color object
 def hex_to_color(color_value):
     try:
@@ -262,270 +1543,869 @@ def hex_to_color(color_value):
             color_value = f'#{color_value}'
         
         return Color(color_value)
-    except ValueError:
+    except (ValueError, AttributeError):  # colour lanza AttributeError con formatos como rgb()
         return None  # Devolver None si el color no es válido
 
-def get_style_property(element, property):
-    style = element.get('style')
-    if style:
-        styles = style.split(';')
-        for s in styles:
-            if property in s:
-                return s.split(':')[1].strip()
-    return None
+CSS_COLOR_FUNCTION = re.compile(r'(rgba?|hsla?)\(\s*([^()]*)\)', re.I)
+CSS_HUE_UNITS = {'deg': 1, 'grad': 0.9, 'rad': 180 / math.pi, 'turn': 360}
+
+# Valor CSS de un color -> ((r, g, b) entre 0 y 1, opacidad entre 0 y 1), o None si no es válido. Entiende #rgb(a),
+# #rrggbb(aa), los nombres de color, transparent y rgb()/rgba()/hsl()/hsla() con comas o con espacios y "/".
+# Una página usa pocos colores distintos, así que se memoriza en lugar de construir un Color por elemento.
+@lru_cache(maxsize=1024)
+def parse_color_alpha(color_value):
+    value = color_value.strip().lower()
+    if value == 'transparent':
+        return (0.0, 0.0, 0.0), 0.0
+    match = CSS_COLOR_FUNCTION.fullmatch(value)
+    if match:
+        components = [component for component in re.split(r'[\s,/]+', match.group(2).strip()) if component]
+        if len(components) not in (3, 4):
+            return None
+        try:
+            if match.group(1).startswith('rgb'):
+                rgb = tuple(min(max(float(c[:-1]) / 100 if c.endswith('%') else float(c) / 255, 0.0), 1.0) for c in components[:3])
+            else:
+                hue_match = re.fullmatch(r'(-?\d*\.?\d+)(deg|grad|rad|turn)?', components[0])
+                if not hue_match:
+                    return None
+                hue = float(hue_match.group(1)) * CSS_HUE_UNITS[hue_match.group(2) or 'deg'] % 360 / 360
+                saturation, lightness = (min(max(float(c.rstrip('%')) / 100, 0.0), 1.0) for c in components[1:3])
+                rgb = colorsys.hls_to_rgb(hue, lightness, saturation)
+            alpha = components[3] if len(components) == 4 else '1'
+            alpha = min(max(float(alpha[:-1]) / 100 if alpha.endswith('%') else float(alpha), 0.0), 1.0)
+        except ValueError:
+            return None
+        return rgb, alpha
+    hex_digits = value.lstrip('#')
+    if len(hex_digits) in (4, 8) and re.fullmatch(r'[0-9a-f]+', hex_digits):
+        # Con opacidad: el último (o los dos últimos) dígitos
+        size = len(hex_digits) // 4
+        color = hex_to_color(hex_digits[:-size])
+        return (color.get_rgb(), int(hex_digits[-size:] * (3 - size), 16) / 255) if color else None
+    color = hex_to_color(value)
+    if color is None and value.isalpha():
+        try:
+            color = Color(value)  # nombres de color que no están en color_names
+        except ValueError:
+            color = None
+    return (color.get_rgb(), 1.0) if color else None
+
+# Solo (r, g, b), sin opacidad
+def parse_color(color_value):
+    parsed = parse_color_alpha(color_value)
+    return parsed[0] if parsed else None
+
+# Colores que dependen de variables u otras funciones que no se calculan aquí (var(), color-mix(), env()...): su
+# contraste no se evalúa, pero tampoco son colores no válidos
+def color_is_unresolved(color_value):
+    lowered = color_value.lower()
+    return 'var(' in lowered or 'env(' in lowered or re.match(r'\s*(?!(?:rgba?|hsla?)\()[\w-]+\(', lowered) is not None
+
+# Mezcla un color con opacidad sobre el que tiene debajo
+def blend_color(rgb, alpha, below):
+    return tuple(alpha * channel + (1 - alpha) * below_channel for channel, below_channel in zip(rgb, below))
+
+# Contraste de cada par (color, fondo) memorizado durante todo el rastreo (en modo pipeline, en cada proceso),
+# con un máximo de max_size pares: se descartan los usados hace más tiempo
+class ContrastCache:
+    def __init__(self, max_size=CONTRAST_CACHE_SIZE):
+        self.max_size = max_size
+        self.ratios = OrderedDict()  # (color, fondo) -> contraste, o None si alguno de los colores no es válido
+        self.lock = threading.Lock()
+
+    # Devuelve ({par: contraste}, pares que no estaban guardados); los que faltan se calculan juntos
+    def lookup(self, pairs):
+        results = {}
+        with self.lock:
+            for pair in pairs:
+                if pair in self.ratios:
+                    self.ratios.move_to_end(pair)
+                    results[pair] = self.ratios[pair]
+        missing = [pair for pair in pairs if pair not in results]
+        if missing:
+            computed = compute_contrast_ratios(missing)
+            results.update(computed)
+            with self.lock:
+                self.ratios.update(computed)
+                while len(self.ratios) > self.max_size:
+                    self.ratios.popitem(last=False)
+        return results, len(missing)
+
+contrast_cache = ContrastCache()
+
+# Contraste de varios pares (color, fondo): None si alguno de los colores no es válido. Un fondo semitransparente
+# se mezcla sobre blanco y el texto semitransparente sobre ese fondo.
+def compute_contrast_ratios(pairs):
+    rgb_pairs = {}
+    for pair in pairs:
+        color, background = parse_color_alpha(pair[0]), parse_color_alpha(pair[1])
+        if color is not None and background is not None:
+            background_rgb = blend_color(*background, (1.0, 1.0, 1.0))
+            rgb_pairs[pair] = (blend_color(*color, background_rgb), background_rgb)
+    valid = list(rgb_pairs)
+    if CONTRAST_NUMPY and numpy is not None and len(valid) > 1:
+        ratios = batch_contrast_ratios([rgb_pairs[pair] for pair in valid])
+    else:
+        ratios = [contrast_ratio(*rgb_pairs[pair]) for pair in valid]
+    results = dict.fromkeys(pairs)
+    results.update(zip(valid, ratios))
+    return results
+
+
+# Cascada CSS ##########################################
+# Solo se compilan las declaraciones que usa la comprobación de tamaño de fuente y contraste (los atajos
+# background y font se reducen a background-color y font-size); las reglas sin ninguna se descartan al compilar.
+CASCADE_PROPERTIES = ('color', 'background-color', 'font-size')
+DEFAULT_FONT_SIZE = 16.0
+DEFAULT_COLOR = '#000000'
+DEFAULT_BACKGROUND = '#ffffff'
+FONT_SIZE_KEYWORDS = {'xx-small': 9.0, 'x-small': 10.0, 'small': 13.0, 'medium': 16.0, 'large': 18.0, 'x-large': 24.0, 'xx-large': 32.0, 'xxx-large': 48.0}
+FONT_SIZE_PATTERN = re.compile(r'(?<![\w.-])(\d*\.?\d+)(px|pt|em|rem|%)(?![\w-])|(?<![\w-])(xx-small|x-small|small|medium|large|x-large|xx-large|xxx-large|smaller|larger)(?![\w-])', re.I)
+CSS_KEYWORDS = ('inherit', 'initial', 'unset', 'revert')
+# Pseudoclases de interacción y pseudoelementos: no cambian el texto del elemento en reposo
+INTERACTIVE_SELECTOR = re.compile(r':(?:hover|focus|focus-within|focus-visible|active|visited|target)\b|::?(?:before|after|first-line|first-letter|placeholder|selection|marker|backdrop)\b', re.I)
+
+# Un selector de una hoja compilada. El selector de soupsieve se compila la primera vez que hace falta: en hojas
+# grandes la mayoría de reglas nunca pasan de los filtros del índice.
+class CssRule:
+    __slots__ = ('selector', 'specificity', 'order', 'declarations', 'ancestor_keys', 'matcher')
+
+    def __init__(self, selector, order, declarations, ancestor_keys):
+        self.selector = selector
+        self.specificity = selector_specificity(selector)
+        self.order = order
+        self.declarations = declarations
+        self.ancestor_keys = ancestor_keys
+        self.matcher = None
+
+    def matches(self, element, scope):
+        # Filtro de antepasados: si el selector exige un .clase, #id o etiqueta que no está en ningún antepasado,
+        # no puede coincidir y ni siquiera se evalúa
+        if not self.ancestor_keys <= scope:
+            return False
+        if self.matcher is None:
+            try:
+                self.matcher = soupsieve.compile(self.selector)
+            except Exception:
+                self.matcher = False  # selector no soportado (o inválido): el navegador también ignoraría la regla
+        return bool(self.matcher) and self.matcher.match(element)
+
+# Reglas de una hoja de estilo indexadas por la clave ('#id', '.clase', etiqueta o '*') del último compuesto de su
+# selector y, si el selector exige antepasados, también por una de las claves que deben tener (la más selectiva),
+# de modo que cada elemento solo comprueba los selectores que pueden coincidir con él y con sus antepasados
+class CompiledStylesheet:
+    def __init__(self):
+        self.imports = []
+        self.rule_count = 0
+        self.rules = {}     # clave del sujeto -> [CssRule sin antepasados exigidos]
+        self.anchored = {}  # clave del sujeto -> {clave de antepasado -> [CssRule]}
+
+    def add(self, selector, declarations):
+        subject_key, ancestor_keys = selector_keys(selector)
+        rule = CssRule(selector, self.rule_count, declarations, ancestor_keys)
+        self.rule_count += 1
+        if ancestor_keys:
+            anchor = min(ancestor_keys, key=lambda key: ('#.'.find(key[0]) % 3, key))
+            self.anchored.setdefault(subject_key, {}).setdefault(anchor, []).append(rule)
+        else:
+            self.rules.setdefault(subject_key, []).append(rule)
+
+    def candidates(self, subject_keys, scope):
+        for subject_key in subject_keys:
+            yield from self.rules.get(subject_key, ())
+            anchored = self.anchored.get(subject_key)
+            if anchored:
+                if len(anchored) < len(scope):
+                    for anchor, rules in anchored.items():
+                        if anchor in scope:
+                            yield from rules
+                else:
+                    for anchor in scope:
+                        yield from anchored.get(anchor, ())
+
+# (ids, clases/atributos/pseudoclases, etiquetas/pseudoelementos), aproximada sobre el texto del selector
+def selector_specificity(selector):
+    selector = re.sub(r'\\.', 'x', selector)
+    selector = re.sub(r'"[^"]*"|\'[^\']*\'', '', selector)
+    selector = re.sub(r'\[[^\]]*\]', '[]', selector)
+    ids = selector.count('#')
+    classes = selector.count('.') + selector.count('[]') + len(re.findall(r'(?<!:):(?!not\(|is\(|where\(|has\()[\w-]+', selector))
+    types = len(re.findall(r'(?:^|[\s>+~(,])[a-zA-Z][\w-]*', selector)) + len(re.findall(r'::[\w-]+', selector))
+    return (0, ids, classes, types)
+
+# Claves ('#id', '.clase', 'etiqueta') de un compuesto del selector
+def compound_keys(compound):
+    if '\\' in compound:
+        return []  # con escapes el nombre no coincidiría con el del elemento
+    keys = ['#' + value for value in re.findall(r'#(-?[\w-]+)', compound)]
+    keys += ['.' + value for value in re.findall(r'\.(-?[\w-]+)', compound)]
+    match = re.match(r'[a-zA-Z][\w-]*', compound)
+    if match:
+        keys.append(match.group(0).lower())
+    return keys
+
+# Claves de un elemento en el mismo formato que compound_keys
+def element_keys(element):
+    keys = [element.name]
+    if element.get('id'):
+        keys.append('#' + element['id'])
+    keys += ['.' + class_name for class_name in element.get('class') or ()]
+    return keys
+
+# Clave de índice del último compuesto del selector ('#id', '.clase', etiqueta o '*') y claves que deben estar entre
+# los antepasados del elemento, sacadas de los compuestos unidos por combinadores de descendiente o hijo (a partir
+# de un + o ~ el compuesto ya no es un antepasado)
+def selector_keys(selector):
+    parts = re.split(r'\s*([>+~])\s*|\s+', re.sub(r'\[[^\]]*\]|\([^)]*\)', '', selector).strip())
+    compounds, combinators = parts[0::2], parts[1::2]
+    ancestor_keys = set()
+    for compound, combinator in zip(reversed(compounds[:-1]), reversed(combinators)):
+        if combinator in ('+', '~'):
+            break
+        ancestor_keys.update(compound_keys(compound))
+    subject_keys = compound_keys(compounds[-1])
+    subject_key = min(subject_keys, key=lambda key: '#.'.find(key[0]) % 3) if subject_keys else '*'
+    return subject_key, frozenset(ancestor_keys)
+
+# Si una lista de media queries se aplica en una pantalla de CSS_VIEWPORT_WIDTH px: solo se evalúan el tipo y
+# min-width/max-width, el resto de condiciones se dan por cumplidas
+def media_applies(media_text):
+    if not media_text.strip():
+        return True
+    for query in media_text.lower().split(','):
+        query = re.sub(r'^\s*only\s+', '', query).strip()
+        if not query or query.startswith('not '):
+            continue
+        media_type = 'all' if query.startswith('(') else query.split()[0]
+        if media_type not in ('all', 'screen'):
+            continue
+        applies = True
+        for feature, number, unit in re.findall(r'\((min|max)-width\s*:\s*(\d*\.?\d+)(px|em|rem)?\s*\)', query):
+            width = float(number) * (DEFAULT_FONT_SIZE if unit in ('em', 'rem') else 1)
+            if feature == 'min' and CSS_VIEWPORT_WIDTH < width or feature == 'max' and CSS_VIEWPORT_WIDTH > width:
+                applies = False
+        if applies:
+            return True
+    return False
 
-def check_font_size_and_contrast(soup):
+# Color de un atajo background (transparent si no lleva ninguno, como en CSS)
+def background_shorthand_color(value):
+    for token in re.findall(r'[\w-]+\([^)]*\)|\S+', value):
+        lowered = token.lower()
+        if lowered in CSS_KEYWORDS or lowered in ('transparent', 'currentcolor') or lowered.startswith(('rgb', 'hsl', 'var(')) or parse_color(token):
+            return token
+    return 'transparent'
+
+# [(propiedad, valor, !important)] de un bloque de declaraciones, solo con CASCADE_PROPERTIES. Los bloques que no
+# mencionan ninguna ni se parsean; el resto se memoriza por texto porque los mismos bloques se repiten mucho.
+@lru_cache(maxsize=4096)
+def cascade_declarations(block):
+    lowered_block = block.lower()
+    if 'color' not in lowered_block and 'background' not in lowered_block and 'font' not in lowered_block:
+        return ()
+    declarations = []
+    for property in cssutils.CSSParser(fetcher=None, validate=False).parseStyle(block):
+        name, value = property.name.lower(), property.value.strip()
+        if name == 'background':
+            name, value = 'background-color', background_shorthand_color(value)
+        elif name == 'font':
+            match = FONT_SIZE_PATTERN.search(value)
+            if value.lower() in CSS_KEYWORDS:
+                name = 'font-size'
+            elif match:
+                name, value = 'font-size', match.group(0)
+        if name in CASCADE_PROPERTIES:
+            declarations.append((name, value, property.priority == 'important'))
+    return tuple(declarations)
+
+CSS_COMMENT = re.compile(r'/\*.*?(?:\*/|$)', re.S)
+CSS_TOKEN = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|[{};()]')
+
+# Sentencias del primer nivel de un texto CSS: (preludio, bloque) de las reglas con llaves y (preludio, None) de
+# las que terminan en punto y coma (@import, @charset...). Ignora llaves y puntos y coma dentro de cadenas o
+# paréntesis, como en url(data:...;base64,...).
+# No se usa el árbol de cssutils para la hoja entera: leer selectorText de cada selector recorre todas las reglas
+# de la hoja en busca de @namespace, lo que hace la compilación cuadrática en hojas grandes.
+def iter_css_statements(css_text):
+    start = prelude_end = 0
+    depth = parens = 0
+    for match in CSS_TOKEN.finditer(css_text):
+        token = match.group()
+        if token == '(':
+            parens += 1
+        elif token == ')':
+            parens = max(parens - 1, 0)
+        elif parens or len(token) > 1:
+            continue
+        elif token == '{':
+            if depth == 0:
+                prelude_end = match.start()
+            depth += 1
+        elif token == '}':
+            depth -= 1
+            if depth == 0:
+                yield css_text[start:prelude_end].strip(), css_text[prelude_end + 1:match.start()]
+            depth = max(depth, 0)
+            if depth == 0:
+                start = match.end()
+        elif depth == 0:
+            yield css_text[start:match.start()].strip(), None
+            start = match.end()
+
+# Divide una lista separada por comas (de selectores) respetando paréntesis, corchetes y cadenas
+def split_css_list(text):
+    items = []
+    start = depth = 0
+    quote = None
+    for position, char in enumerate(text):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth <= 0:
+            items.append(text[start:position].strip())
+            start = position + 1
+    items.append(text[start:].strip())
+    return [item for item in items if item]
+
+def compile_css_rules(sheet, css_text):
+    for prelude, block in iter_css_statements(css_text):
+        if prelude.startswith('@'):
+            at_keyword = re.match(r'@([\w-]*)', prelude).group(1).lower()
+            if at_keyword == 'import' and block is None:
+                match = re.match(r'@import\s+(?:url\(\s*)?["\']?([^"\')\s]+)["\']?\s*\)?\s*(.*)$', prelude, re.S | re.I)
+                if match and media_applies(match.group(2)):
+                    sheet.imports.append(match.group(1))
+            elif at_keyword == 'media' and block is not None:
+                if media_applies(prelude[len('@media'):]):
+                    compile_css_rules(sheet, block)
+            elif at_keyword in ('supports', 'layer', 'container') and block is not None:
+                compile_css_rules(sheet, block)  # se dan por cumplidas; @font-face, @keyframes, @page... no estilan elementos
+        elif block is not None and prelude:
+            declarations = cascade_declarations(block)
+            if declarations:
+                for selector in split_css_list(prelude):
+                    if not INTERACTIVE_SELECTOR.search(selector):
+                        sheet.add(selector, declarations)
+
+# Compila el texto de una hoja de estilo. Se memoriza por texto: los bloques <style> que se repiten en todas las
+# páginas de un sitio se compilan una sola vez.
+@lru_cache(maxsize=256)
+def compile_stylesheet(css_text):
+    sheet = CompiledStylesheet()
+    compile_css_rules(sheet, CSS_COMMENT.sub('', css_text))
+    return sheet
+
+# Hojas de estilo externas (<link rel="stylesheet"> e @import): cada URL se descarga y se compila una sola vez por
+# rastreo, y las páginas que la piden a la vez esperan a la primera descarga. De la misma descarga sale la
+# auditoría de minificación de la hoja (audit), para no pedirla otra vez desde audit_asset. En modo pipeline solo
+# descarga el proceso principal (prefetch_page_stylesheets); los procesos de análisis reciben el texto de las
+# hojas con cada página y lo compilan una vez por proceso con compile.
+class StylesheetCache:
+    def __init__(self):
+        self.sheets = {}    # URL -> Future con (CompiledStylesheet o None, resultado como el de audit_asset, texto o None)
+        self.compiled = {}  # URL -> CompiledStylesheet o None, de los textos recibidos en modo pipeline
+        self.lock = threading.Lock()
+
+    def fetch(self, url):
+        with self.lock:
+            future = self.sheets.get(url)
+            owner = future is None
+            if owner:
+                future = self.sheets[url] = Future()
+        if owner:
+            sheet = text = None
+            asset = new_asset_result(url, 'css')
+            try:
+                response = http_client.get(url, kind='stylesheet')
+                asset["status"] = response.status_code
+                asset["encoding"] = response.headers.get('Content-Encoding')
+                if response.status_code == 200:
+                    probe = MinificationProbe()
+                    probe.feed(response.content)
+                    asset["bytes"] = probe.size
+                    asset["minified"] = probe.minified()
+                    text = response.text
+                    sheet = compile_stylesheet(text)
+            except requests.exceptions.RequestException as e:
+                asset["error"] = str(e)
+            except Exception:
+                pass  # una hoja que no se puede compilar se ignora, como haría el navegador
+            future.set_result((sheet, asset, text))
+        return future.result()
+
+    def get(self, url):
+        return self.fetch(url)[0]
+
+    def audit(self, url):
+        return self.fetch(url)[1]
+
+    def text(self, url):
+        return self.fetch(url)[2]
+
+    # Modo pipeline, en los procesos de análisis: hoja ya descargada por el proceso principal (None si no llegó)
+    def compile(self, url, text):
+        if text is None:
+            return None
+        with self.lock:
+            if url in self.compiled:
+                return self.compiled[url]
+        try:
+            sheet = compile_stylesheet(text)
+        except Exception:
+            sheet = None
+        with self.lock:
+            self.compiled[url] = sheet
+        return sheet
+
+stylesheet_cache = StylesheetCache()
+
+# Hojas de estilo de una página en orden de cascada a partir de sus elementos <style> y <link rel="stylesheet">;
+# las importadas con @import van justo antes de la hoja que las importa
+def page_stylesheets(base_url, sources, load_stylesheet):
+    sheets = []
+
+    def add_imports(sheet, sheet_url, depth):
+        for href in sheet.imports:
+            import_url = urljoin(sheet_url or '', href).split('#')[0]
+            imported = load_external_stylesheet(import_url, load_stylesheet) if depth < 3 else None
+            if imported is not None:
+                add_imports(imported, import_url, depth + 1)
+                sheets.append(imported)
+
+    for source in sources:
+        if not media_applies(source.get('media') or ''):
+            continue
+        if source.name == 'style':
+            sheet, sheet_url = compile_stylesheet(source.string or ''), base_url
+        else:
+            sheet_url = urljoin(base_url or '', source.get('href') or '').split('#')[0]
+            sheet = load_external_stylesheet(sheet_url, load_stylesheet)
+        if sheet is not None:
+            add_imports(sheet, sheet_url, 0)
+            sheets.append(sheet)
+    return sheets
+
+def load_external_stylesheet(url, load_stylesheet):
+    if not CSS_FETCH_EXTERNAL or urlparse(url).scheme not in ('http', 'https'):
+        return None
+    return load_stylesheet(url)
+
+HTML_LINK_OR_BASE = re.compile(r'<(link|base)\b((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>', re.I)
+HTML_ATTRIBUTE = re.compile(r'([^\s=/>]+)(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+))?')
+HTML_STYLE_ELEMENT = re.compile(r'<style\b[^>]*>(.*?)</style\s*>', re.I | re.S)
+CSS_IMPORT_URL = re.compile(r'@import\s+(?:url\(\s*)?["\']?([^"\')\s]+)', re.I)
+
+# Modo pipeline: descarga en el proceso principal (con stylesheet_cache, así que respeta el ritmo por host y cuenta
+# en las métricas) las hojas externas que usará la página y sus @import, con la misma profundidad que
+# page_stylesheets. Las URLs salen del HTML sin parsearlo; una hoja que no se encuentre aquí se ignora en el
+# análisis, como una que no se pudo descargar. Devuelve {URL: texto} para audit_page_content.
+def prefetch_page_stylesheets(url, content):
+    if not CSS_FETCH_EXTERNAL:
+        return {}
+    html_text = content.decode('utf-8', 'replace') if isinstance(content, bytes) else content
+    base_url, hrefs = url, []
+    for tag, attribute_text in HTML_LINK_OR_BASE.findall(html_text):
+        attributes = {name.lower(): unescape(value.strip('"\'')) for name, value in HTML_ATTRIBUTE.findall(attribute_text)}
+        if tag.lower() == 'base':
+            if base_url is url and attributes.get('href'):
+                base_url = urljoin(url, attributes['href'])
+        elif attribute_matches(attributes.get('rel'), 'stylesheet') and attributes.get('href') and media_applies(attributes.get('media') or ''):
+            hrefs.append(attributes['href'])
+    texts = {}
+
+    def fetch(sheet_url, import_depth):
+        if sheet_url in texts or urlparse(sheet_url).scheme not in ('http', 'https'):
+            return
+        texts[sheet_url] = stylesheet_cache.text(sheet_url)
+        sheet = stylesheet_cache.get(sheet_url)
+        if sheet is not None and import_depth < 3:
+            for href in sheet.imports:
+                fetch(urljoin(sheet_url, href).split('#')[0], import_depth + 1)
+
+    for href in hrefs:
+        fetch(urljoin(base_url, href).split('#')[0], 0)
+    for style in HTML_STYLE_ELEMENT.findall(html_text):
+        for href in CSS_IMPORT_URL.findall(CSS_COMMENT.sub('', style)):
+            fetch(urljoin(base_url, href).split('#')[0], 1)
+    return texts
+
+
+# Estilo calculado (tamaño de fuente en px, color, fondo efectivo) de los elementos de una página. color y font-size
+# se heredan; el fondo no, pero uno transparente deja ver el del antepasado, que es el que cuenta para el contraste.
+# Cada elemento se calcula una sola vez a partir del de su padre, junto con las claves (etiqueta, #id, .clase) de
+# él y sus antepasados que usa el filtro de antepasados de CssRule.
+class StyleResolver:
+    def __init__(self, stylesheets):
+        self.stylesheets = stylesheets
+        self.computed = {}  # id(elemento) -> ((font-size en px, color, fondo), claves del elemento y sus antepasados)
+        self.root_font_size = DEFAULT_FONT_SIZE
+
+    def style_of(self, element):
+        # De arriba abajo desde el primer antepasado ya calculado, sin recursión (el árbol puede ser muy profundo)
+        chain = []
+        node = element
+        while isinstance(node, Tag) and node.name != '[document]' and id(node) not in self.computed:
+            chain.append(node)
+            node = node.parent
+        parent_style, scope = self.computed.get(id(node), ((DEFAULT_FONT_SIZE, DEFAULT_COLOR, DEFAULT_BACKGROUND), frozenset()))
+        for node in reversed(chain):
+            parent_style = self.compute(node, parent_style, scope)
+            scope = scope.union(element_keys(node))
+            self.computed[id(node)] = (parent_style, scope)
+        return parent_style
+
+    def cascade(self, element, ancestor_scope):
+        winners = {}  # propiedad -> (prioridad, valor)
+        subject_keys = element_keys(element) + ['*']
+        for sheet_index, sheet in enumerate(self.stylesheets):
+            for rule in sheet.candidates(subject_keys, ancestor_scope):
+                if rule.matches(element, ancestor_scope):
+                    for name, value, important in rule.declarations:
+                        priority = (important, rule.specificity, sheet_index, rule.order)
+                        if name not in winners or priority >= winners[name][0]:
+                            winners[name] = (priority, value)
+        style = element.get('style')
+        if style:
+            # El atributo style gana a cualquier regla salvo a las !important
+            for name, value, important in cascade_declarations(style):
+                priority = (important, (1, 0, 0, 0), 0, 0)
+                if name not in winners or priority >= winners[name][0]:
+                    winners[name] = (priority, value)
+        return {name: value for name, (priority, value) in winners.items()}
+
+    def compute(self, element, parent_style, ancestor_scope):
+        parent_font_size, parent_color, parent_background = parent_style
+        declared = self.cascade(element, ancestor_scope)
+
+        font_size = resolve_font_size(declared.get('font-size'), parent_font_size, self.root_font_size)
+        if element.name == 'html':
+            self.root_font_size = font_size
+
+        color = declared.get('color', parent_color)
+        if color.lower() in ('inherit', 'unset', 'currentcolor'):
+            color = parent_color
+        elif color.lower() in ('initial', 'revert'):
+            color = DEFAULT_COLOR
+
+        background = declared.get('background-color', 'transparent')
+        if background.lower() == 'currentcolor':
+            background = color
+        elif background.lower() in ('transparent', 'none', 'inherit', 'initial', 'unset', 'revert'):
+            background = parent_background
+        return font_size, color, background
+
+# Tamaño de fuente en px a partir del valor declarado (None si no se declara y se hereda)
+def resolve_font_size(value, parent_font_size, root_font_size):
+    if value is None:
+        return parent_font_size
+    value = value.strip().lower()
+    if value in FONT_SIZE_KEYWORDS:
+        return FONT_SIZE_KEYWORDS[value]
+    if value == 'smaller':
+        return parent_font_size / 1.2
+    if value == 'larger':
+        return parent_font_size * 1.2
+    if value in ('initial', 'revert'):
+        return DEFAULT_FONT_SIZE
+    match = re.fullmatch(r'(\d*\.?\d+)(px|pt|em|rem|%)?', value)
+    if not match:
+        return parent_font_size  # inherit, calc(), var()...: se queda con el heredado
+    number, unit = float(match.group(1)), match.group(2)
+    if unit == 'pt':
+        return number * 4 / 3
+    if unit == 'em':
+        return number * parent_font_size
+    if unit == 'rem':
+        return number * root_font_size
+    if unit == '%':
+        return number * parent_font_size / 100
+    return number
+
+# Evalúa tamaño de fuente y contraste de los elementos de texto con el estilo calculado de cada uno. El contraste
+# se pide a contrast_cache una vez por par (color, fondo) distinto; si se pasa cache_stats, se suman ahí las
+# consultas (una por elemento) y los aciertos (las que no ha habido que calcular).
+def evaluate_font_size_and_contrast(stylesheets, elements, cache_stats=None):
     problems = {
         "Elementos con tamaño de fuente menor a 16px": [],
         "Elementos con buen contraste de color": []
     }
 
-    # Extraer y analizar estilos CSS
-    styles = soup.find_all('style')
-    css_parser = cssutils.CSSParser(fetcher=None)
-    css_rules = {}
-
-    for style in styles:
-        css = css_parser.parseString(style.string)
-        for rule in css:
-            if rule.type == rule.STYLE_RULE:
-                for property in rule.style:
-                    selector = rule.selectorText
-                    css_rules.setdefault(selector, {})[property.name] = property.value
-
-    # Extraer estilos en línea y específicos de etiquetas
-    elements = soup.find_all(['p', 'span', 'a', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'ul'])
-    for element in elements:
-        # Saltar elementos dentro del ID footer-page
-        if element.find_parent(id='footer-page'):
-            continue
-
-        style = element.get('style')
-        computed_styles = css_rules.get(element.name, {})
-        if style:
-            inline_styles = css_parser.parseStyle(style)
-            for property in inline_styles:
-                computed_styles[property.name] = property.value
-
-        font_size = computed_styles.get('font-size', '16px')
-        color = computed_styles.get('color', '#000000')
-        background_color = computed_styles.get('background-color', '#ffffff')
+    resolver = StyleResolver(stylesheets)
+    styles = [resolver.style_of(element) for element in elements]
+    ratios, computed = contrast_cache.lookup(list(dict.fromkeys((color, background) for _, color, background in styles)))
+    if cache_stats is not None:
+        cache_stats["lookups"] += len(elements)
+        cache_stats["hits"] += len(elements) - computed
 
-        font_size_value = int(re.match(r'(\d+)', font_size).group(1))
+    for element, (font_size_value, color, background_color) in zip(elements, styles):
         if font_size_value < 16:
             text_content = element.text.strip()
             if text_content:
-                problems["Elementos con tamaño de fuente menor a 16px"].append(f"Texto: {text_content} | Tamaño de fuente: {font_size}")
+                problems["Elementos con tamaño de fuente menor a 16px"].append(f"Texto: {text_content} | Tamaño de fuente: {font_size_value:g}px")
 
-        # Calcular la relación de contraste
-        color_obj = hex_to_color(color)
-        background_color_obj = hex_to_color(background_color)
-
-        if color_obj and background_color_obj:
-            contrast = contrast_ratio(color_obj, background_color_obj)
+        # Relación de contraste
+        contrast = ratios[(color, background_color)]
+        if contrast is not None:
             if contrast > 2:
                 text_content = element.text.strip()
                 if text_content:
                     problems["Elementos con buen contraste de color"].append(f"Texto: {text_content} | Contraste: {contrast:.2f}")
-        else:
+        elif not color_is_unresolved(color) and not color_is_unresolved(background_color):
             problems["Elementos con buen contraste de color"].append(f"Elemento {element.name} tiene colores no válidos para calcular el contraste: color {color}, fondo {background_color}")
 
     return problems
 
 
-# Verificar elementos interactivos con eventos de teclado
-def check_keyboard_accessibility(soup):
-    problems = []
-    interactive_elements = soup.find_all(['button', 'a', 'input', 'textarea', 'select'])
-    for element in interactive_elements:
-        if not element.has_attr('tabindex') and not element.has_attr('onkeypress'):
-            element_info = f"Tag: {element.name}, Text: {element.get_text(strip=True)}, Attributes: {element.attrs}"
-            problems.append(f"Elemento interactivo no accesible con teclado: {element_info}")
-    return problems
-
-
-# Verificar el uso de landmarks ARIA
-def check_aria_landmarks(soup):
-    landmarks = ['banner', 'navigation', 'main', 'contentinfo']
-    problems = []
-    for landmark in landmarks:
-        if not soup.find(attrs={"role": landmark}):
-            problems.append(f"Falta ARIA landmark: {landmark}")
-    return problems
-
-# Verificar la estructura semántica del documento
-def check_semantic_structure(soup):
-    problems = []
-    required_tags = ['header', 'nav', 'main', 'footer']
-    for tag in required_tags:
-        if not soup.find(tag):
-            problems.append(f"Falta el elemento semántico: {tag}")
-    return problems
-
-# Verificar la accesibilidad de formularios
-def check_form_accessibility(soup):
-    problems = []
-    forms = soup.find_all('form')
-    for form in forms:
-        inputs = form.find_all(['input', 'textarea', 'select'])
-        labels = form.find_all('label')
-        for input_elem in inputs:
-            if 'id' in input_elem.attrs:
-                label_for_input = [label for label in labels if label.get('for') == input_elem['id']]
-                if not label_for_input and not input_elem.get('aria-label'):
-                    problems.append(f"Campo de formulario sin etiqueta o aria-label: {str(input_elem)[:100]}")
-            if not input_elem.get('aria-describedby') and not input_elem.get('aria-label'):
-                problems.append(f"Campo de formulario sin aria-describedby ni aria-label: {str(input_elem)[:100]}")
-    return problems
-
-# Verificar la ausencia de contenido parpadeante
-def check_no_blinking_content(soup):
-    problems = []
-    blinking_elements = soup.find_all(style=re.compile(r'animation.*blink'))
-    for element in blinking_elements:
-        problems.append(f"Elemento con contenido parpadeante: {str(element)[:100]}")
-    return problems
-
-# Verificar el uso de títulos y descripciones en los SVGs
-def check_svg_accessibility(soup):
-    problems = []
-    svgs = soup.find_all('svg')
-    for svg in svgs:
-        if not svg.find('title'):
-            problems.append(f"SVG sin título: {str(svg)[:100]}")
-        if not svg.find('desc'):
-            problems.append(f"SVG sin descripción: {str(svg)[:100]}")
-    return problems
-
-def create_individual_html_report(report, output_path):
-    severity_styles = {
-        'high': 'background-color: red; color: white;',
-        'medium': 'background-color: orange; color: black;',
-        'low': 'background-color: gold; color: black;',
-        'good': 'background-color:#8ede3e; color: black;'
-    }
-
-    severity_mapping = {
-        'Imágenes sin texto alternativo': 'high',
-        'Campos de formulario sin etiquetas o aria-label': 'high',
-        'Botones sin texto': 'high',
-        'iFrames sin título': 'high',
-        'Elementos interactivos sin roles ARIA': 'high',
-        'Elementos con tamaño de fuente menor a 16px': 'medium',
-        'Enlaces rotos (404)': 'high',
-        'Tiempo de carga de la página': 'medium',
-        'URLs demasiado largas': 'medium',
-        'Canonical tags': 'medium',
-        'Hreflang tags': 'medium',
-        'Accesibilidad de tablas': 'high',
-        'Uso de roles ARIA': 'high',
-        'Posible contenido duplicado': 'high',
-        'Eventos de teclado': 'high',
-        'Landmarks ARIA': 'medium',
-        'Estructura semántica del documento': 'medium',
-        'Accesibilidad de formularios': 'high',
-        'Contenido parpadeante': 'high',
-        'Accesibilidad de SVGs': 'high',
-        'Open Graph tags': 'low',
-        'Enlaces internos con parámetros de consulta': 'low',
-        'Elementos con buen contraste de color': 'good'
-    }
+# Hallazgos compactos ##########################################
+# Tabla de textos sin repetir del estado incremental (categorías, fragmentos de HTML de los hallazgos, URLs):
+# cada texto se guarda una sola vez y lo demás solo lleva su número. Los fragmentos de la navegación y del pie,
+# que se repiten en todas las páginas, ocupan lo mismo con una página que con 50.000.
+class StringTable:
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+        self.lock = threading.Lock()
+
+    def intern(self, text):
+        string_id = self.ids.get(text)
+        if string_id is None:
+            with self.lock:
+                string_id = self.ids.get(text)
+                if string_id is None:
+                    string_id = self.ids[text] = len(self.strings)
+                    self.strings.append(text)
+        return string_id
+
+    def intern_all(self, texts):
+        return array('I', map(self.intern, texts))
+
+    def __getitem__(self, string_id):
+        return self.strings[string_id]
+
+    def resolve(self, string_ids):
+        return [self.strings[string_id] for string_id in string_ids]
+
+# Hallazgos de una página en el estado incremental: la URL (dónde están) y pares (categoría, fragmento) como
+# números de la StringTable del almacén en un array, 8 bytes por hallazgo. Las categorías sin hallazgos se
+# guardan con NO_SNIPPET para conservar el orden y las listas vacías del informe.
+class PageFindings:
+    __slots__ = ('url', 'records')
+    NO_SNIPPET = 0xFFFFFFFF
+
+    def __init__(self, strings, url, problems=None, records=None):
+        self.url = strings.intern(url)
+        self.records = records if records is not None else array('I')
+        for category, items in (problems or {}).items():
+            category_id = strings.intern(category)
+            if not items:
+                self.records.extend((category_id, self.NO_SNIPPET))
+            for item in items:
+                self.records.extend((category_id, strings.intern(item)))
+
+    def problems(self, strings):
+        problems = {}
+        records = self.records
+        for position in range(0, len(records), 2):
+            items = problems.setdefault(strings[records[position]], [])
+            if records[position + 1] != self.NO_SNIPPET:
+                items.append(strings[records[position + 1]])
+        return problems
+
+# Informes HTML ##########################################
+REPORT_SEVERITY_STYLES = {
+    'high': 'background-color: red; color: white;',
+    'medium': 'background-color: orange; color: black;',
+    'low': 'background-color: gold; color: black;',
+    'good': 'background-color:#8ede3e; color: black;'
+}
 
-    html_content = f'''
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Accessibility and SEO Audit Report for {report['url']}</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; }}
-            .accordion {{ cursor: pointer; padding: 18px; width: 100%; text-align: left; border: none; outline: none; transition: 0.4s; background-color: #eee; }}
-            .accordion:hover, .active {{ background-color: #ccc; }}
-            .panel {{ padding: 0 18px; display: none; background-color: white; overflow: hidden; }}
-            .panel p {{ margin: 0; padding: 10px 0; border-bottom: 1px solid #ddd; }}
-            .problem-list {{ margin: 0; padding-left: 20px; list-style-type: decimal; }}
-        </style>
-    </head>
-    <body>
-        <h1>Informe de auditoría de accesibilidad y SEO</h1>
-        <h2>URL: {report['url']}</h2>
-        <button class="accordion">Heading Hierarchy ({'Error' if report['heading_issues'] else 'No Errors'})</button>
-        <div class="panel"><pre>{report['heading_hierarchy']}</pre></div>
-    '''
+REPORT_SEVERITY_MAPPING = {
+    'Imágenes sin texto alternativo': 'high',
+    'Campos de formulario sin etiquetas o aria-label': 'high',
+    'Botones sin texto': 'high',
+    'iFrames sin título': 'high',
+    'Elementos interactivos sin roles ARIA': 'high',
+    'Elementos con tamaño de fuente menor a 16px': 'medium',
+    'Enlaces rotos (404)': 'high',
+    'Tiempo de carga de la página': 'medium',
+    'URLs demasiado largas': 'medium',
+    'Canonical tags': 'medium',
+    'Hreflang tags': 'medium',
+    'Accesibilidad de tablas': 'high',
+    'Uso de roles ARIA': 'high',
+    'Posible contenido duplicado': 'high',
+    'Eventos de teclado': 'high',
+    'Landmarks ARIA': 'medium',
+    'Estructura semántica del documento': 'medium',
+    'Accesibilidad de formularios': 'high',
+    'Contenido parpadeante': 'high',
+    'Accesibilidad de SVGs': 'high',
+    'Open Graph tags': 'low',
+    'Enlaces internos con parámetros de consulta': 'low',
+    'Elementos con buen contraste de color': 'good',
+    'URLs del sitemap sin enlaces internos': 'medium',
+    'CSS no minificado': 'low',
+    'JS no minificado': 'low',
+    'Recursos CSS y JS del sitio': 'low',
+    'Imágenes pesadas': 'medium',
+    'Imágenes sobredimensionadas': 'medium',
+    'Peso de imágenes de la página': 'medium',
+    'Imágenes del sitio': 'low',
+    'URLs omitidas (no HTML o demasiado grandes)': 'low',
+    'Rendimiento': 'good'
+}
 
+REPORT_ACCORDION_SCRIPT = '''
+        <script>
+            document.addEventListener("DOMContentLoaded", function() {
+                var acc = document.getElementsByClassName("accordion");
+                for (var i = 0; i < acc.length; i++) {
+                    acc[i].addEventListener("click", function() {
+                        this.classList.toggle("active");
+                        var panel = this.nextElementSibling;
+                        if (panel.style.display === "block") {
+                            panel.style.display = "none";
+                        } else {
+                            panel.style.display = "block";
+                        }
+                    });
+                }
+            });
+        </script>
+'''
+
+# Un acordeón (botón + panel); con id_suffix los ids no se repiten al juntar varias páginas en el mismo documento
+def render_accordion(title, body, style=None, id_suffix=None):
+    style_attr = f' style="{style}"' if style else ''
+    accordion_id = f' id="accordion-{id_suffix}"' if id_suffix is not None else ''
+    panel_id = f' id="panel-{id_suffix}"' if id_suffix is not None else ''
+    return f'<button class="accordion"{style_attr}{accordion_id}>{title}</button><div class="panel"{panel_id}>{body}</div>\n'
+
+def render_findings(category, items):
+    if category == "Eventos de teclado":
+        return '<ul class="problem-list">' + ''.join(f'<li>{escape(item)}</li>' for item in items) + '</ul>'
+    return ''.join(f'<p>{escape(item)}</p>' for item in items)
+
+# Acordeones del informe de una página, generados uno a uno desde el diccionario del informe
+def render_report_sections(report, page_number=None):
+    id_suffix = lambda i: f'{page_number}-{i}' if page_number is not None else None
+    heading_status = 'Error' if report['heading_issues'] else 'No Errors'
+    yield render_accordion(f'Heading Hierarchy ({heading_status})', f'<pre>{escape(report["heading_hierarchy"])}</pre>', id_suffix=id_suffix(0))
+    i = 1
     for category, items in report['problems'].items():
         if items:
-            severity = severity_mapping.get(category, 'low')
-            style = severity_styles[severity]
-            html_content += f'<button class="accordion" style="{style}">{category} ({len(items)})</button><div class="panel">'
-            if category == "Eventos de teclado":
-                html_content += '<ul class="problem-list">'
-                for item in items:
-                    html_content += f'<li>{escape(item)}</li>'
-                html_content += '</ul>'
+            style = REPORT_SEVERITY_STYLES[REPORT_SEVERITY_MAPPING.get(category, 'low')]
+            yield render_accordion(f'{escape(category)} ({len(items)})', render_findings(category, items), style, id_suffix(i))
+            i += 1
+
+# Totales del sitio actualizados página a página: el resumen general sale de aquí y no hace falta
+# guardar todos los informes en memoria hasta el final
+class SiteAggregates:
+    def __init__(self):
+        self.pages = 0
+        self.findings = {}        # categoría -> número de hallazgos
+        self.pages_with = {}      # categoría -> páginas con algún hallazgo
+        self.pages_without_title_or_meta = 0
+        self.total_aria_roles = 0
+        self.total_roles = 0
+        self.contrast_lookups = 0
+        self.contrast_hits = 0
+        self.image_bytes = 0      # suma por página: una imagen compartida cuenta en cada página que la usa
+        self.first_page = None    # título, meta, sitemap, servidor... de la primera página terminada
+
+    def add(self, report):
+        self.pages += 1
+        for category, items in report["problems"].items():
+            self.add_findings(category, len(items))
+        if "No se encontró ningún título" in report["seo_info"] or "No se encontró descripción meta" in report["seo_info"]:
+            self.pages_without_title_or_meta += 1
+        self.total_aria_roles += report["aria_roles_info"]["total_aria_roles"]
+        self.total_roles += report["aria_roles_info"]["total_roles"]
+        contrast_cache_stats = report.get("contrast_cache") or {}
+        self.contrast_lookups += contrast_cache_stats.get("lookups", 0)
+        self.contrast_hits += contrast_cache_stats.get("hits", 0)
+        self.image_bytes += (report.get("image_weight") or {}).get("bytes", 0)
+        if self.first_page is None:
+            self.first_page = {key: report[key] for key in ("seo_info", "sitemap_url", "robots_url", "server")}
+
+    # Hallazgos que llegan después de la página (contenido duplicado) cuentan igual que los de la página
+    def add_findings(self, category, count):
+        self.findings[category] = self.findings.get(category, 0) + count
+        if count:
+            self.pages_with[category] = self.pages_with.get(category, 0) + 1
+
+    def count(self, category):
+        return self.findings.get(category, 0)
+
+    def pages_with_findings(self, category):
+        return self.pages_with.get(category, 0)
+
+
+# Hallazgos en streaming para otras herramientas: se añaden al fichero en cuanto termina cada página.
+# .csv -> una fila por hallazgo (url, categoría, severidad, hallazgo); cualquier otra extensión -> JSON Lines
+# con un objeto por hallazgo o, con per_page, el informe completo de cada página.
+class FindingsExporter:
+    CSV_HEADER = ["url", "category", "severity", "finding"]
+
+    def __init__(self, path, per_page=False):
+        self.is_csv = path.lower().endswith('.csv')
+        self.per_page = per_page and not self.is_csv
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.csv_writer = csv.writer(self.file) if self.is_csv else None
+        if self.is_csv:
+            self.csv_writer.writerow(self.CSV_HEADER)
+
+    def write_line(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def add_findings(self, url, category, items):
+        severity = REPORT_SEVERITY_MAPPING.get(category, 'low')
+        for item in items:
+            if self.is_csv:
+                self.csv_writer.writerow([url, category, severity, item])
             else:
-                for item in items:
-                    html_content += f'<p>{escape(item)}</p>'
-            html_content += '</div>'
+                self.write_line({"url": url, "category": category, "severity": severity, "finding": item})
 
-    html_content += '''
-        <script>
-            var acc = document.getElementsByClassName("accordion");
-            for (var i = 0; i < acc.length; i++) {
-                acc[i].addEventListener("click", function() {
-                    this.classList.toggle("active");
-                    var panel = this.nextElementSibling;
-                    if (panel.style.display === "block") {
-                        panel.style.display = "none";
-                    } else {
-                        panel.style.display = "block";
-                    }
-                });
-            }
-        </script>
-    </body>
-    </html>
-    '''
-
-    with open(output_path, 'w', encoding='utf-8') as file:
-        file.write(html_content)
-
-
-def combine_html_reports(report_files, final_output_path, general_info):
-    severity_styles = {
-        'high': 'background-color: red; color: white;',
-        'medium': 'background-color: orange; color: black;',
-        'low': 'background-color: gold; color: black;'
-    }
-
-    severity_mapping = {
-        'Imágenes sin texto alternativo': 'high',
-        'Campos de formulario sin etiquetas o aria-label': 'high',
-        'Botones sin texto': 'high',
-        'iFrames sin título': 'high',
-        'Elementos interactivos sin roles ARIA': 'high',
-        'Elementos con tamaño de fuente menor a 16px': 'medium',
-        'Elementos con buen contraste de color': 'high',
-        'Enlaces rotos (404)': 'high',
-        'Tiempo de carga de la página': 'medium',
-        'URLs demasiado largas': 'medium',
-        'Canonical tags': 'medium',
-        'Hreflang tags': 'medium',
-        'Accesibilidad de tablas': 'high',
-        'Uso de roles ARIA': 'high',
-        'Posible contenido duplicado': 'high',
-        'Eventos de teclado': 'high',
-        'Landmarks ARIA': 'medium',
-        'Estructura semántica del documento': 'medium',
-        'Accesibilidad de formularios': 'high',
-        'Contenido parpadeante': 'high',
-        'Accesibilidad de SVGs': 'high',
-        'Open Graph tags': 'low',
-        'Enlaces internos con parámetros de consulta': 'low'
-    }
-
-    combined_html_content = f'''
+    def add_page(self, report):
+        if self.per_page:
+            self.write_line(report)
+        else:
+            for category, items in report["problems"].items():
+                self.add_findings(report["url"], category, items)
+        self.file.flush()
+
+    # En modo por página los hallazgos posteriores van en una línea aparte con solo esa categoría
+    def add_late_findings(self, url, category, items):
+        if self.per_page:
+            self.write_line({"url": url, "problems": {category: items}})
+        else:
+            self.add_findings(url, category, items)
+
+    def close(self):
+        self.file.close()
+
+
+# Informe combinado en streaming: cada página se escribe en el fichero final en cuanto termina su auditoría,
+# directamente desde el diccionario del informe (sin ficheros intermedios ni volver a parsear el HTML).
+# La información general y el contenido duplicado solo se conocen al terminar el rastreo, así que se escriben
+# al cerrar; el contenedor es flex y la información general lleva order: -1 para seguir mostrándose arriba.
+class CombinedReportWriter:
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.file = None
+        self.pages = 0
+        self.site_sections = 0
+
+    def open(self):
+        self.file = open(self.output_path, 'w', encoding='utf-8')
+        self.file.write('''
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -533,91 +2413,66 @@ def combine_html_reports(report_files, final_output_path, general_info):
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>Combined Accessibility and SEO Audit Report</title>
         <style>
-            body {{ font-family: Arial, sans-serif; margin: 0; padding: 0; }}
-            .container {{ padding: 20px; }}
-            .accordion {{ cursor: pointer; padding: 18px; width: 100%; text-align: left; border: none; outline: none; transition: 0.4s; background-color: #eee; margin-bottom: 10px; }}
-            .accordion:hover, .active {{ background-color: #ccc; }}
-            .panel {{ padding: 0 18px; display: none; background-color: white; overflow: hidden; }}
-            .panel p {{ margin: 0; padding: 10px 0; border-bottom: 1px solid #ddd; }}
-            .problem-list {{ margin: 0; padding-left: 20px; list-style-type: decimal; }}
-            .url-accordion {{ background-color: #f6f6f6; color: black; margin-bottom: 10px; }}
-            pre {{ white-space: pre-wrap; word-wrap: break-word; }}
+            body { font-family: Arial, sans-serif; margin: 0; padding: 0; }
+            .container { padding: 20px; display: flex; flex-direction: column; }
+            .container > h1 { order: -2; }
+            .general-info { order: -1; }
+            .accordion { cursor: pointer; padding: 18px; width: 100%; text-align: left; border: none; outline: none; transition: 0.4s; background-color: #eee; margin-bottom: 10px; }
+            .accordion:hover, .active { background-color: #ccc; }
+            .panel { padding: 0 18px; display: none; background-color: white; overflow: hidden; }
+            .panel p { margin: 0; padding: 10px 0; border-bottom: 1px solid #ddd; }
+            .problem-list { margin: 0; padding-left: 20px; list-style-type: decimal; }
+            .url-accordion { background-color: #f6f6f6; color: black; margin-bottom: 10px; }
+            pre { white-space: pre-wrap; word-wrap: break-word; }
 
             /* Responsive adjustments */
-            @media (max-width: 600px) {{
-                .accordion, .url-accordion {{ padding: 10px; font-size: 14px; }}
-                .panel p {{ padding: 5px 0; }}
-            }}
+            @media (max-width: 600px) {
+                .accordion, .url-accordion { padding: 10px; font-size: 14px; }
+                .panel p { padding: 5px 0; }
+            }
         </style>
     </head>
     <body>
         <div class="container">
             <h1>Informe combinado de auditoría de accesibilidad y SEO - SiteMaster Audit </h1>
-            <button class="accordion">Información General</button>
-            <div class="panel">
-                <pre>{escape(general_info)}</pre>
-            </div>
-    '''
-
-    accordion_id_counter = 0
-
-    for report_file in report_files:
-        with open(report_file, 'r', encoding='utf-8') as file:
-            soup = BeautifulSoup(file, 'html.parser')
-            body_content = soup.find('body').decode_contents()
-
-            # Extraer el título y la URL
-            url_title = soup.find('h2')
-            url_header = f'<h2>{url_title.text}</h2>' if url_title else ''
-
-            body_soup = BeautifulSoup(body_content, 'html.parser')
-            accordions = body_soup.find_all(class_='accordion')
-            panels = body_soup.find_all(class_='panel')
-
-            combined_html_content += f'''
-            <button class="accordion url-accordion">{url_header}</button>
-            <div class="panel">
-            '''
-
-            sorted_accordions_panels = sorted(zip(accordions, panels), key=lambda x: severity_mapping.get(x[0].text.split()[0], 'low'), reverse=True)
-
-            for i, (accordion, panel) in enumerate(sorted_accordions_panels):
-                unique_id = f'{accordion_id_counter}-{i}'
-                accordion['id'] = f'accordion-{unique_id}'
-                panel['id'] = f'panel-{unique_id}'
-                combined_html_content += str(accordion)
-                combined_html_content += str(panel)
-                accordion_id_counter += 1
-
-            combined_html_content += '</div>'
-
-    combined_html_content += '''
-        </div>
-        <script>
-            document.addEventListener("DOMContentLoaded", function() {
-                var acc = document.getElementsByClassName("accordion");
-                for (var i = 0; i < acc.length; i++) {
-                    acc[i].addEventListener("click", function() {
-                        this.classList.toggle("active");
-                        var panel = this.nextElementSibling;
-                        if (panel.style.display === "block") {
-                            panel.style.display = "none";
-                        } else {
-                            panel.style.display = "block";
-                        }
-                    });
-                }
-            });
-        </script>
+    ''')
+
+    def add_page(self, report):
+        if self.file is None:
+            self.open()
+        self.file.write(f'<div><button class="accordion url-accordion"><h2>URL: {escape(report["url"])}</h2></button><div class="panel">\n')
+        self.file.writelines(render_report_sections(report, self.pages))
+        self.file.write('</div></div>\n')
+        self.pages += 1
+
+    # Secciones de todo el sitio que solo se conocen al final del rastreo (contenido duplicado, páginas huérfanas...)
+    def add_site_section(self, category, items):
+        if self.file is None or not items:
+            return
+        style = REPORT_SEVERITY_STYLES[REPORT_SEVERITY_MAPPING.get(category, 'low')]
+        self.site_sections += 1
+        self.file.write(f'<div>{render_accordion(f"{escape(category)} ({len(items)})", render_findings(category, items), style, f"site-{self.site_sections}")}</div>\n')
+
+    def close(self, general_info):
+        if self.file is None:
+            return False
+        self.file.write(f'<div class="general-info">{render_accordion("Información General", f"<pre>{escape(general_info)}</pre>")}</div>\n')
+        self.file.write('        </div>\n')
+        self.file.write(REPORT_ACCORDION_SCRIPT)
+        self.file.write('''
     </body>
     </html>
-    '''
-
-    with open(final_output_path, 'w', encoding='utf-8') as file:
-        file.write(combined_html_content)
+    ''')
+        self.file.close()
+        self.file = None
+        return True
 
-    for report_file in report_files:
-        os.remove(report_file)
+    # Si el rastreo falla no se deja un informe a medias
+    def discard(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            os.remove(self.output_path)
 
 
 def check_sitemap(url):
@@ -631,13 +2486,13 @@ def check_sitemap(url):
     sitemap_index_url = base_url + '/sitemap_index.xml'
     
     try:
-        sitemap_exists = requests.head(sitemap_url).status_code == 200
+        sitemap_exists = http_client.head(sitemap_url, kind='sitemap').status_code == 200
     except requests.exceptions.RequestException as e:
         print(f"Error al acceder a {sitemap_url}: {e}")
         sitemap_exists = False
     
     try:
-        sitemap_index_exists = requests.head(sitemap_index_url).status_code == 200
+        sitemap_index_exists = http_client.head(sitemap_index_url, kind='sitemap').status_code == 200
     except requests.exceptions.RequestException as e:
         print(f"Error al acceder a {sitemap_index_url}: {e}")
         sitemap_index_exists = False
@@ -648,19 +2503,149 @@ def check_sitemap(url):
 def check_robots(url):
     base_url = f"{urlparse(url).scheme}://{urlparse(url).netloc}"
     robots_url = base_url + '/robots.txt'
-    robots_exists = requests.head(robots_url).status_code == 200
+    robots_exists = http_client.head(robots_url, kind='robots').status_code == 200
     return robots_exists, robots_url
 
 
-def get_internal_links(url, soup):
-    domain = urlparse(url).netloc
-    links = []
-    for a_tag in soup.find_all('a', href=True):
-        href = a_tag['href']
-        link = urljoin(url, href)
-        if urlparse(link).netloc == domain and not re.search(r'\.(webp|jpg|jpeg|png)$', link):
-            links.append(link)
-    return set(links)
+# robots.txt y sitemaps de un origen (esquema + host): son iguales para todas sus páginas
+def probe_origin(url):
+    robots_exists, robots_url = check_robots(url)
+    try:
+        robots_content = http_client.get(robots_url, kind='robots').text if robots_exists else "No se encontró ningún archivo robots.txt"
+    except requests.exceptions.RequestException:
+        robots_content = "No se encontró ningún archivo robots.txt"
+    sitemap_exists, sitemap_index_exists, sitemap_url = check_sitemap(url)
+    return {
+        "robots_exists": robots_exists,
+        "robots_url": robots_url,
+        "robots_content": robots_content,
+        "sitemap_exists": sitemap_exists,
+        "sitemap_index_exists": sitemap_index_exists,
+        "sitemap_url": sitemap_url
+    }
+
+# Resultado de probe_origin memorizado por origen durante todo el rastreo; las páginas del mismo
+# origen que llegan a la vez esperan a la primera comprobación en lugar de repetirla.
+# También guarda las reglas de robots.txt de cada origen y aplica su Crawl-delay al limitador de ritmo.
+class OriginInfoCache:
+    def __init__(self):
+        self.origins = {}  # origen -> Future con la información del origen
+        self.robots = {}   # origen -> RobotFileParser
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        parsed_url = urlparse(url)
+        origin = f"{parsed_url.scheme}://{parsed_url.netloc}"
+        with self.lock:
+            future = self.origins.get(origin)
+            owner = future is None
+            if owner:
+                future = self.origins[origin] = Future()
+        if owner:
+            try:
+                origin_info = probe_origin(url)
+                robots = RobotFileParser()
+                robots.parse(origin_info["robots_content"].splitlines() if origin_info["robots_exists"] else [])
+                crawl_delay = robots.crawl_delay(USER_AGENT)
+                if RESPECT_ROBOTS_TXT and crawl_delay:
+                    rate_limiter.set_crawl_delay(parsed_url.netloc.lower(), float(crawl_delay))
+                self.robots[origin] = robots
+                future.set_result(origin_info)
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    def robots_allows(self, url):
+        parsed_url = urlparse(url)
+        self.get(url)
+        return self.robots[f"{parsed_url.scheme}://{parsed_url.netloc}"].can_fetch(USER_AGENT, url)
+
+origin_info_cache = OriginInfoCache()
+
+
+# Sitemaps ##########################################
+# Descarga un sitemap (descomprimiendo los .xml.gz, que se reconocen por su firma) en un fichero temporal que
+# solo pasa a disco si es grande. Se lee entero dentro de request_slot para no retener el hueco del host ni la
+# conexión mientras el rastreo va consumiendo las URLs. None si el servidor no lo devuelve.
+def download_sitemap(sitemap_url, max_bytes=SITEMAP_MAX_BYTES):
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    try:
+        with http_client.stream(sitemap_url, kind='sitemap') as (response, chunks):
+            if response.status_code != 200:
+                print(f"No se pudo leer el sitemap {sitemap_url}: {response.status_code}")
+                spool.close()
+                return None
+            decompressor = None  # False si el sitemap no está comprimido
+            for chunk in chunks:
+                if decompressor is None:
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == b'\x1f\x8b' else False
+                # Descompresión por trozos acotados: un trozo comprimido de 64 KB puede ocupar varios MB descomprimido
+                while chunk and spool.tell() < max_bytes:
+                    data = decompressor.decompress(chunk, 64 * 1024) if decompressor else chunk
+                    spool.write(data[:max_bytes - spool.tell()])
+                    chunk = decompressor.unconsumed_tail if decompressor else b''
+                if spool.tell() >= max_bytes:
+                    print(f"Sitemap {sitemap_url} cortado en {max_bytes / 1048576:.0f} MB")
+                    break
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+# Entradas de un sitemap: ('url', loc) de un <urlset> o ('sitemap', loc) de un índice. El XML ya descargado se
+# procesa por trozos con XMLPullParser, vaciando el elemento raíz tras cada entrada: su árbol no llega a estar
+# entero en memoria y se lee al ritmo del rastreo, fuera de request_slot.
+def iter_sitemap_entries(sitemap_url):
+    spool = download_sitemap(sitemap_url)
+    if spool is None:
+        return
+    with spool:
+        parser = ET.XMLPullParser(events=('start', 'end'))
+        root = None
+
+        def entries():
+            nonlocal root
+            for event, element in parser.read_events():
+                if root is None:
+                    root = element
+                elif event == 'end' and element.tag.rsplit('}', 1)[-1] in ('url', 'sitemap'):
+                    loc = (element.findtext('{*}loc') or '').strip()
+                    if loc:
+                        yield element.tag.rsplit('}', 1)[-1], loc
+                    root.clear()
+
+        for chunk in iter(lambda: spool.read(64 * 1024), b''):
+            parser.feed(chunk)
+            yield from entries()
+        parser.close()
+        yield from entries()
+
+# URLs de uno o varios sitemaps a medida que se leen; los índices se siguen en anchura sin repetir sitemaps
+def iter_sitemap_urls(sitemap_urls, max_sitemaps=SITEMAP_MAX_FILES):
+    pending = deque(sitemap_urls)
+    seen = set(pending)
+    read = 0
+    while pending and read < max_sitemaps:
+        sitemap_url = pending.popleft()
+        read += 1
+        try:
+            for kind, loc in iter_sitemap_entries(sitemap_url):
+                if kind == 'url':
+                    yield loc
+                elif loc not in seen:
+                    seen.add(loc)
+                    pending.append(loc)
+        except (requests.exceptions.RequestException, ET.ParseError, zlib.error) as e:
+            print(f"No se pudo leer el sitemap {sitemap_url}: {e}")
+
+# Sitemaps declarados en robots.txt; si no hay ninguno, el sitemap.xml o sitemap_index.xml encontrado en el origen
+def sitemaps_for_origin(origin_info):
+    sitemap_urls = [line.split(':', 1)[1].strip() for line in origin_info["robots_content"].splitlines() if line.strip().lower().startswith('sitemap:')]
+    if not sitemap_urls and origin_info["sitemap_url"]:
+        sitemap_urls = [origin_info["sitemap_url"]]
+    return sitemap_urls
+
 
 # verifica long url
 def check_url_length(url):
@@ -668,111 +2653,704 @@ def check_url_length(url):
         return True, len(url)
     return False, len(url)
 
-#Verificar la presencia de canonical tags
-def check_canonical_tag(soup):
-    canonical_tag = soup.find('link', rel='canonical')
-    if not canonical_tag:
-        return False
-    return True
-
-#check hreflang
-def check_hreflang_tags(soup):
-    hreflang_tags = soup.find_all('link', rel='alternate', hreflang=True)
-    if not hreflang_tags:
-        return False
-    return True
-
-# Accesibilidad ##########################################
-# Verificar elementos interactivos con eventos de teclado
-def check_keyboard_accessibility(soup):
-    problems = []
-    interactive_elements = soup.find_all(['button', 'a', 'input', 'textarea', 'select'])
-    for element in interactive_elements:
-        if not element.has_attr('tabindex') and not element.has_attr('onkeypress'):
-            element_info = str(element)[:100]
-            problems.append(f"Elemento interactivo no accesible con teclado: {element_info}")
-    return problems
-
-# Verificar el uso de landmarks ARIA
-def check_aria_landmarks(soup):
-    landmarks = ['banner', 'navigation', 'main', 'contentinfo']
-    problems = []
-    for landmark in landmarks:
-        if not soup.find(attrs={"role": landmark}):
-            problems.append(f"Falta ARIA landmark: {landmark}")
-    return problems
-
-# Verificar la estructura semántica del documento
-def check_semantic_structure(soup):
-    problems = []
-    required_tags = ['header', 'nav', 'main', 'footer']
-    for tag in required_tags:
-        if not soup.find(tag):
-            problems.append(f"Falta el elemento semántico: {tag}")
-    return problems
-
-# Verificar la accesibilidad de formularios
-
-def check_keyboard_events(soup):
-    problems = []
-    interactive_elements = soup.find_all(['button', 'a', 'input', 'textarea', 'select'])
-    for element in interactive_elements:
+# Motor de reglas DOM ##########################################
+# Cada regla declara las etiquetas (tags) y atributos (attributes) que le interesan y recibe esos elementos
+# con enter() durante un único recorrido del árbol. Las reglas que necesitan saber qué contiene un elemento
+# (tablas, formularios, SVGs...) marcan nested = True y reciben también leave() cuando el elemento se cierra.
+# Lo que depende del árbol definitivo (str(), .text) se calcula en result(), después del recorrido.
+# context lleva lo que run_dom_rules recibe de fuera del documento (URL de la página, descarga de hojas de estilo).
+class DomRule:
+    name = None
+    context = {}
+    tags = ()
+    attributes = ()
+    strings = False  # recibe también los textos con string()
+    nested = False
+
+    def enter(self, element):
+        pass
+
+    def leave(self, element):
+        pass
+
+    def string(self, text):
+        pass
+
+    def result(self):
+        return None
+
+dom_rules = []
+
+def dom_rule(rule_class):
+    dom_rules.append(rule_class)
+    return rule_class
+
+# Mismo criterio que BeautifulSoup para atributos con varios valores (rel, class): basta con que coincida uno
+def attribute_matches(value, expected):
+    if isinstance(value, list):
+        return expected in value or ' '.join(value) == expected
+    return value == expected
+
+# Recorre el árbol una vez y reparte cada elemento entre las reglas interesadas. Si se indica skip_id, el primer
+# elemento con ese id y todo su contenido se saltan (como si se hubiera eliminado) y se devuelve ese elemento.
+def walk_dom(root, rules, skip_id=None):
+    rules_by_tag = {}
+    rules_by_attribute = {}
+    for rule in rules:
+        for tag in rule.tags:
+            rules_by_tag.setdefault(tag, []).append(rule)
+        for attribute in rule.attributes:
+            rules_by_attribute.setdefault(attribute, []).append(rule)
+    string_rules = [rule for rule in rules if rule.strings]
+
+    skipped = None
+    stack = [(None, iter(root.contents), ())]
+    while stack:
+        element, children, nested_rules = stack[-1]
+        for node in children:
+            if not isinstance(node, Tag):
+                for rule in string_rules:
+                    rule.string(node)
+                continue
+            if skip_id is not None and skipped is None and node.get('id') == skip_id:
+                skipped = node
+                continue
+            interested = rules_by_tag.get(node.name, [])
+            if rules_by_attribute:
+                for attribute in node.attrs:
+                    for rule in rules_by_attribute.get(attribute, ()):
+                        if rule not in interested:
+                            interested = interested + [rule]
+            for rule in interested:
+                rule.enter(node)
+            node_nested_rules = [rule for rule in interested if rule.nested]
+            if node.contents:
+                stack.append((node, iter(node.contents), node_nested_rules))
+                break
+            for rule in node_nested_rules:
+                rule.leave(node)
+        else:
+            stack.pop()
+            for rule in nested_rules:
+                rule.leave(element)
+    return skipped
+
+# Ejecuta todas las reglas registradas en un solo recorrido; devuelve {nombre de la regla: resultado}
+# Con timings se mide el recorrido (enter/leave de todas las reglas juntas) y el result() de cada regla
+def run_dom_rules(soup, skip_id=None, context=None, timings=None):
+    if timings is None:
+        timings = {}
+    rules = [rule_class() for rule_class in dom_rules]
+    for rule in rules:
+        rule.context = context or {}
+    with timed(timings, "dom_walk"):
+        skipped = walk_dom(soup, rules, skip_id)
+    # Lo saltado se elimina antes de calcular los resultados, para que tampoco aparezca en str() ni en .text.
+    # Sus enlaces no se auditan, pero se guardan para que el rastreo siga descubriendo páginas a través de ellos.
+    skipped_hrefs = []
+    if skipped is not None:
+        skipped_hrefs = [a_tag['href'] for a_tag in skipped.find_all('a', href=True)]
+        skipped.decompose()
+    results = {}
+    for rule in rules:
+        with timed(timings, rule.name):
+            results[rule.name] = rule.result()
+    results["skipped_hrefs"] = skipped_hrefs
+    return results
+
+@dom_rule
+class HeadLinksRule(DomRule):
+    name = "head_links"
+    tags = ('link',)
+
+    def __init__(self):
+        self.canonical = self.hreflang = self.favicon = False
+
+    def enter(self, element):
+        rel = element.get('rel')
+        if attribute_matches(rel, 'canonical'):
+            self.canonical = True
+        if attribute_matches(rel, 'alternate') and element.get('hreflang') is not None:
+            self.hreflang = True
+        if attribute_matches(rel, 'icon'):
+            self.favicon = True
+
+    def result(self):
+        return {"canonical": self.canonical, "hreflang": self.hreflang, "favicon": self.favicon}
+
+@dom_rule
+class MetaTagsRule(DomRule):
+    name = "meta"
+    tags = ('meta', 'title')
+
+    def __init__(self):
+        self.title = self.description = self.keywords = None
+
+    def enter(self, element):
+        if element.name == 'title':
+            if self.title is None:
+                self.title = element
+        elif element.get('name') == 'description':
+            if self.description is None:
+                self.description = element
+        elif element.get('name') == 'keywords':
+            if self.keywords is None:
+                self.keywords = element
+
+    def result(self):
+        return {"title": self.title, "description": self.description, "keywords": self.keywords}
+
+@dom_rule
+class LinksRule(DomRule):
+    name = "links"
+    tags = ('a',)
+
+    def __init__(self):
+        self.hrefs = []
+
+    def enter(self, element):
+        href = element.get('href')
+        if href is not None:
+            self.hrefs.append(href)
+
+    def result(self):
+        return self.hrefs
+
+@dom_rule
+class KeyboardEventsRule(DomRule):
+    name = "keyboard_events"
+    tags = ('button', 'a', 'input', 'textarea', 'select')
+
+    def __init__(self):
+        self.elements = []
+
+    def enter(self, element):
         if not element.get('tabindex') and not element.get('onkeydown'):
-            element_info = str(element)[:100]  # Truncar para evitar largos outputs
-            problems.append(f"Elemento interactivo sin eventos de teclado: {element_info}")
-    return problems
-
-def check_form_accessibility(soup):
-    problems = []
-    forms = soup.find_all('form')
-    for form in forms:
-        inputs = form.find_all(['input', 'textarea', 'select'])
-        labels = form.find_all('label')
-        for input_elem in inputs:
-            if 'id' in input_elem.attrs:
-                label_for_input = [label for label in labels if label.get('for') == input_elem['id']]
-                if not label_for_input and not input_elem.get('aria-label'):
-                    problems.append(f"Campo de formulario sin etiqueta o aria-label: {str(input_elem)[:100]}")
-            if not input_elem.get('aria-describedby') and not input_elem.get('aria-label'):
-                problems.append(f"Campo de formulario sin aria-describedby ni aria-label: {str(input_elem)[:100]}")
-    return problems
-
-# Verificar la ausencia de contenido parpadeante
-def check_no_blinking_content(soup):
-    problems = []
-    blinking_elements = soup.find_all(style=re.compile(r'animation.*blink'))
-    for element in blinking_elements:
-        problems.append(f"Elemento con contenido parpadeante: {str(element)[:100]}")
-    return problems
-
-# Verificar el uso de títulos y descripciones en los SVGs
-def check_svg_accessibility(soup):
-    problems = []
-    svgs = soup.find_all('svg')
-    for svg in svgs:
-        if not svg.find('title'):
-            problems.append(f"SVG sin título: {str(svg)[:100]}")
-        if not svg.find('desc'):
-            problems.append(f"SVG sin descripción: {str(svg)[:100]}")
-    return problems
-
-def analyze_page(url, internal_links=None):
-    load_time = get_page_load_time(url)
-    
+            self.elements.append(element)
+
+    def result(self):
+        return [f"Elemento interactivo sin eventos de teclado: {str(element)[:100]}" for element in self.elements]
+
+@dom_rule
+class AriaRolesRule(DomRule):
+    name = "aria_roles"
+    attributes = ('role',)
+
+    def __init__(self):
+        self.total = 0
+        self.roles = set()
+
+    def enter(self, element):
+        self.total += 1
+        self.roles.add(element.get('role'))
+
+    def result(self):
+        landmarks = ['banner', 'navigation', 'main', 'contentinfo']
+        return {
+            "total": self.total,
+            "landmark_problems": [f"Falta ARIA landmark: {landmark}" for landmark in landmarks if landmark not in self.roles]
+        }
+
+@dom_rule
+class SemanticStructureRule(DomRule):
+    name = "semantic_structure"
+    tags = ('header', 'nav', 'main', 'footer')
+
+    def __init__(self):
+        self.found = set()
+
+    def enter(self, element):
+        self.found.add(element.name)
+
+    def result(self):
+        return [f"Falta el elemento semántico: {tag}" for tag in ['header', 'nav', 'main', 'footer'] if tag not in self.found]
+
+@dom_rule
+class TableAccessibilityRule(DomRule):
+    name = "tables"
+    tags = ('table', 'thead', 'tbody', 'th')
+    nested = True
+
+    def __init__(self):
+        self.tables = []
+        self.open_tables = []
+
+    def enter(self, element):
+        if element.name == 'table':
+            table = {"element": element, "thead": False, "tbody": False, "ths": []}
+            self.tables.append(table)
+            self.open_tables.append(table)
+        elif element.name == 'th':
+            for table in self.open_tables:
+                table["ths"].append(element)
+        else:
+            for table in self.open_tables:
+                table[element.name] = True
+
+    def leave(self, element):
+        if element.name == 'table':
+            self.open_tables.pop()
+
+    def result(self):
+        problems = []
+        for table in self.tables:
+            if not table["thead"]:
+                problems.append(f"Tabla sin thead: {str(table['element'])[:100]}")
+            if not table["tbody"]:
+                problems.append(f"Tabla sin tbody: {str(table['element'])[:100]}")
+            for th in table["ths"]:
+                if not th.get('scope'):
+                    problems.append(f"th sin scope: {str(th)[:100]}")
+        return problems
+
+@dom_rule
+class FormAccessibilityRule(DomRule):
+    name = "forms"
+    tags = ('form', 'input', 'textarea', 'select', 'label')
+    nested = True
+
+    def __init__(self):
+        self.forms = []
+        self.open_forms = []
+
+    def enter(self, element):
+        if element.name == 'form':
+            form = {"inputs": [], "label_fors": set()}
+            self.forms.append(form)
+            self.open_forms.append(form)
+        elif element.name == 'label':
+            for form in self.open_forms:
+                form["label_fors"].add(element.get('for'))
+        else:
+            for form in self.open_forms:
+                form["inputs"].append(element)
+
+    def leave(self, element):
+        if element.name == 'form':
+            self.open_forms.pop()
+
+    def result(self):
+        accessibility_problems = []
+        unlabeled_inputs = []
+        for form in self.forms:
+            for input_elem in form["inputs"]:
+                if 'id' in input_elem.attrs:
+                    if input_elem['id'] not in form["label_fors"] and not input_elem.get('aria-label'):
+                        accessibility_problems.append(f"Campo de formulario sin etiqueta o aria-label: {str(input_elem)[:100]}")
+                if not input_elem.get('aria-describedby') and not input_elem.get('aria-label'):
+                    accessibility_problems.append(f"Campo de formulario sin aria-describedby ni aria-label: {str(input_elem)[:100]}")
+        for form in self.forms:
+            for input_elem in form["inputs"]:
+                if 'id' in input_elem.attrs and input_elem['id'] not in form["label_fors"] and not input_elem.get('aria-label'):
+                    unlabeled_inputs.append(str(input_elem))
+        return {"accessibility": accessibility_problems, "unlabeled": unlabeled_inputs}
+
+@dom_rule
+class BlinkingContentRule(DomRule):
+    name = "blinking"
+    attributes = ('style',)
+    pattern = re.compile(r'animation.*blink')
+
+    def __init__(self):
+        self.elements = []
+
+    def enter(self, element):
+        if self.pattern.search(element.get('style')):
+            self.elements.append(element)
+
+    def result(self):
+        return [f"Elemento con contenido parpadeante: {str(element)[:100]}" for element in self.elements]
+
+@dom_rule
+class SvgAccessibilityRule(DomRule):
+    name = "svgs"
+    tags = ('svg', 'title', 'desc')
+    nested = True
+
+    def __init__(self):
+        self.svgs = []
+        self.open_svgs = []
+
+    def enter(self, element):
+        if element.name == 'svg':
+            svg = {"element": element, "title": False, "desc": False}
+            self.svgs.append(svg)
+            self.open_svgs.append(svg)
+        else:
+            for svg in self.open_svgs:
+                svg[element.name] = True
+
+    def leave(self, element):
+        if element.name == 'svg':
+            self.open_svgs.pop()
+
+    def result(self):
+        problems = []
+        for svg in self.svgs:
+            if not svg["title"]:
+                problems.append(f"SVG sin título: {str(svg['element'])[:100]}")
+            if not svg["desc"]:
+                problems.append(f"SVG sin descripción: {str(svg['element'])[:100]}")
+        return problems
+
+@dom_rule
+class ImagesRule(DomRule):
+    name = "images"
+    tags = ('img',)
+
+    def __init__(self):
+        self.images = []
+
+    def enter(self, element):
+        self.images.append(element)
+
+    def result(self):
+        return {
+            "without_alt": [str(img) for img in self.images if not img.get('alt')],
+            # Imágenes que no son WebP y no contienen 'logo' o 'plugin' en la URL
+            "not_webp": [img['src'] for img in self.images if 'src' in img.attrs and not img['src'].endswith('.webp') and not any(kw in img['src'] for kw in ['logo', 'plugin'])],
+            # [src, width, height] de cada imagen con fichero, para la auditoría de peso y dimensiones
+            "sources": [[img['src'], img.get('width'), img.get('height')] for img in self.images if img.get('src') and not img['src'].startswith('data:')]
+        }
+
+@dom_rule
+class HeadingsRule(DomRule):
+    name = "headings"
+    tags = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+    def __init__(self):
+        self.headings = []
+
+    def enter(self, element):
+        self.headings.append(element)
+
+    def result(self):
+        return self.headings
+
+@dom_rule
+class ButtonsAndIframesRule(DomRule):
+    name = "buttons_iframes"
+    tags = ('button', 'iframe')
+
+    def __init__(self):
+        self.buttons = []
+        self.iframes = []
+
+    def enter(self, element):
+        if element.name == 'button':
+            self.buttons.append(element)
+        elif not element.get('title'):
+            self.iframes.append(element)
+
+    def result(self):
+        return {
+            "buttons_without_text": [str(button) for button in self.buttons if not button.text.strip()],
+            "iframes_without_title": [str(iframe) for iframe in self.iframes]
+        }
+
+@dom_rule
+class InteractiveWithoutAriaRule(DomRule):
+    name = "interactive_without_aria"
+    tags = ('button', 'input', 'select', 'textarea')
+
+    def __init__(self):
+        self.elements = {tag: [] for tag in self.tags}
+
+    def enter(self, element):
+        if not element.get('role') and not any(attr.startswith('aria-') for attr in element.attrs):
+            self.elements[element.name].append(element)
+
+    # Agrupados por etiqueta: primero todos los botones, luego inputs, selects y textareas
+    def result(self):
+        problems = []
+        for tag in self.tags:
+            for elem in self.elements[tag]:
+                elem_text = elem.text.strip() or f"Class: {elem.get('class')}" or f"ID: {elem.get('id')}"
+                if elem_text:
+                    problems.append(elem_text)
+        return problems
+
+@dom_rule
+class FontSizeAndContrastRule(DomRule):
+    name = "font_and_contrast"
+    tags = ('style', 'link', 'base', 'p', 'span', 'a', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'ul')
+    text_tags = ('p', 'span', 'a', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'ul')
+
+    def __init__(self):
+        self.style_sources = []  # <style> y <link rel="stylesheet"> en orden de documento
+        self.elements = []
+        self.base_href = None
+
+    def enter(self, element):
+        if element.name == 'style' or element.name == 'link' and attribute_matches(element.get('rel'), 'stylesheet'):
+            self.style_sources.append(element)
+        elif element.name == 'base' and self.base_href is None and element.get('href'):
+            self.base_href = element['href']
+        elif element.name in self.text_tags:
+            self.elements.append(element)
+
+    def result(self):
+        # Las hojas se reúnen después del recorrido porque un <style> posterior también afecta a los elementos anteriores
+        page_url = self.context.get("url")
+        base_url = urljoin(page_url, self.base_href) if page_url and self.base_href else page_url
+        load_stylesheet = self.context.get("load_stylesheet") or stylesheet_cache.get
+        cache_stats = {"lookups": 0, "hits": 0}
+        problems = evaluate_font_size_and_contrast(page_stylesheets(base_url, self.style_sources, load_stylesheet), self.elements, cache_stats)
+        return {"problems": problems, "contrast_cache": cache_stats}
+
+@dom_rule
+class GoogleAnalyticsRule(DomRule):
+    name = "google_analytics"
+    strings = True
+    pattern = re.compile("GoogleAnalyticsObject")
+
+    def __init__(self):
+        self.found = False
+
+    def string(self, text):
+        if not self.found and self.pattern.search(text):
+            self.found = True
+
+    def result(self):
+        return self.found
+
+# Hojas de estilo y scripts externos de la página: [(tipo, href)] con tipo 'css' o 'js'
+@dom_rule
+class AssetReferencesRule(DomRule):
+    name = "assets"
+    tags = ('link', 'script')
+
+    def __init__(self):
+        self.asset_refs = []
+
+    def enter(self, element):
+        if element.name == 'link' and attribute_matches(element.get('rel'), 'stylesheet') and element.get('href'):
+            self.asset_refs.append(('css', element['href']))
+        elif element.name == 'script' and element.get('src'):
+            self.asset_refs.append(('js', element['src']))
+
+    def result(self):
+        return self.asset_refs
+
+
+# Verificar el tiempo de carga a partir de las fases medidas
+def check_load_time(timings):
+    load_time = timings["connect"] + timings["ttfb"] + timings["download"]
+    if load_time > 3:  # por ejemplo, consideramos problemático un tiempo mayor a 3 segundos
+        return [
+            f"Tiempo de carga: {load_time:.2f} segundos (conexión: {timings['connect']:.2f} s, "
+            f"primer byte: {timings['ttfb']:.2f} s, descarga: {timings['download']:.2f} s, parseo: {timings['parse']:.2f} s)"
+        ]
+    return []
+
+# Verificar enlaces rotos (404) con la caché de estados del rastreo
+def find_broken_links(link_urls):
+    unique_link_urls = list(dict.fromkeys(link_urls))
+    link_status = dict(zip(unique_link_urls, fetch_all(link_status_cache.get_status, unique_link_urls)))
+    return [link_url for link_url in link_urls if link_status[link_url] == 404]
+
+
+# Re-auditoría incremental ##########################################
+# Guarda por URL la huella del HTML descargado y los hallazgos de la página. En la siguiente ejecución,
+# si la huella no ha cambiado, se reutilizan los hallazgos sin parsear ni volver a ejecutar los checks.
+# Solo se refresca lo que no depende del HTML: tiempo de carga y estado de los enlaces.
+# Hallazgos y enlaces se guardan como números de la tabla de textos del almacén (PageFindings), en memoria y en
+# el fichero, que la lleva una sola vez: {"version": 2, "strings": [...], "pages": {URL: entrada}}.
+class IncrementalAuditStore:
+    def __init__(self, path):
+        self.path = path
+        self.previous = {}
+        self.current = {}
+        self.reused = 0
+        self.lock = threading.Lock()
+        self.strings = StringTable()
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    self.previous = self.load(json.load(file))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"No se pudo leer el estado incremental {path}: {e}")
+
+    # Pasa los números del fichero a los de self.strings
+    def load(self, state):
+        if state.get("version") != 2:
+            # Estado guardado por versiones anteriores: {URL: entrada} con los textos en cada página
+            pages = state
+            for url, entry in pages.items():
+                entry["findings"] = PageFindings(self.strings, url, entry["report"].pop("problems")).records
+                entry["link_urls"] = self.strings.intern_all(entry["link_urls"])
+        else:
+            pages = state["pages"]
+            ids = self.strings.intern_all(state["strings"])
+            for entry in pages.values():
+                entry["findings"] = array('I', (ids[string_id] if string_id != PageFindings.NO_SNIPPET else string_id for string_id in entry["findings"]))
+                entry["link_urls"] = array('I', (ids[string_id] for string_id in entry["link_urls"]))
+                if "page_links" in entry:
+                    entry["page_links"] = array('I', (ids[string_id] for string_id in entry["page_links"]))
+        for entry in pages.values():
+            if "page_links" not in entry:
+                # Antes los enlaces a seguir iban con sus textos en el informe, o no se guardaban
+                page_links = entry["report"].pop("page_links", None) or dict.fromkeys(self.strings.resolve(entry["link_urls"]))
+                entry["page_links"] = self.strings.intern_all(page_links)
+        return pages
+
+    # Entrada de la página con los textos ya resueltos (solo se reconstruye la que se reutiliza)
+    def lookup(self, url, fingerprint):
+        entry = self.previous.get(url)
+        if entry and entry["fingerprint"] == fingerprint:
+            with self.lock:
+                self.reused += 1
+            report = dict(entry["report"], problems=PageFindings(self.strings, url, records=entry["findings"]).problems(self.strings))
+            return dict(entry, report=report, link_urls=self.strings.resolve(entry["link_urls"]), page_links=self.strings.resolve(entry["page_links"]))
+        return None
+
+    # Se llama con el informe recién salido de analyze_page, antes de añadir el contenido duplicado del sitio
+    def record(self, report, content_index):
+        findings = PageFindings(self.strings, report["url"], report["problems"])
+        stored_report = {key: value for key, value in report.items() if key not in ("link_urls", "page_links", "fingerprint", "reused", "problems")}
+        entry = {
+            "fingerprint": report["fingerprint"],
+            "link_urls": self.strings.intern_all(report["link_urls"]),
+            "page_links": self.strings.intern_all(report["page_links"]),
+            "content_hash": report["content_hash"],
+            "near_signature": content_index.signature_of(report["url"]) if content_index is not None else None,
+            "report": stored_report,
+            "findings": findings.records
+        }
+        with self.lock:
+            self.current[report["url"]] = entry
+
+    # Solo se guardan las URLs de esta ejecución: las páginas que ya no existen desaparecen del estado, y de la
+    # tabla de textos solo se escribe lo que usan las páginas guardadas
+    def save(self):
+        with self.lock:
+            state = dict(self.current)
+        strings = StringTable()
+        renumber = lambda string_ids: [strings.intern(self.strings[string_id]) if string_id != PageFindings.NO_SNIPPET else string_id for string_id in string_ids]
+        pages = {url: dict(entry, findings=renumber(entry["findings"]), link_urls=renumber(entry["link_urls"]), page_links=renumber(entry["page_links"]))
+                 for url, entry in state.items()}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({"version": 2, "strings": strings.strings, "pages": pages}, file)
+        os.replace(tmp_path, self.path)
+
+incremental_store = None
+
+# Informe de una página sin cambios a partir de lo guardado en la ejecución anterior
+def reuse_previous_report(url, previous, fingerprint, timings, content_index):
+    report = dict(previous["report"])
+    report["problems"] = {category: list(items) for category, items in report["problems"].items()}
+    report["problems"]["Tiempo de carga de la página"] = check_load_time(timings)
+    check_timings = report["check_timings"] = {}  # solo se vuelve a ejecutar lo que depende de la red
+    with timed(check_timings, "broken_links"):
+        report["problems"]["Enlaces rotos (404)"] = find_broken_links(previous["link_urls"])
+    report.setdefault("asset_urls", [])  # estado guardado por versiones anteriores
+    with timed(check_timings, "assets"):
+        report["problems"].update(find_unminified_assets(report["asset_urls"]))  # los CSS/JS pueden cambiar sin el HTML
+    report.setdefault("image_refs", [])
+    with timed(check_timings, "image_weight"):
+        image_problems, report["image_weight"] = find_image_problems(report["image_refs"])  # y las imágenes también
+    report["problems"].update(image_problems)
+    report["timings"] = timings
+    report["link_urls"] = previous["link_urls"]
+    report["page_links"] = previous["page_links"]
+    report["fingerprint"] = fingerprint
+    report["contrast_cache"] = {"lookups": 0, "hits": 0}  # no se ha evaluado nada
+    report["reused"] = True
+    if content_index is not None and previous["content_hash"]:
+        content_index.add_hashes(url, previous["content_hash"], previous["near_signature"])
+    return report
+
+
+# Parte de E/S del análisis de una página: descarga y huella del HTML. Devuelve (respuesta, huella, informe);
+# el informe solo viene ya hecho si hubo un error o si la página no ha cambiado desde la auditoría anterior.
+def fetch_page(url, content_index=None):
     try:
         response = get_with_retries(url)
+    except SkippedPageError as e:
+        return None, None, {"skipped": str(e)}
     except requests.exceptions.RequestException as e:
-        return {"error": f"Error al acceder a la página: {e}"}
+        return None, None, {"error": f"Error al acceder a la página: {e}"}
     
     if response.status_code != 200:
-        return {"error": f"Error al acceder a la página: {response.status_code}"}
-    
-    soup = BeautifulSoup(response.content, 'html.parser')
+        return None, None, {"error": f"Error al acceder a la página: {response.status_code}"}
+
+    # Modo incremental: si el HTML no ha cambiado desde la ejecución anterior se reutilizan sus hallazgos
+    fingerprint = hashlib.sha256(response.content).hexdigest()
+    previous = incremental_store.lookup(url, fingerprint) if incremental_store is not None else None
+    if previous:
+        report = reuse_previous_report(url, previous, fingerprint, dict(response.timings, parse=previous["report"]["timings"]["parse"]), content_index)
+        report["server"] = response.headers.get('Server', 'Unknown')
+        return response, fingerprint, report
+    return response, fingerprint, None
+
+
+def analyze_page(url, content_index=None):
+    response, fingerprint, report = fetch_page(url, content_index)
+    if report is not None:
+        return report
     
-    # Excluir elementos dentro de #footer-page
-    footer_page = soup.find(id='footer-page')
-    if footer_page:
-        footer_page.decompose()
+    check_timings = {}
+    with timed(check_timings, "parse"):
+        soup = parse_html(response.content)
+    timings = dict(response.timings, parse=check_timings["parse"][0])
+
+    # Registrar el contenido en el índice de duplicados (antes de quitar #footer-page, como el texto completo de la página)
+    with timed(check_timings, "content_hash"):
+        content_hash = content_index.add(url, soup) if content_index is not None else None
+
+    report = audit_document(url, soup, timings, origin_info_cache.get(url))
+    report["check_timings"].update(check_timings)
+    report["content_hash"] = content_hash
+    report["fingerprint"] = fingerprint
+    report["server"] = response.headers.get('Server', 'Unknown')
+    return report
+
+
+# Parte CPU del análisis de una página para el modo pipeline: se ejecuta en un proceso del pool y solo recibe y
+# devuelve datos simples. Los enlaces rotos (red y caché compartida) se comprueban luego en el proceso principal,
+# y las hojas de estilo llegan ya descargadas en stylesheet_texts ({URL: texto}, de prefetch_page_stylesheets).
+def audit_page_content(url, content, fetch_timings, origin_info, parser, content_features, signature_size, stylesheet_texts):
+    check_timings = {}
+    with timed(check_timings, "parse"):
+        soup = parse_html(content, parser)
+    timings = dict(fetch_timings, parse=check_timings["parse"][0])
+    with timed(check_timings, "content_hash"):
+        content_hash, signature = page_content_features(soup, signature_size) if content_features else (None, None)
+    report = audit_document(url, soup, timings, origin_info, check_links=lambda link_urls: [], check_assets=lambda asset_urls: {},
+                            check_images=lambda image_refs: ({}, None),
+                            load_stylesheet=lambda sheet_url: stylesheet_cache.compile(sheet_url, stylesheet_texts.get(sheet_url)))
+    report["check_timings"].update(check_timings)
+    return report, content_hash, signature
+
+# Completa en el proceso principal un informe que viene de audit_page_content
+def finish_page_report(url, fingerprint, report, content_hash, signature, content_index=None):
+    check_timings = report["check_timings"]
+    with timed(check_timings, "broken_links"):
+        report["problems"]["Enlaces rotos (404)"].extend(find_broken_links(report["link_urls"]))
+    with timed(check_timings, "assets"):
+        asset_problems = find_unminified_assets(report["asset_urls"])
+    for category, items in asset_problems.items():
+        report["problems"][category].extend(items)
+    with timed(check_timings, "image_weight"):
+        image_problems, report["image_weight"] = find_image_problems(report["image_refs"])
+    for category, items in image_problems.items():
+        report["problems"][category].extend(items)
+    if content_index is not None:
+        content_index.add_hashes(url, content_hash, signature)
+    report["content_hash"] = content_hash
+    report["fingerprint"] = fingerprint
+    return report
+
+
+# Aplica todas las comprobaciones a un documento ya parseado. Lo único que necesita red, el estado de los
+# enlaces, robots/sitemap del origen, los CSS/JS del sitio, las imágenes y las hojas de estilo externas, llega
+# por parámetro (check_links, origin_info, check_assets, check_images y load_stylesheet, que por defecto usa la
+# caché de hojas del proceso).
+def audit_document(url, soup, timings, origin_info, check_links=find_broken_links, load_stylesheet=None, check_assets=find_unminified_assets, check_images=find_image_problems):
+    # Un solo recorrido del árbol para todas las reglas, excluyendo los elementos dentro de #footer-page
+    check_timings = {}
+    dom = run_dom_rules(soup, skip_id='footer-page', context={"url": url, "load_stylesheet": load_stylesheet}, timings=check_timings)
 
     problems = {
         "Imágenes sin texto alternativo": [],
@@ -797,7 +3375,12 @@ def analyze_page(url, internal_links=None):
         "Estructura semántica del documento": [],
         "Accesibilidad de formularios": [],
         "Contenido parpadeante": [],
-        "Accesibilidad de SVGs": []
+        "Accesibilidad de SVGs": [],
+        "CSS no minificado": [],
+        "JS no minificado": [],
+        "Imágenes pesadas": [],
+        "Imágenes sobredimensionadas": [],
+        "Peso de imágenes de la página": []
     }
 
     seo_info = []
@@ -807,8 +3390,7 @@ def analyze_page(url, internal_links=None):
     }
 
     # Verificar el tiempo de carga
-    if load_time > 3:  # por ejemplo, consideramos problemático un tiempo mayor a 3 segundos
-        problems["Tiempo de carga de la página"].append(f"Tiempo de carga: {load_time:.2f} segundos")
+    problems["Tiempo de carga de la página"].extend(check_load_time(timings))
     
     # Verificar la longitud de la URL
     is_long, url_length = check_url_length(url)
@@ -816,61 +3398,42 @@ def analyze_page(url, internal_links=None):
         problems["URLs demasiado largas"].append(f"URL: {url} | Longitud: {url_length} caracteres")
 
     # Verificar canonical tags
-    if not check_canonical_tag(soup):
+    if not dom["head_links"]["canonical"]:
         problems["Canonical tags"].append("No se encontraron etiquetas canonical")
 
     # Verificar hreflang tags
-    if not check_hreflang_tags(soup):
+    if not dom["head_links"]["hreflang"]:
         problems["Hreflang tags"].append("No se encontraron etiquetas hreflang")
     
     # Verificar el uso de roles ARIA
-    aria_roles = check_aria_roles(soup)
-    aria_roles_info["total_aria_roles"] = len(soup.find_all(attrs={"role": True}))
-    aria_roles_info["total_roles"] = sum(1 for _ in soup.find_all(attrs={"role": True}))
+    aria_roles_info["total_aria_roles"] = dom["aria_roles"]["total"]
+    aria_roles_info["total_roles"] = dom["aria_roles"]["total"]
 
     # Verificar accesibilidad de tablas
-    table_problems = check_table_accessibility(soup)
-    if table_problems:
-        problems["Accesibilidad de tablas"].extend(table_problems)
+    problems["Accesibilidad de tablas"].extend(dom["tables"])
     
-    # Verificar contenido duplicado si se proporcionan enlaces internos
-    if internal_links:
-        duplicates = check_duplicate_content(internal_links)
-        if duplicates:
-            problems["Posible contenido duplicado"].extend([f"{dup[0]} y {dup[1]}" for dup in duplicates])
+    # El contenido duplicado se resuelve al final del rastreo con check_duplicate_content(content_index)
     
     # Verificar eventos de teclado
-    keyboard_problems = check_keyboard_events(soup)
-    if keyboard_problems:
-        problems["Eventos de teclado"].extend([f"Falla en <{elem}>" for elem in keyboard_problems])
+    problems["Eventos de teclado"].extend([f"Falla en <{elem}>" for elem in dom["keyboard_events"]])
     
     # Verificar landmarks ARIA
-    landmarks_problems = check_aria_landmarks(soup)
-    if landmarks_problems:
-        problems["Landmarks ARIA"].extend(landmarks_problems)
+    problems["Landmarks ARIA"].extend(dom["aria_roles"]["landmark_problems"])
     
     # Verificar estructura semántica
-    semantic_problems = check_semantic_structure(soup)
-    if semantic_problems:
-        problems["Estructura semántica del documento"].extend(semantic_problems)
+    problems["Estructura semántica del documento"].extend(dom["semantic_structure"])
     
     # Verificar accesibilidad de formularios
-    form_problems = check_form_accessibility(soup)
-    if form_problems:
-        problems["Accesibilidad de formularios"].extend(form_problems)
+    problems["Accesibilidad de formularios"].extend(dom["forms"]["accessibility"])
     
     # Verificar contenido parpadeante
-    blinking_problems = check_no_blinking_content(soup)
-    if blinking_problems:
-        problems["Contenido parpadeante"].extend(blinking_problems)
+    problems["Contenido parpadeante"].extend(dom["blinking"])
     
     # Verificar accesibilidad de SVGs
-    svg_problems = check_svg_accessibility(soup)
-    if svg_problems:
-        problems["Accesibilidad de SVGs"].extend(svg_problems)
+    problems["Accesibilidad de SVGs"].extend(dom["svgs"])
     
     # Obtener título de la página
-    title_tag = soup.find('title')
+    title_tag = dom["meta"]["title"]
     title = title_tag.text.strip() if title_tag else "No se encontró título"
     seo_info.append(f"Título: {title}")
     if not title_tag:
@@ -879,7 +3442,7 @@ def analyze_page(url, internal_links=None):
         problems["Título de la página"] = [f"La longitud del título es {'demasiado corta' if len(title) < 30 else 'demasiado larga'}: {len(title)} caracteres"]
 
     # Obtener meta description
-    meta_description_tag = soup.find('meta', attrs={'name': 'description'})
+    meta_description_tag = dom["meta"]["description"]
     meta_description = meta_description_tag['content'].strip() if meta_description_tag else "No se encontró meta descripción"
     seo_info.append(f"Meta Descripción: {meta_description}")
     if not meta_description_tag:
@@ -888,85 +3451,82 @@ def analyze_page(url, internal_links=None):
         problems["Meta Descripción"] = [f"La longitud de la meta descripción es {'demasiado corta' if len(meta_description) < 70 else 'demasiado larga'}: {len(meta_description)} caracteres"]
 
     # Verificar presencia de H1
-    h1_tags = soup.find_all('h1')
-    if len(h1_tags) == 0:
+    headings = dom["headings"]
+    h1_count = sum(1 for h in headings if h.name == 'h1')
+    if h1_count == 0:
         problems["H1"] = ["No se encontraron etiquetas h1"]
-    elif len(h1_tags) > 1:
-        problems["H1"] = [f"Multiples etiquetas H1 encontradas: {len(h1_tags)}"]
+    elif h1_count > 1:
+        problems["H1"] = [f"Multiples etiquetas H1 encontradas: {h1_count}"]
     
     # Verificar enlaces internos y externos
-    internal_links = [a['href'] for a in soup.find_all('a', href=True) if url in a['href']]
-    external_links = [a['href'] for a in soup.find_all('a', href=True) if url not in a['href']]
+    hrefs = dom["links"]
+    internal_links = [href for href in hrefs if url in href]
     seo_info.append(f"Internal Links: {len(internal_links)}")
-    seo_info.append(f"External Links: {len(external_links)}")
+    seo_info.append(f"External Links: {len(hrefs) - len(internal_links)}")
     
     # Verificar enlaces rotos (404)
-    for link in soup.find_all('a', href=True):
-        link_url = urljoin(url, link['href'])  # Asegúrate de que la URL sea absoluta
-        try:
-            head_response = head_with_retries(link_url)
-            if head_response.status_code == 404:
-                problems["Enlaces rotos (404)"].append(link_url)
-        except requests.exceptions.RequestException:
-            continue
+    link_urls = [urljoin(url, href) for href in hrefs]  # Asegúrate de que la URL sea absoluta
+    # Todos los enlaces de la página (también los de #footer-page) para la frontera de rastreo
+    page_links = list(dict.fromkeys(link_urls + [urljoin(url, href) for href in dom["skipped_hrefs"]]))
+    with timed(check_timings, "broken_links"):
+        problems["Enlaces rotos (404)"].extend(check_links(link_urls))
+
+    # Verificar minificación de los CSS/JS del mismo origen (cada uno se audita una sola vez en todo el rastreo)
+    asset_urls = same_origin_assets(url, dom["assets"])
+    with timed(check_timings, "assets"):
+        asset_problems = check_assets(asset_urls)
+    for category, items in asset_problems.items():
+        problems[category].extend(items)
     
     # Verificar presencia de favicon
-    favicon = soup.find('link', rel='icon')
-    if not favicon:
+    if not dom["head_links"]["favicon"]:
         problems["Favicon"] = ["No se encontró ningún favicon (icon de url)"]
     
-    # Verificar etiqueta robots
-    robots_exists, robots_url = check_robots(url)
-    try:
-        robots_content = requests.get(robots_url).text if robots_exists else "No se encontró ningún archivo robots.txt"
-    except requests.exceptions.RequestException:
-        robots_content = "No se encontró ningún archivo robots.txt"
-    if not robots_exists:
+    # Verificar etiqueta robots (una sola vez por origen)
+    robots_url = origin_info["robots_url"]
+    if not origin_info["robots_exists"]:
         problems["Robots"] = ["No se encontró ningún archivo robots.txt"]
     
     # Verificar sitemap.xml y sitemap_index.xml
-    sitemap_exists, sitemap_index_exists, sitemap_url = check_sitemap(url)
-    if not sitemap_exists and not sitemap_index_exists:
+    sitemap_url = origin_info["sitemap_url"]
+    if not origin_info["sitemap_exists"] and not origin_info["sitemap_index_exists"]:
         problems["Sitemap"] = ["No se encontró sitemap.xml ni sitemap_index.xml"]
     
     seo_info.append(f"Robots URL: {robots_url}")
     seo_info.append(f"Sitemap URL: {sitemap_url}")
     
     # Verificar Google Analytics
-    google_analytics = bool(soup.find(string=re.compile("GoogleAnalyticsObject")))
+    google_analytics = dom["google_analytics"]
     seo_info.append(f"Google Analytics: {'Encontrado' if google_analytics else 'No encontrado'}")
     if not google_analytics:
         problems["Google Analytics"] = ["Google Analytics no encontrado"]
     
     # Verificar etiquetas meta keywords
-    meta_keywords_tag = soup.find('meta', attrs={'name': 'keywords'})
+    meta_keywords_tag = dom["meta"]["keywords"]
     meta_keywords = meta_keywords_tag['content'].strip() if meta_keywords_tag else "No se encontraron palabras clave meta"
     seo_info.append(f"Meta Keywords: {meta_keywords}")
     if not meta_keywords_tag:
         problems["Meta Keywords"] = ["No se encontraron palabras clave meta"]
     
     # Verificar imágenes sin texto alternativo
-    images_without_alt = [str(img) for img in soup.find_all('img') if not img.get('alt')]
-    if images_without_alt:
-        problems["Imágenes sin texto alternativo"] = images_without_alt
+    if dom["images"]["without_alt"]:
+        problems["Imágenes sin texto alternativo"] = dom["images"]["without_alt"]
     
     # Verificar imágenes que no son WebP y no contienen 'logo' o 'plugin' en la URL
-    images_not_webp = [img['src'] for img in soup.find_all('img') if 'src' in img.attrs and not img['src'].endswith('.webp') and not any(kw in img['src'] for kw in ['logo', 'plugin'])]
-    if images_not_webp:
-        problems["Imágenes no WebP"] = images_not_webp
+    if dom["images"]["not_webp"]:
+        problems["Imágenes no WebP"] = dom["images"]["not_webp"]
+
+    # Verificar peso y dimensiones de las imágenes (cada una se lee una sola vez en todo el rastreo)
+    image_refs = page_image_refs(url, dom["images"]["sources"])
+    with timed(check_timings, "image_weight"):
+        image_problems, image_weight = check_images(image_refs)
+    for category, items in image_problems.items():
+        problems[category].extend(items)
     
     # Verificar formularios sin etiquetas de campo o aria-label
-    for form in soup.find_all('form'):
-        inputs = form.find_all(['input', 'textarea', 'select'])
-        labels = form.find_all('label')
-        for input_elem in inputs:
-            if 'id' in input_elem.attrs:
-                label_for_input = [label for label in labels if label.get('for') == input_elem['id']]
-                if not label_for_input and not input_elem.get('aria-label'):
-                    problems["Campos de formulario sin etiquetas o aria-label"].append(str(input_elem))
+    problems["Campos de formulario sin etiquetas o aria-label"].extend(dom["forms"]["unlabeled"])
     
     # Verificar jerarquía de encabezados
-    headings = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
     heading_order = [(h.name, h.text.strip()) for h in headings]
     heading_hierarchy = "\n".join([f"{name}: {text}" for name, text in heading_order])
     heading_issues = False
@@ -977,26 +3537,18 @@ def analyze_page(url, internal_links=None):
             break
     
     # Verificar botones sin texto
-    buttons_without_text = [str(button) for button in soup.find_all('button') if not button.text.strip()]
-    if buttons_without_text:
-        problems["Botones sin texto"] = buttons_without_text
+    if dom["buttons_iframes"]["buttons_without_text"]:
+        problems["Botones sin texto"] = dom["buttons_iframes"]["buttons_without_text"]
     
     # Verificar iframes sin títulos
-    iframes_without_title = [str(iframe) for iframe in soup.find_all('iframe') if not iframe.get('title')]
-    if iframes_without_title:
-        problems["iFrames sin título"] = iframes_without_title
+    if dom["buttons_iframes"]["iframes_without_title"]:
+        problems["iFrames sin título"] = dom["buttons_iframes"]["iframes_without_title"]
     
     # Verificar elementos interactivos sin roles ARIA
-    for tag in ['button', 'input', 'select', 'textarea']:
-        elements = soup.find_all(tag)
-        for elem in elements:
-            if not elem.get('role') and not any(attr.startswith('aria-') for attr in elem.attrs):
-                elem_text = elem.text.strip() or f"Class: {elem.get('class')}" or f"ID: {elem.get('id')}"
-                if elem_text:
-                    problems["Elementos interactivos sin roles ARIA"].append(elem_text)
+    problems["Elementos interactivos sin roles ARIA"].extend(dom["interactive_without_aria"])
     
     # Verificar contraste de colores y tamaño de fuente en textos específicos
-    font_and_contrast_problems = check_font_size_and_contrast(soup)
+    font_and_contrast_problems = dom["font_and_contrast"]["problems"]
     problems["Elementos con tamaño de fuente menor a 16px"].extend(font_and_contrast_problems["Elementos con tamaño de fuente menor a 16px"])
     problems["Elementos con buen contraste de color"].extend(font_and_contrast_problems["Elementos con buen contraste de color"])
     
@@ -1008,76 +3560,343 @@ def analyze_page(url, internal_links=None):
         "heading_issues": heading_issues,
         "sitemap_url": sitemap_url,
         "robots_url": robots_url,
-        "aria_roles_info": aria_roles_info
+        "aria_roles_info": aria_roles_info,
+        "timings": timings,
+        "contrast_cache": dom["font_and_contrast"]["contrast_cache"],
+        "asset_urls": asset_urls,
+        "image_refs": image_refs,
+        "image_weight": image_weight,
+        "check_timings": check_timings,
+        "link_urls": link_urls,
+        "page_links": page_links
     }
 
 
+# Motor de rastreo concurrente ##########################################
+# Frontera de rastreo en anchura: cola FIFO de (URL, profundidad) y conjunto de URLs canónicas ya vistas, así
+# /a, /a/, /a#x y /a?utm_source=x se auditan una sola vez. La profundidad de una página es la del primer camino
+# por el que se descubrió. Solo se siguen enlaces a los hosts de las semillas, sin pasar de max_depth ni de
+# max_pages y respetando los patrones include/exclude y robots.txt (allows); las semillas se auditan siempre,
+# porque se han pedido expresamente. Con add_sitemap_source
+# las URLs de los sitemaps entran como semillas (filtradas) a medida que se leen.
+SKIPPED_EXTENSION = re.compile(r'\.(?:' + '|'.join(map(re.escape, CRAWL_SKIP_EXTENSIONS)) + r')$', re.I)
+
+class CrawlFrontier:
+    def __init__(self, seeds, max_depth=CRAWL_MAX_DEPTH, max_pages=CRAWL_MAX_PAGES, include=CRAWL_INCLUDE_PATTERNS, exclude=CRAWL_EXCLUDE_PATTERNS, allows=None):
+        self.allows = allows  # p.ej. origin_info_cache.robots_allows: las URLs que devuelvan False no se rastrean
+        self.disallowed = set()
+        self.skipped_extensions = set()  # URLs que no se piden por su extensión (CRAWL_SKIP_EXTENSIONS)
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.include = [re.compile(pattern) for pattern in include]
+        self.exclude = [re.compile(pattern) for pattern in exclude]
+        self.hosts = {urlparse(canonicalize_url(seed)).netloc for seed in seeds}
+        self.seeds = {canonicalize_url(seed) for seed in seeds}
+        self.seen = set()
+        self.queue = deque()
+        self.sitemap_source = None
+        self.sitemap_urls = set()  # URLs canónicas leídas de los sitemaps
+        self.linked = set()        # URLs canónicas enlazadas desde alguna página auditada
+        for seed in seeds:
+            self.add(seed, 0, trusted=True)
+
+    def accepts(self, url):
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or parsed.netloc not in self.hosts:
+            return False
+        if SKIPPED_EXTENSION.search(parsed.path):
+            self.skipped_extensions.add(url)
+            return False
+        if self.include and not any(pattern.search(url) for pattern in self.include):
+            return False
+        if any(pattern.search(url) for pattern in self.exclude):
+            return False
+        if self.allows is not None and not self.allows(url):
+            self.disallowed.add(url)
+            return False
+        return True
+
+    def is_full(self):
+        return len(self.seen) >= self.max_pages
+
+    def add(self, url, depth, trusted=False):
+        canonical_url = canonicalize_url(url)
+        if depth > 0:
+            self.linked.add(canonical_url)
+        if depth > self.max_depth or canonical_url in self.seen or self.is_full():
+            return False
+        if not trusted and not self.accepts(canonical_url):
+            return False
+        self.seen.add(canonical_url)
+        # Las semillas se piden tal y como se introdujeron; lo demás, en su forma canónica
+        self.queue.append((url if trusted else canonical_url, depth))
+        return True
+
+    def add_links(self, urls, depth):
+        for url in urls:
+            self.add(url, depth)
+
+    def pop(self):
+        return self.queue.popleft() if self.queue else None
+
+    def add_sitemap_source(self, sitemap_url_iterator):
+        self.sitemap_source = sitemap_url_iterator
+
+    # Lee hasta count URLs de los sitemaps (bloquea: se llama desde un hilo). Lista vacía = no hay más que leer.
+    def read_sitemap_urls(self, count):
+        if self.sitemap_source is None or self.is_full():
+            return []
+        urls = []
+        for url in self.sitemap_source:
+            urls.append(url)
+            if len(urls) >= count:
+                break
+        return urls
+
+    # Cierra la lectura en curso (y su conexión) aunque el sitemap no se haya leído entero
+    def close_sitemap_source(self):
+        if self.sitemap_source is not None and hasattr(self.sitemap_source, 'close'):
+            self.sitemap_source.close()
+        self.sitemap_source = None
+
+    def add_sitemap_urls(self, urls):
+        for url in urls:
+            canonical_url = canonicalize_url(url)
+            if self.accepts(canonical_url):
+                self.sitemap_urls.add(canonical_url)
+                self.add(url, 0)
+
+    # URLs de los sitemaps que ninguna página auditada enlaza (solo se sabe de los enlaces de lo auditado)
+    def orphan_urls(self):
+        return sorted(self.sitemap_urls - self.linked - self.seeds)
+
+
+# Lanza audit(link) para las URLs de la frontera, como mucho window a la vez. Cuando termina una página, los
+# enlaces que se encontraron al analizarla entran en la frontera (sin volver a descargarla ni parsearla) y
+# después se llama a handle_report(link, report). Si la frontera tiene sitemaps, se van leyendo por lotes en un
+# hilo aparte cada vez que la cola baja de window, sin parar el rastreo mientras tanto.
+async def drain_frontier(frontier, audit, window, handle_report):
+    loop = asyncio.get_running_loop()
+
+    async def audit_at_depth(link, depth):
+        link, report = await audit(link)
+        return link, depth, report
+
+    pending = set()
+    sitemap_read = None
+    while True:
+        while len(pending) < window:
+            item = frontier.pop()
+            if item is None:
+                break
+            pending.add(asyncio.ensure_future(audit_at_depth(*item)))
+        if frontier.sitemap_source is not None and sitemap_read is None and len(frontier.queue) < window:
+            sitemap_read = loop.run_in_executor(_io_executor, frontier.read_sitemap_urls, window)
+        if not pending and sitemap_read is None:
+            return
+        done, _ = await asyncio.wait(pending | {sitemap_read} if sitemap_read else pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task is sitemap_read:
+                sitemap_read = None
+                urls = task.result()
+                if urls:
+                    frontier.add_sitemap_urls(urls)
+                else:
+                    frontier.close_sitemap_source()
+                continue
+            pending.discard(task)
+            link, depth, report = task.result()
+            frontier.add_links(report.get("page_links", ()), depth + 1)
+            handle_report(link, report)
+
+
+# Analiza las páginas en paralelo (como mucho MAX_CONCURRENCY a la vez) y llama a
+# handle_report(link, report) en cuanto termina cada una.
+async def crawl_async(frontier, handle_report, content_index=None):
+    loop = asyncio.get_running_loop()
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix='sitemaster-page') as page_executor:
+        async def audit(link):
+            try:
+                report = await loop.run_in_executor(page_executor, analyze_page, link, content_index)
+            except Exception as e:
+                report = {"error": f"Error al analizar {link}: {e}"}
+            return link, report
+
+        await drain_frontier(frontier, audit, MAX_CONCURRENCY, handle_report)
+
+
+# Modo pipeline: hilos para descargar (y comprobar enlaces) y un pool de procesos para parsear y ejecutar los
+# checks, así el trabajo CPU no queda limitado por el GIL. Como mucho hay PIPELINE_QUEUE_SIZE páginas entre que
+# empiezan a descargarse y su informe está listo: la memoria no crece con el tamaño del sitio.
+async def crawl_pipeline_async(frontier, handle_report, content_index=None):
+    loop = asyncio.get_running_loop()
+    fetch_slots = asyncio.Semaphore(MAX_CONCURRENCY)
+    signature_size = content_index.near_index.signature_size if content_index is not None and content_index.near_index is not None else None
+
+    # spawn: los procesos no heredan hilos ni conexiones abiertas del proceso principal
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix='sitemaster-page') as io_executor, \
+            ProcessPoolExecutor(max_workers=PIPELINE_PROCESSES, mp_context=multiprocessing.get_context('spawn')) as cpu_executor:
+        async def audit(link):
+            try:
+                async with fetch_slots:
+                    response, fingerprint, report = await loop.run_in_executor(io_executor, fetch_page, link, content_index)
+                    if report is None:
+                        origin_info = await loop.run_in_executor(io_executor, origin_info_cache.get, link)
+                        stylesheet_texts = await loop.run_in_executor(io_executor, prefetch_page_stylesheets, link, response.content)
+                if report is None:
+                    report, content_hash, signature = await loop.run_in_executor(
+                        cpu_executor, audit_page_content, link, response.content, response.timings, origin_info,
+                        html_parser, content_index is not None, signature_size, stylesheet_texts)
+                    report = await loop.run_in_executor(
+                        io_executor, finish_page_report, link, fingerprint, report, content_hash, signature, content_index)
+                    report["server"] = response.headers.get('Server', 'Unknown')
+            except Exception as e:
+                report = {"error": f"Error al analizar {link}: {e}"}
+            return link, report
+
+        await drain_frontier(frontier, audit, max(PIPELINE_QUEUE_SIZE, 1), handle_report)
+
+
+def crawl(frontier, handle_report, content_index=None):
+    if PIPELINE_MODE:
+        asyncio.run(crawl_pipeline_async(frontier, handle_report, content_index))
+    else:
+        asyncio.run(crawl_async(frontier, handle_report, content_index))
+
+
 def main():
-    url = input("Introduce la URL a analizar: ")
-    option = input("¿Quieres analizar solo la URL introducida (1)\nO también analizar las demás URLs con el mismo dominio que se encuentren en la página (2)? ")
+    print("\n > Bienvenido a SiteMaster Audit <\n   > Escaneo todo en uno con generación de informe\n\n")
+
+    global http_client, link_status_cache, origin_info_cache, incremental_store, html_parser, rate_limiter, stylesheet_cache, contrast_cache, asset_audit_cache, audit_metrics
+    audit_metrics = AuditMetrics()
+    html_parser = select_html_parser(HTML_PARSER)
+    rate_limiter = HostRateLimiter()
+    http_client = HTTPClient(cache=HTTPDiskCache(HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES) if HTTP_CACHE_DIR else None)
+    link_status_cache = LinkStatusCache(LINK_STATUS_CACHE_PATH)
+    origin_info_cache = OriginInfoCache()
+    stylesheet_cache = StylesheetCache()
+    contrast_cache = ContrastCache()
+    asset_audit_cache = AssetAuditCache()
+    incremental_store = IncrementalAuditStore(INCREMENTAL_STATE_PATH) if INCREMENTAL_STATE_PATH else None
 
-    reports = []
-    report_files = []
+    url = input("Introduce la URL a analizar: ")
+    option = input(f"¿Quieres analizar solo la URL introducida (1)\nO también analizar las demás URLs del mismo dominio enlazadas desde ella, hasta {CRAWL_MAX_DEPTH} niveles (2)? ")
 
     if option == '1':
         print("Análasis en proceso!")
-        response = get_with_retries(url)
-        if not response:
-            print(f"Error al acceder a {url}")
-            return
-        soup = BeautifulSoup(response.content, 'html.parser')
-        internal_links = [url]  # Solo auditar la URL introducida
-
+        frontier = CrawlFrontier([url], max_depth=0)  # Solo auditar la URL introducida
     elif option == '2':
         print("Este proceso puede tardar un rato...")
-        response = get_with_retries(url)
-        if not response:
-            print(f"Error al acceder a {url}")
-            return
-        soup = BeautifulSoup(response.content, 'html.parser')
-        internal_links = get_internal_links(url, soup)
-    
-    for link in internal_links:
-        report = analyze_page(link, internal_links)
+        # robots.txt y sitemaps del origen antes de rastrear: así también se aplica ya su Crawl-delay
+        origin_info = origin_info_cache.get(url)
+        frontier = CrawlFrontier([url], allows=origin_info_cache.robots_allows if RESPECT_ROBOTS_TXT else None)
+        if CRAWL_USE_SITEMAPS:
+            sitemap_urls = sitemaps_for_origin(origin_info)
+            if sitemap_urls:
+                frontier.add_sitemap_source(iter_sitemap_urls(sitemap_urls))
+    else:
+        print("Opción no válida")
+        return
+
+    final_output_path = os.path.join(os.getcwd(), 'combined_accessibility_seo_report.html')
+    report_writer = CombinedReportWriter(final_output_path)
+    findings_exporter = FindingsExporter(FINDINGS_EXPORT_PATH, FINDINGS_EXPORT_PER_PAGE) if FINDINGS_EXPORT_PATH else None
+    aggregates = SiteAggregates()
+    content_index = ContentHashIndex()
+    skipped_pages = {}  # URL -> motivo por el que no se ha auditado
+
+    def handle_report(link, report):
         if "error" in report:
             print(report["error"])
+        elif "skipped" in report:
+            print(f"Omitida {link}: {report['skipped']}")
+            skipped_pages[link] = report["skipped"]
         else:
-            reports.append(report)
-            individual_report_path = os.path.join(os.getcwd(), f'report_{hashlib.md5(link.encode()).hexdigest()}.html')
-            create_individual_html_report(report, individual_report_path)
-            report_files.append(individual_report_path)
+            audit_metrics.add_page(link, report.pop("check_timings", {}))
+            if incremental_store is not None:
+                incremental_store.record(report, content_index)
+            del report["link_urls"]
+            del report["page_links"]
+            with audit_metrics.timed("report"):
+                report_writer.add_page(report)
+                if findings_exporter is not None:
+                    findings_exporter.add_page(report)
+            aggregates.add(report)
 
-    if reports:
+    try:
+        crawl(frontier, handle_report, content_index)
+    except BaseException:
+        report_writer.discard()
+        raise
+    finally:
+        frontier.close_sitemap_source()
+    link_status_cache.save()
+    if incremental_store is not None:
+        incremental_store.save()
+
+    # Contenido duplicado: una sola pasada por los grupos del índice
+    with audit_metrics.timed("duplicate_content"):
+        duplicates = check_duplicate_content(content_index)
+        near_duplicates = check_near_duplicate_content(content_index)
+    # Un hallazgo por grupo de páginas idénticas y otro por pareja casi duplicada, asignados a la primera URL
+    duplicate_findings = [(urls[0], f"Contenido idéntico en {len(urls)} páginas: {', '.join(urls)}") for urls in duplicates]
+    duplicate_findings.extend((url_a, f"{url_a} y {url_b} (similitud: {similarity:.0%})") for url_a, url_b, similarity in near_duplicates)
+    aggregates.add_findings("Posible contenido duplicado", len(duplicate_findings))
+    if findings_exporter is not None:
+        for page_url, finding in duplicate_findings:
+            findings_exporter.add_late_findings(page_url, "Posible contenido duplicado", [finding])
+    report_writer.add_site_section("Posible contenido duplicado", [finding for page_url, finding in duplicate_findings])
+
+    # URLs de los sitemaps a las que no llega ningún enlace de las páginas auditadas
+    orphan_urls = frontier.orphan_urls()
+    if findings_exporter is not None:
+        for orphan_url in orphan_urls:
+            findings_exporter.add_late_findings(orphan_url, "URLs del sitemap sin enlaces internos", ["Aparece en el sitemap pero ninguna página auditada la enlaza"])
+    listed_orphans = orphan_urls[:1000]
+    if len(orphan_urls) > len(listed_orphans):
+        listed_orphans.append(f"... y {len(orphan_urls) - len(listed_orphans)} más")
+    report_writer.add_site_section("URLs del sitemap sin enlaces internos", listed_orphans)
+
+    # URLs enlazadas que no son páginas HTML: omitidas al descargar (Content-Type o tamaño) o ya por su extensión
+    skipped_pages.update((skipped_url, "Extensión de archivo que no se rastrea") for skipped_url in sorted(frontier.skipped_extensions) if skipped_url not in skipped_pages)
+    if findings_exporter is not None:
+        for skipped_url, reason in skipped_pages.items():
+            findings_exporter.add_late_findings(skipped_url, "URLs omitidas (no HTML o demasiado grandes)", [reason])
+        findings_exporter.close()
+    skipped_lines = [f"{skipped_url} | {reason}" for skipped_url, reason in skipped_pages.items()]
+    if len(skipped_lines) > 1000:
+        skipped_lines = skipped_lines[:1000] + [f"... y {len(skipped_lines) - 1000} más"]
+    report_writer.add_site_section("URLs omitidas (no HTML o demasiado grandes)", skipped_lines)
+
+    # Recursos CSS/JS del sitio, cada uno auditado una sola vez: bytes, minificación y páginas que lo usan
+    asset_lines = [describe_asset(asset, asset_audit_cache.pages_using(asset["url"])) for asset in asset_audit_cache.results()]
+    if len(asset_lines) > 1000:
+        asset_lines = asset_lines[:1000] + [f"... y {len(asset_lines) - 1000} más"]
+    report_writer.add_site_section("Recursos CSS y JS del sitio", asset_lines)
+
+    # Imágenes del sitio, cada una leída una sola vez: formato, dimensiones, bytes y páginas que la usan
+    image_lines = [describe_asset(image, asset_audit_cache.pages_using(image["url"])) for image in asset_audit_cache.results(('img',))]
+    if len(image_lines) > 1000:
+        image_lines = image_lines[:1000] + [f"... y {len(image_lines) - 1000} más"]
+    report_writer.add_site_section("Imágenes del sitio", image_lines)
+
+    # Rendimiento: dónde se ha ido el tiempo (comprobaciones y peticiones) y, si se pide, en formato Prometheus/JSON
+    report_writer.add_site_section("Rendimiento", audit_metrics.report_lines())
+    if METRICS_EXPORT_PATH:
+        audit_metrics.export(METRICS_EXPORT_PATH)
+
+    if aggregates.pages:
         current_date = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
         server_os = os.name
-        try:
-            server_info = response.headers.get('Server', 'Unknown')
-        except Exception as e:
-            server_info = f"Error getting server info: {e}"
-        title = reports[0].get('seo_info', '').split('\n')[0]
-        meta_description = reports[0].get('seo_info', '').split('\n')[1] if len(reports[0].get('seo_info', '').split('\n')) > 1 else 'No se encontró ninguna meta descripción'
-        sitemap_info = reports[0]['sitemap_url']
-        robots_info = reports[0]['robots_url']
-        google_analytics_info = "Encontrado" if "Google Analytics: Encontrado" in reports[0]['seo_info'] else "No enocntrado"
-        total_urls = len(reports)
-        pages_without_title_or_meta = len([r for r in reports if "No se encontró ningún título" in r["seo_info"] or "No se encontró descripción meta" in r["seo_info"]])
-        images_without_alt_total = sum(len(r["problems"]["Imágenes sin texto alternativo"]) for r in reports)
-        pages_with_slow_load = sum(1 for r in reports if r["problems"]["Tiempo de carga de la página"])
-        long_urls_total = sum(1 for r in reports if r["problems"]["URLs demasiado largas"])
-        missing_canonical_tags = sum(1 for r in reports if r["problems"]["Canonical tags"])
-        missing_hreflang_tags = sum(1 for r in reports if r["problems"]["Hreflang tags"])
-        tables_accessibility_issues = sum(len(r["problems"]["Accesibilidad de tablas"]) for r in reports)
-        aria_roles_issues = sum(len(r["problems"]["Uso de roles ARIA"]) for r in reports)
-        duplicate_content_issues = sum(len(r["problems"]["Posible contenido duplicado"]) for r in reports)
-        keyboard_problems_total = sum(len(r["problems"]["Eventos de teclado"]) for r in reports)
-        landmarks_problems_total = sum(len(r["problems"]["Landmarks ARIA"]) for r in reports)
-        semantic_structure_problems_total = sum(len(r["problems"]["Estructura semántica del documento"]) for r in reports)
-        form_accessibility_problems_total = sum(len(r["problems"]["Accesibilidad de formularios"]) for r in reports)
-        blinking_content_problems_total = sum(len(r["problems"]["Contenido parpadeante"]) for r in reports)
-        svg_accessibility_problems_total = sum(len(r["problems"]["Accesibilidad de SVGs"]) for r in reports)
-
-        total_aria_elements = sum(r["aria_roles_info"]["total_aria_roles"] for r in reports)
-        total_role_elements = sum(r["aria_roles_info"]["total_roles"] for r in reports)
+        server_info = aggregates.first_page['server']  # cabecera Server de la descarga de esa página, sin pedirla otra vez
+        seo_lines = aggregates.first_page['seo_info'].split('\n')
+        title = seo_lines[0]
+        meta_description = seo_lines[1] if len(seo_lines) > 1 else 'No se encontró ninguna meta descripción'
+        sitemap_info = aggregates.first_page['sitemap_url']
+        robots_info = aggregates.first_page['robots_url']
+        google_analytics_info = "Encontrado" if "Google Analytics: Encontrado" in aggregates.first_page['seo_info'] else "No enocntrado"
+        total_urls = aggregates.pages
 
         general_info = f'''
         General Information
@@ -1090,45 +3909,61 @@ def main():
         Robots.txt URL: {robots_info}
         Google Analytics: {google_analytics_info}
         Total URLs Analizadas: {total_urls}
-        Total elementos con 'aria': {total_aria_elements}
-        Total elementos con 'role': {total_role_elements}
+        Total elementos con 'aria': {aggregates.total_aria_roles}
+        Total elementos con 'role': {aggregates.total_roles}
+        Conexiones HTTP: {http_client.describe_stats()}
         '''
-
-        if pages_without_title_or_meta > 0:
-            general_info += f"Páginas sin título o meta descripción: {pages_without_title_or_meta}"
-        if images_without_alt_total > 0:
-            general_info += f"Imágenes sin texto alternativo: {images_without_alt_total}"
-        if pages_with_slow_load > 0:
-            general_info += f"Páginas con tiempo de carga lento: {pages_with_slow_load}"
-        if long_urls_total > 0:
-            general_info += f"URLs demasiado largas: {long_urls_total}"
-        if missing_canonical_tags > 0:
-            general_info += f"Faltan etiquetas canonical: {missing_canonical_tags}"
-        if missing_hreflang_tags > 0:
-            general_info += f"Faltan etiquetas hreflang: {missing_hreflang_tags}"
-        if tables_accessibility_issues > 0:
-            general_info += f"Problemas de accesibilidad en tablas: {tables_accessibility_issues}"
-        if aria_roles_issues > 0:
-            general_info += f"Problemas de roles ARIA en elementos interactivos: {aria_roles_issues}"
-        if duplicate_content_issues > 0:
-            general_info += f"Posible contenido duplicado: {duplicate_content_issues}"
-        if keyboard_problems_total > 0:
-            general_info += f"Problemas de eventos de teclado: {keyboard_problems_total}"
-        if landmarks_problems_total > 0:
-            general_info += f"Problemas de landmarks ARIA: {landmarks_problems_total}"
-        if semantic_structure_problems_total > 0:
-            general_info += f"Problemas de estructura semántica: {semantic_structure_problems_total}"
-        if form_accessibility_problems_total > 0:
-            general_info += f"Problemas de accesibilidad de formularios: {form_accessibility_problems_total}"
-        if blinking_content_problems_total > 0:
-            general_info += f"Contenido parpadeante: {blinking_content_problems_total}"
-        if svg_accessibility_problems_total > 0:
-            general_info += f"Problemas de accesibilidad de SVGs: {svg_accessibility_problems_total}"
-
-        final_output_path = os.path.join(os.getcwd(), 'combined_accessibility_seo_report.html')
-        combine_html_reports(report_files, final_output_path, general_info)
+        general_info += f"Ritmo por host: {rate_limiter.describe_stats()}\n"
+        if frontier.disallowed:
+            general_info += f"URLs no rastreadas por robots.txt (Disallow): {len(frontier.disallowed)}\n"
+        if skipped_pages:
+            general_info += f"URLs omitidas por no ser HTML o pasar de {PAGE_MAX_BYTES / 1048576:.1f} MB: {len(skipped_pages)}\n"
+        if http_client.cache:
+            general_info += f"Caché HTTP: {http_client.cache.describe_stats()}\n"
+        asset_stats = asset_audit_cache.describe_stats()
+        if asset_stats:
+            general_info += f"Recursos CSS/JS del mismo origen: {asset_stats}\n"
+        image_stats = asset_audit_cache.describe_image_stats()
+        if image_stats:
+            general_info += f"Imágenes: {image_stats}; peso sumado por página: {aggregates.image_bytes / 1048576:.1f} MB\n"
+        if aggregates.contrast_lookups:
+            general_info += f"Caché de contraste de color: {aggregates.contrast_lookups} consultas, {aggregates.contrast_hits} aciertos ({aggregates.contrast_hits / aggregates.contrast_lookups:.0%}), cálculo por lotes con NumPy: {'sí' if CONTRAST_NUMPY and numpy is not None else 'no'}\n"
+        if frontier.sitemap_urls:
+            general_info += f"URLs leídas de los sitemaps: {len(frontier.sitemap_urls)} (sin enlaces desde las páginas auditadas: {len(orphan_urls)})\n"
+        if incremental_store is not None:
+            general_info += f"Páginas sin cambios reutilizadas de la auditoría anterior: {incremental_store.reused} de {total_urls}\n"
+
+        # (texto, total): los totales a cero no se muestran
+        summary_lines = [
+            ("Páginas sin título o meta descripción", aggregates.pages_without_title_or_meta),
+            ("Imágenes sin texto alternativo", aggregates.count("Imágenes sin texto alternativo")),
+            ("Páginas con tiempo de carga lento", aggregates.pages_with_findings("Tiempo de carga de la página")),
+            ("URLs demasiado largas", aggregates.pages_with_findings("URLs demasiado largas")),
+            ("Faltan etiquetas canonical", aggregates.pages_with_findings("Canonical tags")),
+            ("Faltan etiquetas hreflang", aggregates.pages_with_findings("Hreflang tags")),
+            ("Problemas de accesibilidad en tablas", aggregates.count("Accesibilidad de tablas")),
+            ("Problemas de roles ARIA en elementos interactivos", aggregates.count("Uso de roles ARIA")),
+            ("Posible contenido duplicado", aggregates.count("Posible contenido duplicado")),
+            ("Problemas de eventos de teclado", aggregates.count("Eventos de teclado")),
+            ("Problemas de landmarks ARIA", aggregates.count("Landmarks ARIA")),
+            ("Problemas de estructura semántica", aggregates.count("Estructura semántica del documento")),
+            ("Problemas de accesibilidad de formularios", aggregates.count("Accesibilidad de formularios")),
+            ("Contenido parpadeante", aggregates.count("Contenido parpadeante")),
+            ("Problemas de accesibilidad de SVGs", aggregates.count("Accesibilidad de SVGs")),
+            ("Imágenes pesadas", aggregates.count("Imágenes pesadas")),
+            ("Imágenes sobredimensionadas", aggregates.count("Imágenes sobredimensionadas")),
+            ("Páginas con demasiado peso en imágenes", aggregates.pages_with_findings("Peso de imágenes de la página"))
+        ]
+        for text, total in summary_lines:
+            if total > 0:
+                general_info += f"{text}: {total}\n"
+
+        report_writer.close(general_info)
         print(f"Auditoría de accesibilidad y SEO completada. El reporte combinado ha sido generado en '{final_output_path}'.")
-
+        if FINDINGS_EXPORT_PATH:
+            print(f"Hallazgos exportados en '{FINDINGS_EXPORT_PATH}'.")
+        if METRICS_EXPORT_PATH:
+            print(f"Métricas de rendimiento exportadas en '{METRICS_EXPORT_PATH}'.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,422 @@
+# Benchmark reproducible de SiteMaster Audit contra un sitio sintético servido en local
+#
+# Uso: python3 benchmark_crawl.py [--pages N] [--latency MS] [--jitter MS] [--seed S] [--flows analyze_page,main,checks]
+#                                 [--pipeline] [--json resultados.json] [--compare anterior.json]
+#      python3 benchmark_crawl.py --serve-only --pages N [--port P]   (solo el servidor, para pruebas a mano)
+#
+# El sitio (de 10 a 100k páginas) se genera al vuelo a partir de la semilla, así que dos ejecuciones con los mismos
+# argumentos auditan exactamente el mismo HTML: navegación y pie (#footer-page), formularios, tablas, SVGs, estilos
+# en línea, imágenes, CSS/JS compartidos y enlaces rotos. Lo sirve un http.server en otro proceso, con una latencia
+# fija por respuesta (--latency) más una variación determinista por URL (--jitter).
+#
+# Cada flujo se mide en un proceso nuevo, para que el pico de memoria (RSS) y las cachés no se mezclen:
+# - analyze_page: analyze_page() página a página, sin concurrencia.
+# - main: main() completo con la opción 2 (rastreo del sitio e informe), como lo ejecutaría un usuario.
+# - checks: tiempo de CPU de cada regla del DOM sobre páginas ya descargadas, cada una en su propio recorrido del
+#   árbol (descontando el recorrido vacío), más el parseo.
+# Las peticiones por página las cuenta el servidor (todas las que recibe dividido entre las páginas HTML pedidas).
+import argparse
+import builtins
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FLOWS = ['analyze_page', 'main', 'checks']
+SITEMAP_CHUNK = 50000  # URLs por fichero de sitemap (el máximo del protocolo)
+FAN_OUT = 10           # páginas hijas enlazadas desde cada página: el sitio es un árbol de anchura fija
+SHARED_IMAGES = 20     # imágenes distintas que comparten todas las páginas
+BROKEN_LINKS = 50      # URLs rotas distintas a las que apuntan las páginas
+
+# PNG mínimo válido (1x1) para las imágenes del sitio
+PNG_1X1 = bytes.fromhex('89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+                        '1f15c4890000000d49444154789c6360000000000500010d0a2db40000000049454e44ae426082')
+
+SITE_CSS = b'''body { font-family: sans-serif; color: #222; background: #fff; }
+nav a { color: #0645ad; margin-right: 1em; }
+.muted { color: #999; font-size: 13px; }
+.card p { font-size: 0.9em; }
+#footer-page { background: #333; color: #ccc; }
+table th { text-align: left; }
+'''
+
+SITE_JS = b'document.addEventListener("DOMContentLoaded",function(){var n=document.querySelectorAll("nav a");for(var i=0;i<n.length;i++){n[i].dataset.ready="1"}});\n'
+
+WORDS = ('auditoría accesibilidad rendimiento contenido página enlace formulario tabla imagen estilo servidor usuario '
+         'navegación búsqueda producto servicio contacto noticias blog documentación precio cliente equipo').split()
+
+
+# Sitio sintético ##########################################
+def page_path(index):
+    return '/' if index == 0 else f'/p/{index}.html'
+
+
+def sentence(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+# HTML de la página index: siempre el mismo para la misma semilla y el mismo tamaño de sitio
+def page_html(index, pages, seed):
+    rng = random.Random(seed * 1000003 + index)
+    parent = (index - 1) // FAN_OUT
+    children = [child for child in range(index * FAN_OUT + 1, index * FAN_OUT + FAN_OUT + 1) if child < pages]
+    related = [rng.randrange(pages) for _ in range(3)]
+    parts = [f'''<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>Página {index} - Sitio de prueba</title>
+<meta name="description" content="{sentence(rng, 8)}">
+{'<meta name="keywords" content="prueba, benchmark">' if index % 3 else ''}
+<link rel="stylesheet" href="/static/site.css"><link rel="icon" href="/favicon.ico">
+{'<link rel="canonical" href="' + page_path(index) + '">' if index % 2 else ''}
+<style>.card {{ padding: 8px; }} .note {{ color: #aaa; background-color: #fff; }}</style>
+<script src="/static/app.js"></script></head><body>
+<header><nav>''']
+    parts.extend(f'<a href="{page_path(section)}">Sección {section}</a>' for section in range(min(pages, 9)))
+    parts.append(f'</nav></header><main><h1>Página {index}</h1>')
+    if index:
+        parts.append(f'<p>Volver a <a href="{page_path(parent)}">la página {parent}</a>.</p>')
+    for block in range(rng.randint(2, 5)):
+        parts.append(f'<section class="card"><h2>Apartado {block}</h2><p>{sentence(rng, 30)}</p>')
+        if rng.random() < 0.5:
+            parts.append(f'<p style="font-size: 12px; color: #{rng.choice(["999", "777", "555", "bbb"])}">{sentence(rng)}</p>')
+        if rng.random() < 0.3:
+            parts.append(f'<h4>{sentence(rng, 3)}</h4>')  # salto de nivel en los encabezados
+        parts.append(f'<p class="muted note">{sentence(rng)}</p></section>')
+    image = rng.randrange(SHARED_IMAGES)
+    alt = '' if rng.random() < 0.3 else f' alt="Imagen {image}"'
+    parts.append(f'<img src="/img/{image}.png" width="{rng.choice([64, 200, 800])}" height="64"{alt}>')
+    parts.append('<ul>')
+    parts.extend(f'<li><a href="{page_path(child)}">{sentence(rng, 4)}</a></li>' for child in children + related)
+    parts.extend(f'<li><a href="/missing/{rng.randrange(BROKEN_LINKS)}.html">Enlace roto</a></li>' for _ in range(rng.randint(0, 2)))
+    parts.append('</ul>')
+    if rng.random() < 0.5:
+        parts.append('<form action="/buscar"><label for="q">Buscar</label><input id="q" name="q"><input name="email" type="email">'
+                     '<select name="orden"><option>fecha</option></select><button type="submit"></button></form>')
+    if rng.random() < 0.4:
+        header = '<tr><th>Producto</th><th>Precio</th></tr>' if rng.random() < 0.5 else ''
+        rows = ''.join(f'<tr><td>{rng.choice(WORDS)}</td><td>{rng.randint(1, 500)} €</td></tr>' for _ in range(rng.randint(3, 12)))
+        parts.append(f'<table>{header}{rows}</table>')
+    if rng.random() < 0.5:
+        title = '<title>Icono</title>' if rng.random() < 0.5 else ''
+        parts.append(f'<svg width="24" height="24" viewBox="0 0 24 24">{title}<circle cx="12" cy="12" r="10"/></svg>')
+    if rng.random() < 0.2:
+        parts.append('<div onclick="abrir()" style="cursor: pointer">Abrir</div><iframe src="/static/embed.html"></iframe>')
+    parts.append('</main><div id="footer-page"><footer><p class="muted">Pie de página</p>')
+    parts.extend(f'<a href="{page_path(section)}">Legal {section}</a>' for section in range(min(pages, 4)))
+    parts.append('</footer></div></body></html>\n')
+    return ''.join(parts).encode('utf-8')
+
+
+def sitemap_xml(host, pages, chunk):
+    if chunk is None and pages > SITEMAP_CHUNK:
+        entries = ''.join(f'<sitemap><loc>http://{host}/sitemap-{number}.xml</loc></sitemap>' for number in range((pages + SITEMAP_CHUNK - 1) // SITEMAP_CHUNK))
+        return f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</sitemapindex>'.encode()
+    first = (chunk or 0) * SITEMAP_CHUNK
+    entries = ''.join(f'<url><loc>http://{host}{page_path(index)}</loc></url>' for index in range(first, min(pages, first + SITEMAP_CHUNK)))
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>'.encode()
+
+
+# Servidor ##########################################
+class SyntheticSiteHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, como un servidor real
+    site = None                    # {"pages", "seed", "latency", "jitter"}
+    counters = None
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def count(self, key):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    # Cuerpo y tipo de la ruta pedida, o (None, None) si no existe
+    def resolve(self, path):
+        site = self.site
+        host = self.headers.get('Host', 'localhost')
+        if path == '/' or path.startswith('/p/'):
+            try:
+                index = 0 if path == '/' else int(path[3:-5])
+            except ValueError:
+                return None, None
+            if 0 <= index < site["pages"] and path == page_path(index):
+                return page_html(index, site["pages"], site["seed"]), 'text/html; charset=utf-8'
+        elif path == '/robots.txt':
+            return f'User-agent: *\nAllow: /\nSitemap: http://{host}/sitemap.xml\n'.encode(), 'text/plain'
+        elif path == '/sitemap.xml':
+            return sitemap_xml(host, site["pages"], None), 'application/xml'
+        elif path.startswith('/sitemap-') and path[9:-4].isdigit():
+            return sitemap_xml(host, site["pages"], int(path[9:-4])), 'application/xml'
+        elif path == '/static/site.css':
+            return SITE_CSS, 'text/css'
+        elif path == '/static/app.js':
+            return SITE_JS, 'application/javascript'
+        elif path == '/static/embed.html':
+            return b'<html><body>embed</body></html>', 'text/html'
+        elif path == '/favicon.ico' or (path.startswith('/img/') and path.endswith('.png')):
+            return PNG_1X1, 'image/png'
+        return None, None
+
+    def respond(self, send_body):
+        path = self.path.split('?')[0]
+        if path == '/__stats':
+            with self.lock:
+                body = json.dumps(self.counters).encode()
+        elif path == '/__reset':
+            with self.lock:
+                self.counters.clear()
+            body = b'{}'
+        else:
+            self.count("requests")
+            self.count(f"{self.command} {'page' if path == '/' or path.startswith('/p/') else 'other'}")
+            delay = self.site["latency"] + random.Random(path).uniform(0, self.site["jitter"])
+            if delay:
+                time.sleep(delay)
+            body, content_type = self.resolve(path)
+            if body is None:
+                self.count("not_found")
+                body, content_type = b'<html><body>No encontrado</body></html>', 'text/html'
+                self.send_response(404)
+            else:
+                self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.respond(True)
+
+    def do_HEAD(self):
+        self.respond(False)
+
+
+def serve(site, port, ready):
+    handler = type('Handler', (SyntheticSiteHandler,), {"site": site, "counters": {}, "lock": threading.Lock()})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+def server_request(base_url, path):
+    import requests
+    return requests.get(base_url + path, timeout=10).json()
+
+
+# Flujos (cada uno en su propio proceso) ##########################################
+# El sitio es local y se quiere medir el auditor, no la cortesía con el servidor: el ritmo por host y los límites
+# del rastreo se ajustan al benchmark. Los valores por defecto de esas clases se fijan al importar el módulo, por
+# eso se sustituyen las clases en lugar de cambiar las constantes.
+def configure(sma, options):
+    sma.HostRateLimiter = partial(sma.HostRateLimiter, rate=options["rate_limit"])
+    sma.CrawlFrontier = partial(sma.CrawlFrontier, max_depth=10 ** 6, max_pages=options["pages"] + BROKEN_LINKS)  # los enlaces rotos también se piden
+    sma.rate_limiter = sma.HostRateLimiter()
+    sma.PIPELINE_MODE = options["pipeline"]
+    sma.INCREMENTAL_STATE_PATH = None
+    sma.HTTP_CACHE_DIR = None
+    sma.FINDINGS_EXPORT_PATH = None
+
+
+# CPU del proceso más la de sus procesos hijos ya terminados (el pool del modo pipeline)
+def cpu_seconds():
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def peak_rss_mb():
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss  # procesos del modo pipeline
+    return max(own, children) / 1024  # Linux: KB
+
+
+def flow_analyze_page(sma, base_url, options):
+    urls = [base_url + page_path(index) for index in range(min(options["pages"], options["analyze_pages"]))]
+    server_request(base_url, '/__reset')
+    start, cpu_start = time.perf_counter(), time.process_time()
+    errors = sum(1 for url in urls if "problems" not in sma.analyze_page(url))
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+    return {"pages": len(urls), "errors": errors, "seconds": elapsed, "cpu_seconds": cpu}
+
+
+def flow_main(sma, base_url, options):
+    answers = iter([base_url + '/', '2'])
+    builtins.input = lambda prompt='': next(answers)
+    server_request(base_url, '/__reset')
+    with tempfile.TemporaryDirectory(prefix='sitemaster-bench-') as directory:
+        os.chdir(directory)
+        start, cpu_start = time.perf_counter(), cpu_seconds()
+        sma.main()
+        elapsed, cpu = time.perf_counter() - start, cpu_seconds() - cpu_start
+        with open('combined_accessibility_seo_report.html', encoding='utf-8') as file:
+            report = file.read()
+    # Una sección por página auditada (el servidor también cuenta robots.txt, sitemaps, hojas de estilo y enlaces comprobados)
+    return {"pages": report.count('class="accordion url-accordion"'), "seconds": elapsed, "cpu_seconds": cpu, "report_bytes": len(report.encode('utf-8'))}
+
+
+def flow_checks(sma, base_url, options):
+    import requests
+    urls = [base_url + page_path(index) for index in range(min(options["pages"], options["check_pages"]))]
+    pages = [(url, requests.get(url, timeout=30).content) for url in urls]
+    sma.analyze_page(urls[0])  # la hoja de estilo compartida queda en caché y no se mide su descarga
+    cpu = {"parse": 0.0, "walk": 0.0}
+    cpu.update({rule_class.name: 0.0 for rule_class in sma.dom_rules})
+    for url, content in pages:
+        cpu_start = time.process_time()
+        sma.parse_html(content)
+        cpu["parse"] += time.process_time() - cpu_start
+        # Recorrido sin reglas: lo que cuesta recorrer el árbol, que se descuenta de cada regla
+        soup = sma.parse_html(content)
+        cpu_start = time.process_time()
+        sma.walk_dom(soup, [], skip_id='footer-page')
+        walk = time.process_time() - cpu_start
+        cpu["walk"] += walk
+        for rule_class in sma.dom_rules:
+            soup = sma.parse_html(content)
+            rule = rule_class()
+            rule.context = {"url": url, "load_stylesheet": None}
+            cpu_start = time.process_time()
+            sma.walk_dom(soup, [rule], skip_id='footer-page')
+            rule.result()
+            cpu[rule_class.name] += max(time.process_time() - cpu_start - walk, 0.0)
+    return {"pages": len(pages), "cpu_ms_per_page": {name: 1000 * seconds / len(pages) for name, seconds in cpu.items()}}
+
+
+def run_flow(flow, base_url, options, results):
+    import SiteMasterAudit as sma
+    configure(sma, options)
+    result = globals()[f"flow_{flow}"](sma, base_url, options)
+    result["peak_rss_mb"] = peak_rss_mb()
+    if flow != 'checks':
+        stats = server_request(base_url, '/__stats')
+        pages = result["pages"]
+        result["requests"] = stats.get("requests", 0)
+        result["pages_per_second"] = pages / result["seconds"] if result["seconds"] else 0
+        result["requests_per_page"] = result["requests"] / pages if pages else 0
+        result["not_found"] = stats.get("not_found", 0)
+    results.put(result)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Diferencias relativas con un resultado anterior en las métricas principales
+def compare(previous, current):
+    print(f"\nComparación con {previous.get('commit') or 'resultado anterior'}:")
+    if previous.get("config") != current["config"]:
+        print("  Aviso: la configuración del benchmark no es la misma")
+    for flow, result in current["flows"].items():
+        before = previous.get("flows", {}).get(flow)
+        if not before:
+            continue
+        metrics = [("pages_per_second", True), ("requests_per_page", False), ("peak_rss_mb", False)]
+        for metric, higher_is_better in metrics:
+            if metric in result and before.get(metric):
+                change = (result[metric] - before[metric]) / before[metric]
+                better = (change > 0) == higher_is_better
+                print(f"  {flow:<13} {metric:<18} {before[metric]:>10.2f} -> {result[metric]:>10.2f} ({change:+.1%}{'' if abs(change) < 0.02 else ', mejor' if better else ', peor'})")
+        for name, value in result.get("cpu_ms_per_page", {}).items():
+            old = before.get("cpu_ms_per_page", {}).get(name)
+            if old:
+                print(f"  {flow:<13} {name:<18} {old:>10.3f} -> {value:>10.3f} ms ({(value - old) / old:+.1%})")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark de SiteMaster Audit contra un sitio sintético local")
+    arg_parser.add_argument('--pages', type=int, default=200, help="páginas del sitio sintético (10 a 100000)")
+    arg_parser.add_argument('--latency', type=float, default=0.0, help="latencia fija por respuesta, en ms")
+    arg_parser.add_argument('--jitter', type=float, default=0.0, help="latencia extra por URL (determinista), hasta estos ms")
+    arg_parser.add_argument('--seed', type=int, default=1, help="semilla del contenido del sitio")
+    arg_parser.add_argument('--flows', default=','.join(FLOWS), help=f"flujos a medir, separados por comas ({', '.join(FLOWS)})")
+    arg_parser.add_argument('--analyze-pages', type=int, default=100, help="páginas del flujo analyze_page")
+    arg_parser.add_argument('--check-pages', type=int, default=50, help="páginas del flujo checks")
+    arg_parser.add_argument('--pipeline', action='store_true', help="main en modo pipeline (PIPELINE_MODE)")
+    arg_parser.add_argument('--rate-limit', type=float, default=1e6, help="peticiones por segundo al servidor local")
+    arg_parser.add_argument('--port', type=int, default=0)
+    arg_parser.add_argument('--serve-only', action='store_true', help="solo levanta el servidor del sitio sintético")
+    arg_parser.add_argument('--json', help="guarda los resultados en este fichero")
+    arg_parser.add_argument('--compare', help="resultado anterior (--json) con el que comparar")
+    args = arg_parser.parse_args()
+
+    if not 10 <= args.pages <= 100000:
+        arg_parser.error("--pages debe estar entre 10 y 100000")
+    flows = [flow for flow in args.flows.split(',') if flow]
+    unknown = [flow for flow in flows if flow not in FLOWS]
+    if unknown:
+        arg_parser.error(f"flujos desconocidos: {', '.join(unknown)}")
+
+    # spawn: procesos limpios, sin hilos ni módulos heredados del proceso principal
+    context = multiprocessing.get_context('spawn')
+    site = {"pages": args.pages, "seed": args.seed, "latency": args.latency / 1000, "jitter": args.jitter / 1000}
+    ready = context.Queue()
+    server = context.Process(target=serve, args=(site, args.port, ready), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{ready.get(timeout=30)}"
+    if args.serve_only:
+        print(f"Sitio sintético de {args.pages} páginas en {base_url}/ (Ctrl+C para terminar)")
+        try:
+            server.join()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    options = {"pages": args.pages, "analyze_pages": args.analyze_pages, "check_pages": args.check_pages,
+               "pipeline": args.pipeline, "rate_limit": args.rate_limit}
+    print(f"Sitio sintético de {args.pages} páginas en {base_url}/, latencia {args.latency:g} ms (+{args.jitter:g} ms)\n")
+    results = {}
+    try:
+        for flow in flows:
+            queue = context.Queue()
+            process = context.Process(target=run_flow, args=(flow, base_url, options, queue))
+            process.start()
+            results[flow] = queue.get()
+            process.join()
+    finally:
+        server.terminate()
+
+    for flow, result in results.items():
+        if flow == 'checks':
+            print(f"checks: CPU por página ({result['pages']} páginas), pico {result['peak_rss_mb']:.1f} MB")
+            for name, milliseconds in sorted(result["cpu_ms_per_page"].items(), key=lambda item: -item[1]):
+                print(f"  {name:<24} {milliseconds:>8.3f} ms")
+        else:
+            print(f"{flow}: {result['pages']} páginas en {result['seconds']:.2f} s ({result['pages_per_second']:.1f} páginas/s), "
+                  f"{result['requests_per_page']:.2f} peticiones/página, CPU {result['cpu_seconds']:.2f} s, pico {result['peak_rss_mb']:.1f} MB")
+
+    output = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "config": {"pages": args.pages, "latency_ms": args.latency, "jitter_ms": args.jitter, "seed": args.seed,
+                   "analyze_pages": args.analyze_pages, "check_pages": args.check_pages, "pipeline": args.pipeline},
+        "flows": results
+    }
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            compare(json.load(file), output)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(output, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# Comparativa de los parsers HTML de SiteMaster Audit: tiempo de parseo, memoria y paridad de hallazgos
+#
+# Uso: python3 benchmark_parsers.py [--repeat N] [--json resultados.json] <ficheros .html | directorios | URLs>
+#
+# Las URLs se descargan una sola vez antes de medir, así que la red no influye en los tiempos.
+# La memoria es el pico de asignaciones de Python (tracemalloc) mientras se construye el árbol.
+# La paridad compara los hallazgos de cada backend con los de html.parser, página a página.
+import argparse
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+import SiteMasterAudit as sma
+
+PARSERS = ['html.parser', 'lxml', 'html5lib']
+
+_NO_TIMINGS = {"connect": 0.0, "ttfb": 0.0, "download": 0.0, "parse": 0.0}
+_NO_ORIGIN = {
+    "robots_exists": True,
+    "robots_url": None,
+    "robots_content": "",
+    "sitemap_exists": True,
+    "sitemap_index_exists": False,
+    "sitemap_url": None
+}
+
+
+def load_corpus(sources):
+    corpus = []
+    for source in sources:
+        if source.startswith(('http://', 'https://')):
+            response = sma.get_with_retries(source)
+            if response.status_code == 200:
+                corpus.append((source, response.content))
+            else:
+                print(f"Se omite {source}: estado {response.status_code}")
+        elif os.path.isdir(source):
+            for name in sorted(os.listdir(source)):
+                if name.endswith(('.html', '.htm')):
+                    path = os.path.join(source, name)
+                    with open(path, 'rb') as file:
+                        corpus.append((path, file.read()))
+        else:
+            with open(source, 'rb') as file:
+                corpus.append((source, file.read()))
+    return corpus
+
+
+def measure_parse(content, parser, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        sma.parse_html(content, parser)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    sma.parse_html(content, parser)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+# Hallazgos de la página sin tocar la red (enlaces, robots/sitemap, CSS/JS, imágenes y hojas de estilo externas quedan fijos para todos los backends)
+def page_findings(url, content, parser):
+    report = sma.audit_document(url, sma.parse_html(content, parser), _NO_TIMINGS, _NO_ORIGIN,
+                                check_links=lambda link_urls: [], load_stylesheet=lambda stylesheet_url: None,
+                                check_assets=lambda asset_urls: {}, check_images=lambda image_refs: ({}, None))
+    return report["problems"], report["seo_info"], report["heading_hierarchy"], report["aria_roles_info"]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compara los parsers HTML disponibles para SiteMaster Audit")
+    arg_parser.add_argument('sources', nargs='+', help="ficheros .html, directorios con .html o URLs")
+    arg_parser.add_argument('--repeat', type=int, default=5, help="repeticiones por página (se usa la mediana)")
+    arg_parser.add_argument('--json', help="guarda los resultados en este fichero")
+    args = arg_parser.parse_args()
+
+    corpus = load_corpus(args.sources)
+    if not corpus:
+        print("No hay páginas que medir")
+        return
+    parsers = [parser for parser in PARSERS if sma.parser_available(parser)]
+    total_bytes = sum(len(content) for _, content in corpus)
+    print(f"{len(corpus)} páginas, {total_bytes / 1024:.0f} KB, parsers: {', '.join(parsers)}\n")
+
+    reference = {name: page_findings(name, content, 'html.parser') for name, content in corpus}
+    results = {}
+    for parser in parsers:
+        parse_times, peaks, mismatches = [], [], []
+        for name, content in corpus:
+            parse_time, peak = measure_parse(content, parser, args.repeat)
+            parse_times.append(parse_time)
+            peaks.append(peak)
+            if parser != 'html.parser' and page_findings(name, content, parser) != reference[name]:
+                mismatches.append(name)
+        results[parser] = {
+            "total_parse_seconds": sum(parse_times),
+            "ms_per_page": 1000 * sum(parse_times) / len(corpus),
+            "mb_per_second": total_bytes / 1048576 / sum(parse_times),
+            "peak_memory_mb": max(peaks) / 1048576,
+            "mean_peak_memory_mb": statistics.mean(peaks) / 1048576,
+            "supported": parser in sma.SUPPORTED_HTML_PARSERS,
+            "findings_mismatches": mismatches
+        }
+
+    print(f"{'parser':<12} {'ms/página':>10} {'MB/s':>8} {'pico MB':>8} {'media MB':>9}  paridad con html.parser")
+    for parser, result in results.items():
+        parity = "referencia" if parser == 'html.parser' else (
+            "idéntica" if not result["findings_mismatches"] else f"{len(result['findings_mismatches'])} páginas distintas")
+        print(f"{parser:<12} {result['ms_per_page']:>10.2f} {result['mb_per_second']:>8.2f} "
+              f"{result['peak_memory_mb']:>8.2f} {result['mean_peak_memory_mb']:>9.2f}  {parity}")
+    for parser, result in results.items():
+        for name in result["findings_mismatches"]:
+            print(f"  {parser}: hallazgos distintos en {name}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({"pages": len(corpus), "bytes": total_bytes, "parsers": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()